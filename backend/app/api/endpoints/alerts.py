@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
 from beanie import PydanticObjectId
 from app.models.models import Alert, Transaction
 from app.schemas.schemas import Alert as AlertSchema
+from app.core.bulk import bulk_update_by_ids
 
 router = APIRouter()
 
+class AlertBulkAction(BaseModel):
+    alert_ids: List[str] = Field(..., min_length=1)
+    action: str
+
 @router.get("", response_model=List[AlertSchema])
 async def get_alerts(skip: int = 0, limit: int = 100):
     # Get alerts, sorted by created_at descending
@@ -29,6 +36,13 @@ async def get_alerts(skip: int = 0, limit: int = 100):
     
     return [AlertSchema.model_validate(a) for a in valid_alerts]
 
+@router.post("/actions")
+async def bulk_alert_action(request: AlertBulkAction):
+    """Apply one action to many alerts in a single update"""
+    result = await bulk_update_by_ids(Alert, request.alert_ids, {"status": request.action})
+    result["action"] = request.action
+    return result
+
 @router.get("/{alert_id}", response_model=AlertSchema)
 async def get_alert(alert_id: str):
     alert = await Alert.get(alert_id)
@@ -45,5 +59,6 @@ async def alert_action(alert_id: str, action: str):
         raise HTTPException(status_code=404, detail="Alert not found")
     
     alert.status = action
+    alert.updated_at = datetime.now(timezone.utc)
     await alert.save()
     return {"message": f"Alert {alert_id} {action}ed successfully"}
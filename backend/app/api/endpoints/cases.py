@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Body
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 from app.models.models import Case, Alert, Transaction, CaseNote, SAR
 from app.schemas.schemas import Case as CaseSchema
+from app.core.bulk import bulk_update_by_ids
 
 router = APIRouter()
 
@@ -11,6 +12,11 @@ class CaseUpdate(BaseModel):
     status: Optional[str] = None
     analyst_id: Optional[int] = None
 
+class CaseBulkUpdate(BaseModel):
+    case_ids: List[str] = Field(..., min_length=1)
+    status: Optional[str] = None
+    analyst_id: Optional[int] = None
+
 class CaseNoteCreate(BaseModel):
     case_id: str
     note: str
@@ -69,6 +75,21 @@ async def get_cases(
     
     return [CaseSchema.model_validate(c) for c in cases]
 
+@router.post("/bulk")
+async def bulk_update_cases(update: CaseBulkUpdate):
+    """Update status and/or analyst assignment for many cases in a single update"""
+    fields = {}
+    if update.status:
+        fields["status"] = update.status
+    if update.analyst_id is not None:
+        fields["analyst_id"] = update.analyst_id
+    if not fields:
+        raise HTTPException(status_code=400, detail="Provide a status and/or analyst_id to apply")
+
+    result = await bulk_update_by_ids(Case, update.case_ids, fields)
+    result["applied"] = fields
+    return result
+
 @router.get("/{case_id}", response_model=CaseSchema)
 async def get_case(case_id: str):
     """Get a specific case by ID"""
@@ -5,7 +5,6 @@ from pydantic import BaseModel
 from app.models.models import Transaction, Alert, Case, Report
 from app.services.llm_service import llm_service
 from app.core.cache import cached
-import pandas as pd
 import json
 
 router = APIRouter()
@@ -262,20 +261,29 @@ async def get_trends(
 async def get_report_stats():
     """Get current statistics for dashboard"""
     total_transactions = await Transaction.count()
-    total_alerts = await Alert.count()
-    total_cases = await Case.count()
-    
+
+    # Alert count and average fraud score in one aggregation
+    alert_stats = await Alert.get_pymongo_collection().aggregate([
+        {"$group": {"_id": None, "count": {"$sum": 1}, "avg_risk_score": {"$avg": "$risk_score"}}}
+    ]).to_list(length=None)
+
+    total_alerts = alert_stats[0]["count"] if alert_stats else 0
+    avg_risk_score = (alert_stats[0]["avg_risk_score"] or 0) if alert_stats else 0
+
+    # Case counts per status in one aggregation
+    case_stats = await Case.get_pymongo_collection().aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+
+    case_counts = {item["_id"]: item["count"] for item in case_stats}
+    total_cases = sum(case_counts.values())
+
     # Calculate fraud rate
     fraud_rate = (total_alerts / total_transactions * 100) if total_transactions > 0 else 0
-    
-    # Calculate average fraud score
-    alerts = await Alert.find_all().to_list()
-    avg_risk_score = sum(a.risk_score for a in alerts) / len(alerts) if alerts else 0
-    
+
     # Calculate false positive rate (simplified - cases closed without SAR)
-    closed_cases = await Case.find(Case.status == "Closed").to_list()
-    sar_cases = await Case.find(Case.status == "SAR Filed").to_list()
-    false_positive_rate = (len(closed_cases) / total_cases * 100) if total_cases > 0 else 0
+    closed_cases = case_counts.get("Closed", 0)
+    false_positive_rate = (closed_cases / total_cases * 100) if total_cases > 0 else 0
     
     # Calculate detection rate
     detection_rate = (total_alerts / total_transactions * 100) if total_transactions > 0 else 0
@@ -332,6 +340,7 @@ async def export_report(
     else:  # CSV
         # Convert to CSV string
         import io
+        import pandas as pd  # Only the CSV export needs pandas; keep it off the startup path
         output = io.StringIO()
         if export_data:
             df = pd.DataFrame(export_data)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 from app.models.models import Rule
+from app.fraud_engine.rules_engine.engine import rules_changed
 from app.schemas.schemas import Rule as RuleSchema, RuleBase
 
 router = APIRouter()
@@ -14,6 +15,7 @@ async def get_rules():
 async def create_rule(rule: RuleBase):
     db_rule = Rule(**rule.dict())
     await db_rule.insert()
+    await rules_changed()
     return RuleSchema.model_validate(db_rule)
 
 @router.put("/{rule_id}", response_model=RuleSchema)
@@ -28,6 +30,7 @@ async def update_rule(rule_id: str, rule_update: RuleBase):
         setattr(db_rule, key, value)
         
     await db_rule.save()
+    await rules_changed()
     return RuleSchema.model_validate(db_rule)
 
 @router.delete("/{rule_id}")
@@ -37,4 +40,5 @@ async def delete_rule(rule_id: str):
         raise HTTPException(status_code=404, detail="Rule not found")
     
     await db_rule.delete()
+    await rules_changed()
     return {"message": "Rule deleted"}
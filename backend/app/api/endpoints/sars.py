@@ -3,6 +3,7 @@ from typing import List, Optional
 from datetime import datetime, timezone
 from pydantic import BaseModel
 from app.models.models import Case, Alert, Transaction, SAR
+from app.services.sequence_service import sequence_service
 
 router = APIRouter()
 
@@ -89,16 +90,18 @@ async def get_sars(
 @router.get("/stats")
 async def get_sar_stats():
     """Get SAR statistics"""
-    total = await SAR.count()
-    pending = await SAR.find(SAR.status == "Pending").count()
-    filed = await SAR.find(SAR.status == "Filed").count()
-    drafts = await SAR.find(SAR.status == "Draft").count()
-    
+    # Single aggregation: count per status in one pass over the collection
+    status_counts = await SAR.get_pymongo_collection().aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+
+    counts = {item["_id"]: item["count"] for item in status_counts}
+
     return {
-        "pending_filings": pending,
-        "successfully_filed": filed,
-        "drafts": drafts,
-        "total": total
+        "pending_filings": counts.get("Pending", 0),
+        "successfully_filed": counts.get("Filed", 0),
+        "drafts": counts.get("Draft", 0),
+        "total": sum(counts.values())
     }
 
 @router.post("/")
@@ -125,9 +128,8 @@ async def create_sar(sar_data: SARCreate):
                 if not customer_name:
                     customer_name = f"Customer-{transaction.customer_id}"
     
-    # Generate SAR ID
-    sar_count = await SAR.count()
-    sar_id = f"SAR-{datetime.now().year}-{str(sar_count + 1).zfill(3)}"
+    # Generate SAR ID from the atomic per-year sequence
+    sar_id = await sequence_service.next_sar_id()
     
     # Create SAR
     sar = SAR(
@@ -227,6 +229,7 @@ async def file_sar(sar_id: str):
         case = await Case.get(sar.case.ref.id)
         if case:
             case.status = "SAR Filed"
+            case.updated_at = datetime.now(timezone.utc)
             await case.save()
     
     await sar.save()
@@ -1,31 +1,58 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from typing import List
+import json
+from pymongo.errors import DuplicateKeyError
 from app.models.models import Transaction, Alert, Case
 from app.schemas.schemas import Transaction as TransactionSchema, TransactionCreate
-from app.fraud_engine.scoring.scorer import Scorer
+from app.fraud_engine.scoring.scorer import Scorer, ALERT_THRESHOLD, CASE_THRESHOLD, persisted_transaction, remember_scores
 from app.services.llm_service import llm_service
+from app.services.ingestion_service import ingestion_service
+from app.services.stream_service import StreamPipeline, iter_lines, encode_result
+from app.core.config import settings
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
 
 router = APIRouter()
 
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that does not listen for disconnects on `receive`, so the
+    request body can still be read while the response is streaming. Disconnects
+    surface through request.stream() instead.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
 @router.post("", response_model=TransactionSchema)
 async def create_transaction(transaction: TransactionCreate):
+    # 0. Idempotent retry: this worker already wrote this transaction_id (and its alert / case)
+    persisted = persisted_transaction(transaction.transaction_id)
+    if persisted is not None:
+        return TransactionSchema.model_validate(persisted)
+
     # 1. Save transaction
     db_trans = Transaction(**transaction.dict())
-    await db_trans.insert()
+    try:
+        await db_trans.insert()
+    except DuplicateKeyError:
+        # A concurrent retry inserted it first (unique index on transaction_id); it scores and alerts
+        existing = await Transaction.find_one(Transaction.transaction_id == transaction.transaction_id)
+        return TransactionSchema.model_validate(existing)
     
     # 2. Run fraud engine
     scorer = Scorer()
     result = await scorer.calculate_score(db_trans)
     
     # 3. Create alert if score is high
-    if result["risk_score"] > 50: # Threshold for alert
+    if result["risk_score"] > ALERT_THRESHOLD:
         # Generate AI explanation using free model
         prompt = f"""
         Explain why this transaction is risky based on the scores:
         Transaction Amount: {db_trans.amount}
         Risk Score: {result['risk_score']}
         Risk Level: {result['risk_level']}
-        Rules Triggered: {', '.join(result.get('triggered_rules', []))}
+        Rules Triggered: {', '.join(r["name"] for r in result.get('triggered_rules', []))}
         
         Keep it concise (1-2 sentences).
         """
@@ -35,6 +62,7 @@ async def create_transaction(transaction: TransactionCreate):
             transaction=db_trans,
             risk_score=result["risk_score"],
             risk_level=result["risk_level"],
+            score_tier=result["tier"],
             status="Pending",
             assigned_queue="General Queue",
             explanation=explanation
@@ -42,15 +70,94 @@ async def create_transaction(transaction: TransactionCreate):
         await alert.insert()
         
         # 4. Auto-create case for very high risk
-        if result["risk_score"] > 90:
+        if result["risk_score"] > CASE_THRESHOLD:
             case = Case(
                 alert=alert,
                 status="Open"
             )
             await case.insert()
-            
+    
+    # 5. Every write succeeded: retries can now be answered from the score cache
+    remember_scores([db_trans], [result])
     return TransactionSchema.model_validate(db_trans)
 
+@router.post("/batch")
+async def create_transactions_batch(request: Request):
+    """
+    Ingest a batch of transactions from a JSON array or an NDJSON body
+    (Content-Type: application/x-ndjson). The batch is scored in one vectorized
+    pass and written with ordered insert_many calls. Transactions whose
+    transaction_id already exists are reported as duplicates, so retries are safe.
+    AI explanations are not generated for batch-created alerts.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = ingestion_service.parse_ndjson(body)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed JSON body: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of transactions")
+    
+    if len(items) > settings.TRANSACTION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(items)} exceeds the limit of {settings.TRANSACTION_BATCH_MAX_SIZE} transactions"
+        )
+    
+    results = await ingestion_service.ingest_batch(items, Scorer())
+    return {**ingestion_service.summarize(results), "results": results}
+
+@router.post("/stream")
+async def stream_transactions(request: Request):
+    """
+    Score a long-lived NDJSON transaction feed. Records are read incrementally from
+    the chunked request body and a decision line is streamed back per record as
+    soon as it is persisted, followed by a summary line. Reading pauses whenever
+    scoring or Mongo writes fall behind.
+    """
+    pipeline = StreamPipeline()
+    pipeline.start(iter_lines(request.stream()))
+    
+    async def body():
+        async for result in pipeline.results():
+            yield encode_result(result)
+    
+    return DuplexStreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.websocket("/stream/ws")
+async def stream_transactions_ws(websocket: WebSocket):
+    """
+    WebSocket variant of /stream: each text message carries one or more NDJSON
+    records and an empty message ends the input. Decisions are sent back as
+    JSON text messages, followed by a summary message.
+    """
+    await websocket.accept()
+    
+    async def lines():
+        try:
+            while True:
+                message = await websocket.receive_text()
+                if not message:
+                    return
+                for line in message.splitlines():
+                    yield line.encode()
+        except WebSocketDisconnect:
+            return
+    
+    pipeline = StreamPipeline()
+    pipeline.start(lines())
+    try:
+        async for result in pipeline.results():
+            await websocket.send_text(json.dumps(result, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        await pipeline.stop()
+
 @router.get("", response_model=List[TransactionSchema])
 async def get_transactions():
     transactions = await Transaction.find_all().to_list()
@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, Optional, Type
+from datetime import datetime, timezone
+from beanie import Document
+from bson import ObjectId
+from bson.errors import InvalidId
+
+def parse_object_id(value: str) -> Optional[ObjectId]:
+    """Parse a string into an ObjectId, returning None if it is not a valid id"""
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+async def bulk_update_by_ids(model: Type[Document], ids: List[str], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply the same $set to many documents with a single update_many.
+    Always stamps `updated_at` and returns a per-id outcome
+    (updated, not_found, invalid_id) in request order.
+    """
+    parsed = {raw: parse_object_id(raw) for raw in ids}
+    object_ids = list({oid for oid in parsed.values() if oid is not None})
+
+    collection = model.get_pymongo_collection()
+    found = set()
+    modified = 0
+    if object_ids:
+        # Resolve which ids exist with an _id-only projection (no document hydration)
+        existing = await collection.find({"_id": {"$in": object_ids}}, {"_id": 1}).to_list(length=None)
+        found = {doc["_id"] for doc in existing}
+
+    if found:
+        update = dict(fields)
+        update["updated_at"] = datetime.now(timezone.utc)
+        result = await collection.update_many({"_id": {"$in": list(found)}}, {"$set": update})
+        modified = result.modified_count
+
+    results = []
+    for raw, oid in parsed.items():
+        if oid is None:
+            outcome = "invalid_id"
+        elif oid in found:
+            outcome = "updated"
+        else:
+            outcome = "not_found"
+        results.append({"id": raw, "status": outcome})
+
+    return {
+        "requested": len(parsed),
+        "matched": len(found),
+        "modified": modified,
+        "results": results
+    }
@@ -14,6 +14,34 @@ class Settings(BaseSettings):
     # Using only free models as requested
     OPENROUTER_MODEL: str = os.getenv("OPENROUTER_MODEL", "openrouter/free")
     
+    # Ingestion
+    TRANSACTION_BATCH_MAX_SIZE: int = int(os.getenv("TRANSACTION_BATCH_MAX_SIZE", "5000"))
+    STREAM_QUEUE_SIZE: int = int(os.getenv("STREAM_QUEUE_SIZE", "1000")) # Max records buffered per stage
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "200")) # Max records scored/written together
+    STREAM_DEDUPE_WINDOW: int = int(os.getenv("STREAM_DEDUPE_WINDOW", "100000")) # Recent ids remembered per stream
+    
+    # Model serving
+    PRELOAD_MODELS: bool = os.getenv("PRELOAD_MODELS", "true").lower() in ("1", "true", "yes") # Load models in the background after startup (else on first scoring request)
+    KNN_NPROBE: int = int(os.getenv("KNN_NPROBE", "16")) # IVF lists scanned per KNN query (higher = better recall, slower)
+    MODEL_RELOAD_INTERVAL: float = float(os.getenv("MODEL_RELOAD_INTERVAL", "10")) # Seconds between checks for a new model bundle (0 = off)
+    WORKER_STATS_DIR: str = os.getenv("WORKER_STATS_DIR", "") # Per-worker memory reports (default: <tmp>/fraud-api-workers)
+    WORKER_STATS_INTERVAL: float = float(os.getenv("WORKER_STATS_INTERVAL", "30")) # Seconds between worker memory reports
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "0")) # Threads running model inference off the event loop (0 = min(4, CPU count))
+    SCORING_LATENCY_BUDGET_MS: float = float(os.getenv("SCORING_LATENCY_BUDGET_MS", "250")) # Single-transaction ML budget before the heuristic answers instead (0 = no limit)
+    SCORING_BATCH_LATENCY_BUDGET_MS: float = float(os.getenv("SCORING_BATCH_LATENCY_BUDGET_MS", "5000")) # Same for a batch (ingestion, streams)
+    # Tiered scoring is off until a band has been validated on real traffic: ML adds 0-60 points,
+    # so no band narrower than 0:100 is safe a priori. Enable only with a band for which
+    # scripts/replay_tiered_scoring.py reports zero alert changes (keep its --report output)
+    SCORING_TIERED: bool = os.getenv("SCORING_TIERED", "false").lower() in ("1", "true", "yes") # Skip the ML model when rules + heuristic are decisive
+    SCORING_TIER_BAND_LOW: float = float(os.getenv("SCORING_TIER_BAND_LOW", "0")) # Provisional scores in [LOW, HIGH] run the ML model
+    SCORING_TIER_BAND_HIGH: float = float(os.getenv("SCORING_TIER_BAND_HIGH", "100")) # Provisional scores above HIGH are decided without ML (100 = never)
+    SCORE_CACHE_SIZE: int = int(os.getenv("SCORE_CACHE_SIZE", "10000")) # Scored transaction_ids kept for retries/replays (0 = off)
+    SCORE_CACHE_TTL: float = float(os.getenv("SCORE_CACHE_TTL", "300")) # Seconds a cached score stays valid
+    PROBABILITY_CACHE_SIZE: int = int(os.getenv("PROBABILITY_CACHE_SIZE", "50000")) # ML probabilities kept per feature-vector fingerprint (0 = off)
+    ENSEMBLE_MODE: str = os.getenv("ENSEMBLE_MODE", "parallel") # 'parallel' (average all models) or 'cascade'
+    ENSEMBLE_CASCADE_LOW: float = float(os.getenv("ENSEMBLE_CASCADE_LOW", "0.1")) # Cheap models all below: clear legit
+    ENSEMBLE_CASCADE_HIGH: float = float(os.getenv("ENSEMBLE_CASCADE_HIGH", "0.9")) # Cheap models all above: clear fraud
+    
     # Other settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-for-jwt")
     ALGORITHM: str = "HS256"
@@ -0,0 +1,88 @@
+"""
+Per-worker memory reporting
+Each API worker periodically writes its memory figures to a small JSON file in
+WORKER_STATS_DIR; any worker can then report the whole host. Shared pages (the
+memory-mapped model bundle, shared libraries) are counted once across workers
+in PSS, so sum(pss_mb) is what the workers really cost together.
+"""
+import os
+import json
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+
+def stats_dir() -> str:
+    return settings.WORKER_STATS_DIR or os.path.join(tempfile.gettempdir(), "fraud-api-workers")
+
+def memory_stats() -> Dict[str, Optional[float]]:
+    """RSS split into shared/private pages, plus PSS where the kernel provides it (MB)"""
+    mb = 1024 * 1024
+    stats = {"rss_mb": None, "shared_mb": None, "private_mb": None, "pss_mb": None}
+    try:
+        with open('/proc/self/statm') as f:
+            _, resident, shared = (int(v) for v in f.read().split()[:3])
+        page = os.sysconf('SC_PAGE_SIZE')
+        stats.update(rss_mb=resident * page / mb, shared_mb=shared * page / mb,
+                     private_mb=(resident - shared) * page / mb)
+    except (OSError, ValueError, AttributeError):
+        return stats
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    stats["pss_mb"] = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    return stats
+
+def publish_worker_stats(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Write this worker's current figures (write-then-rename, so readers never see partial JSON)"""
+    record = {
+        "pid": os.getpid(),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **memory_stats(),
+        **(extra or {}),
+    }
+    directory = stats_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"worker-{record['pid']}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+    return record
+
+def collect_worker_stats() -> List[Dict[str, Any]]:
+    """Latest figures of every live worker on this host; files of exited workers are removed"""
+    directory = stats_dir()
+    if not os.path.isdir(directory):
+        return []
+    workers = []
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("worker-") and name.endswith(".json")):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not _alive(record.get("pid")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        workers.append(record)
+    return workers
+
+def _alive(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except PermissionError:
+        return True  # Exists, owned by another user
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
@@ -1,5 +1,6 @@
 from app.models.models import Transaction, Alert, Case, Rule, SAR, AnalysisResult, AnalysisTrend, Report
 from app.services.llm_service import llm_service
+from app.services.sequence_service import sequence_service
 from datetime import datetime, timedelta, timezone
 import random
 import json
@@ -128,6 +129,8 @@ async def seed_data(force: bool = False):
         print("Seeding sample SARs...")
         cases = await Case.find_all().to_list()
         sar_created = 0
+        # Reserve the whole ID range up front in a single counter update
+        sar_ids = await sequence_service.allocate_sar_ids(3)
         
         for i, case in enumerate(cases):
             if sar_created >= 3:
@@ -142,7 +145,7 @@ async def seed_data(force: bool = False):
                             if not existing_sar:
                                 sar = SAR(
                                     case=case,
-                                    sar_id=f"SAR-{datetime.now().year}-{1000+sar_count+sar_created:04d}",
+                                    sar_id=sar_ids[sar_created],
                                     customer_name=f"Customer {transaction.customer_id}",
                                     amount=transaction.amount,
                                     status=random.choice(["Draft", "Pending", "Filed"]),
@@ -18,7 +18,7 @@ async def init_db():
     client = AsyncIOMotorClient(MONGODB_URI)
     
     # Import models here to avoid circular imports
-    from app.models.models import Transaction, Alert, Case, CaseNote, Rule, SAR, AnalysisResult, AnalysisTrend
+    from app.models.models import Transaction, Alert, Case, CaseNote, Rule, SAR, Counter, AnalysisResult, AnalysisTrend
     
     # Initialize beanie with document models in dependency order
     await init_beanie(
@@ -30,6 +30,7 @@ async def init_db():
             Case,
             Rule,
             SAR,
+            Counter,
             AnalysisResult,
             AnalysisTrend
         ]
@@ -0,0 +1,177 @@
+"""
+Versioned model bundles
+train_models.py / retrain_models.py write artifacts into the model directory as
+a workspace; publish_bundle then copies the served subset into an immutable
+bundles/v00001/ directory with a manifest (sha256 per file, feature schema,
+encoder classes, preprocessor state) and atomically repoints CURRENT at it.
+Readers resolve CURRENT once per load, so they only ever see complete bundles,
+and a running MLEngine can hot-swap to a newer one without a restart.
+"""
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+BUNDLE_DIR = "bundles"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+BUNDLE_FORMAT = 1
+KEEP_BUNDLES = 5  # Older bundles are pruned after a publish (never the current one)
+
+# Served artifacts per model: every group is required, and within a group the first existing file wins
+MODEL_ARTIFACTS = {
+    "decision_tree": [["decision_tree.joblib"]],
+    "naive_bayes": [["naive_bayes.joblib"]],
+    "knn": [["knn_scaler.joblib"], ["knn_pca.joblib"], ["knn_index", "knn.joblib"]],
+    "ann": [["ann_scaler.joblib"], ["ann_weights.npz", "ann_model.h5"]],
+}
+
+class BundleError(Exception):
+    """A bundle is missing, incomplete or fails its checksums"""
+
+def bundle_name(version: int) -> str:
+    return f"v{version:05d}"
+
+def current_bundle(model_dir: str) -> Optional[str]:
+    """Name of the bundle CURRENT points at, or None before the first publish"""
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def resolve_model_dir(model_dir: str) -> str:
+    """Directory to load from: the current bundle, or the loose files of an unbundled install"""
+    name = current_bundle(model_dir)
+    return os.path.join(model_dir, BUNDLE_DIR, name) if name else model_dir
+
+def load_manifest(bundle_path: str, verify: bool = False) -> Dict:
+    manifest_path = os.path.join(bundle_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise BundleError(f"No manifest in {bundle_path}")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if verify:
+        for name, expected in manifest["files"].items():
+            path = os.path.join(bundle_path, name)
+            if not os.path.exists(path) or _sha256(path) != expected["sha256"]:
+                raise BundleError(f"Checksum mismatch for {name} in {bundle_path}")
+    return manifest
+
+def bundle_versions(model_dir: str) -> List[int]:
+    root = os.path.join(model_dir, BUNDLE_DIR)
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(name[1:]) for name in os.listdir(root)
+                  if name.startswith("v") and name[1:].isdigit())
+
+def publish_bundle(model_dir: str, source_dir: Optional[str] = None, info: Optional[Dict] = None) -> Dict:
+    """
+    Copy the served artifacts from source_dir (default: model_dir) into a new bundle
+    and switch CURRENT to it. Returns the manifest.
+    """
+    import joblib
+    source_dir = source_dir or model_dir
+    versions = bundle_versions(model_dir)
+    version = (versions[-1] if versions else 0) + 1
+    root = os.path.join(model_dir, BUNDLE_DIR)
+    target = os.path.join(root, bundle_name(version))
+    tmp_path = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    feature_columns = joblib.load(os.path.join(source_dir, 'feature_columns.joblib'))
+    names = ['feature_columns.joblib']
+    encoder_classes = {}
+    for col in feature_columns:
+        le_name = f'le_{col}.joblib'
+        if os.path.exists(os.path.join(source_dir, le_name)):
+            names.append(le_name)
+            encoder_classes[col] = [str(c) for c in joblib.load(os.path.join(source_dir, le_name)).classes_]
+
+    models = []
+    for model_type, groups in MODEL_ARTIFACTS.items():
+        chosen = [next((n for n in group if os.path.exists(os.path.join(source_dir, n))), None) for group in groups]
+        if all(chosen):
+            models.append(model_type)
+            names.extend(chosen)
+
+    for name in names:
+        src = os.path.join(source_dir, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(tmp_path, name))
+        else:
+            shutil.copy2(src, os.path.join(tmp_path, name))
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "name": bundle_name(version),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "models": models,
+        "feature_columns": list(feature_columns),
+        "encoder_classes": encoder_classes,
+        "preprocessors": _preprocessor_state(tmp_path),
+        "files": _file_checksums(tmp_path),
+        **(info or {}),
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    # The bundle directory appears complete in one rename, then CURRENT flips to it
+    os.replace(tmp_path, target)
+    pointer_tmp = os.path.join(model_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(pointer_tmp, "w") as f:
+        f.write(bundle_name(version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(model_dir, CURRENT_FILE))
+
+    prune_bundles(model_dir)
+    return manifest
+
+def prune_bundles(model_dir: str, keep: int = KEEP_BUNDLES):
+    """
+    Remove all but the newest `keep` bundles. Workers still memory-mapping a removed
+    bundle keep their mappings (the files live on until unmapped).
+    """
+    current = current_bundle(model_dir)
+    for version in bundle_versions(model_dir)[:-keep]:
+        if bundle_name(version) != current:
+            shutil.rmtree(os.path.join(model_dir, BUNDLE_DIR, bundle_name(version)), ignore_errors=True)
+
+def _file_checksums(bundle_path: str) -> Dict[str, Dict]:
+    files = {}
+    for dirpath, _, filenames in os.walk(bundle_path):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, bundle_path).replace(os.sep, "/")
+            files[name] = {"sha256": _sha256(path), "size": os.path.getsize(path)}
+    return files
+
+def _preprocessor_state(bundle_path: str) -> Dict[str, Dict]:
+    """Fitted scaler / PCA parameters, recorded so a bundle can be audited without unpickling"""
+    import joblib
+    state = {}
+    for name in ("knn_scaler", "ann_scaler"):
+        path = os.path.join(bundle_path, f"{name}.joblib")
+        if os.path.exists(path):
+            scaler = joblib.load(path)
+            state[name] = {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}
+    path = os.path.join(bundle_path, "knn_pca.joblib")
+    if os.path.exists(path):
+        pca = joblib.load(path)
+        state["knn_pca"] = {
+            "n_components": int(pca.n_components_),
+            "explained_variance": float(pca.explained_variance_ratio_.sum()),
+        }
+    return state
+
+def _sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
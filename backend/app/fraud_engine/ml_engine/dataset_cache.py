@@ -0,0 +1,267 @@
+"""
+Columnar cache of the Kaggle IEEE-CIS transaction data
+The selected columns of train_transaction.csv are parsed once and stored as one
+.npy file per column (categoricals as int codes + a sorted vocabulary), plus a
+manifest with labels, fill values and encoder classes. Later loads are
+memory-mapped, so training and ingestion skip CSV parsing entirely.
+"""
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+CACHE_VERSION = 1
+
+# Every column either consumer needs: ids/labels for ingestion, features for training
+CACHE_COLUMNS = [
+    'TransactionID', 'isFraud', 'TransactionDT', 'TransactionAmt',
+    'ProductCD', 'card1', 'card2', 'card3', 'card4', 'card5', 'card6',
+    'addr1', 'addr2', 'P_emaildomain', 'R_emaildomain',
+    'C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'C8', 'C9', 'C10', 'C11', 'C12', 'C13', 'C14',
+    'D1', 'D2', 'D3', 'D4', 'D5', 'D6', 'D7', 'D8', 'D9', 'D10', 'D11', 'D12', 'D13', 'D14', 'D15',
+    'M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M7', 'M8', 'M9'
+]
+
+CATEGORICAL_COLUMNS = [
+    'ProductCD', 'card4', 'card6', 'P_emaildomain', 'R_emaildomain',
+    'M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M7', 'M8', 'M9'
+]
+
+# Ids/timestamps/amounts stay 64-bit (exact); other numeric features are float32
+COLUMN_DTYPES = {
+    'TransactionID': np.int64,
+    'isFraud': np.int8,
+    'TransactionDT': np.int64,
+    'TransactionAmt': np.float64,
+}
+
+# Value LabelEncoder sees for missing categoricals (matches train_models preprocessing)
+MISSING_CATEGORY = 'unknown'
+
+def default_cache_dir(source_path: str) -> str:
+    return os.getenv("DATASET_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(source_path)), ".cache")
+
+class CachedDataset:
+    """A loaded cache: memory-mapped columns (optionally truncated to the first nrows)"""
+
+    def __init__(self, path: str, manifest: Dict, nrows: Optional[int] = None):
+        self.path = path
+        self.manifest = manifest
+        self.categories: Dict[str, List[str]] = manifest["categories"]
+        self.rows = manifest["rows"] if nrows is None else min(nrows, manifest["rows"])
+        self._full = self.rows == manifest["rows"]
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of a stored column (categoricals are int codes, -1 = missing)"""
+        if name not in self._columns:
+            values = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+            self._columns[name] = values[:self.rows]
+        return self._columns[name]
+
+    def frame(self, columns: List[str], start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """
+        Raw rows [start, stop) as a DataFrame: numeric columns with NaN preserved and
+        categoricals as pandas Categoricals - the same frame read_csv with category dtypes gives
+        """
+        stop = self.rows if stop is None else min(stop, self.rows)
+        data = {}
+        for name in columns:
+            values = self.column(name)[start:stop]
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(values, categories=self.categories[name])
+            else:
+                data[name] = values
+        return pd.DataFrame(data, index=pd.RangeIndex(start, stop), copy=False)
+
+    def encoder_classes(self, name: str) -> List[str]:
+        """Classes a LabelEncoder fitted on this column (missing filled with 'unknown') would have"""
+        if not self._full:
+            # A truncated view may not contain every category of the full cache; keep only those present
+            present = np.unique(self.column(name))
+            classes = [self.categories[name][code] for code in present if code >= 0]
+            if present.size and present[0] < 0:
+                classes.append(MISSING_CATEGORY)
+            return sorted(classes)
+        return self.manifest["encoder_classes"][name]
+
+    def fill_value(self, name: str) -> float:
+        """Median used to fill missing values of a numeric column"""
+        if self._full:
+            return self.manifest["fill_values"][name]
+        return _median(self.column(name))
+
+    def encoded(self, name: str) -> np.ndarray:
+        """Categorical column encoded exactly as LabelEncoder(fillna('unknown')) would"""
+        classes = self.encoder_classes(name)
+        index = {value: i for i, value in enumerate(classes)}
+        # Position -1 of the lookup handles missing codes
+        lookup = np.array(
+            [index[value] for value in self.categories[name]] + [index.get(MISSING_CATEGORY, 0)],
+            dtype=np.int32
+        )
+        return lookup[self.column(name)]
+
+    def training_frame(self, features: List[str], dtype=None) -> pd.DataFrame:
+        """
+        Model-ready features: categoricals label-encoded, numeric NaNs filled with the median.
+        With a dtype, columns are written straight into one preallocated matrix of that dtype
+        (no per-column temporaries or consolidation copy).
+        """
+        if dtype is not None:
+            # Fortran order keeps each column contiguous while filling
+            out = np.empty((self.rows, len(features)), dtype=dtype, order='F')
+            for j, name in enumerate(features):
+                if name in self.categories:
+                    out[:, j] = self.encoded(name)
+                else:
+                    column = out[:, j]
+                    column[...] = self.column(name)
+                    column[np.isnan(column)] = self.fill_value(name)
+            return pd.DataFrame(out, columns=features, copy=False)
+
+        data = {}
+        for name in features:
+            if name in self.categories:
+                data[name] = self.encoded(name)
+            else:
+                values = self.column(name)
+                data[name] = np.where(np.isnan(values), values.dtype.type(self.fill_value(name)), values)
+        return pd.DataFrame(data)
+
+class DatasetCache:
+    """
+    Build-once cache for one source CSV. The cache directory name is a hash of the
+    source file's path, size and mtime plus the column layout, so editing the CSV
+    or the config produces a new cache instead of reading a stale one.
+    """
+
+    def __init__(self, source_path: str, cache_dir: Optional[str] = None, columns: Optional[List[str]] = None):
+        self.source_path = os.path.abspath(source_path)
+        self.cache_dir = cache_dir or default_cache_dir(source_path)
+        self.columns = columns or CACHE_COLUMNS
+
+    @property
+    def key(self) -> str:
+        stat = os.stat(self.source_path)
+        config = {
+            "version": CACHE_VERSION,
+            "source": self.source_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "columns": self.columns,
+            "categorical": [c for c in self.columns if c in CATEGORICAL_COLUMNS],
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    @property
+    def path(self) -> str:
+        name = os.path.splitext(os.path.basename(self.source_path))[0]
+        return os.path.join(self.cache_dir, f"{name}-{self.key}")
+
+    def manifest(self) -> Optional[Dict]:
+        manifest_path = os.path.join(self.path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def load(self, nrows: Optional[int] = None, rebuild: bool = False) -> CachedDataset:
+        """
+        Open the cache, building it first if it is missing or holds fewer than nrows rows.
+        A cache of the whole file serves any nrows by truncating the memory map.
+        """
+        manifest = None if rebuild else self.manifest()
+        if manifest is None or not self._covers(manifest, nrows):
+            manifest = self.build(nrows)
+        return CachedDataset(self.path, manifest, nrows)
+
+    def build(self, nrows: Optional[int] = None, chunksize: int = 100000) -> Dict:
+        """Parse the CSV once in chunks, writing every column straight into a .npy memmap"""
+        rows = 0
+        for chunk in pd.read_csv(self.source_path, usecols=['isFraud'], nrows=nrows, chunksize=500000):
+            rows += len(chunk)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        categorical = [c for c in self.columns if c in CATEGORICAL_COLUMNS]
+        outputs = {}
+        for name in self.columns:
+            dtype = np.int32 if name in categorical else COLUMN_DTYPES.get(name, np.float32)
+            outputs[name] = np.lib.format.open_memmap(os.path.join(tmp_path, f"{name}.npy"), mode='w+',
+                                                      dtype=dtype, shape=(rows,))
+        # Vocabulary in first-seen order while streaming; sorted and remapped at the end
+        vocab: Dict[str, Dict[str, int]] = {name: {} for name in categorical}
+
+        offset = 0
+        reader = pd.read_csv(self.source_path, usecols=self.columns, nrows=nrows, chunksize=chunksize,
+                             dtype={name: str for name in categorical})
+        for chunk in reader:
+            end = offset + len(chunk)
+            for name in self.columns:
+                if name in categorical:
+                    codes, uniques = pd.factorize(chunk[name])
+                    seen = vocab[name]
+                    mapping = np.array([seen.setdefault(value, len(seen)) for value in uniques] + [-1], dtype=np.int32)
+                    outputs[name][offset:end] = mapping[codes]
+                else:
+                    outputs[name][offset:end] = chunk[name].to_numpy(dtype=outputs[name].dtype)
+            offset = end
+
+        categories, encoder_classes, fill_values = {}, {}, {}
+        for name in self.columns:
+            values = outputs[name]
+            if name in categorical:
+                ordered = sorted(vocab[name])
+                remap = np.empty(len(ordered) + 1, dtype=np.int32)
+                for new, value in enumerate(ordered):
+                    remap[vocab[name][value]] = new
+                remap[-1] = -1
+                values[:] = remap[values]
+                categories[name] = ordered
+                classes = list(ordered)
+                if (values < 0).any():
+                    classes.append(MISSING_CATEGORY)
+                encoder_classes[name] = sorted(classes)
+            elif name not in ('TransactionID', 'isFraud', 'TransactionDT'):
+                fill_values[name] = _median(values)
+            values.flush()
+        del outputs
+
+        manifest = {
+            "version": CACHE_VERSION,
+            "source": self.source_path,
+            "rows": rows,
+            "complete": nrows is None or rows < nrows,
+            "columns": self.columns,
+            "categories": categories,
+            "encoder_classes": encoder_classes,
+            "fill_values": fill_values,
+        }
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        # Swap the finished cache into place; readers never see a partial directory
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp_path, self.path)
+        return manifest
+
+    def _covers(self, manifest: Dict, nrows: Optional[int]) -> bool:
+        if manifest.get("version") != CACHE_VERSION:
+            return False
+        if manifest["complete"]:
+            return True
+        return nrows is not None and manifest["rows"] >= nrows
+
+def _median(values: np.ndarray) -> float:
+    median = np.nanmedian(values) if values.size else np.nan
+    return float(median) if not np.isnan(median) else 0.0
@@ -0,0 +1,94 @@
+"""
+Flattened decision tree evaluator
+A fitted DecisionTreeClassifier is copied into flat node arrays (feature,
+threshold, left, right, leaf probability) and walked directly, skipping
+sklearn's input validation and dispatch. Inputs are cast to float32 and leaf
+values taken exactly as DecisionTreeClassifier.predict_proba returns them, so
+the probabilities are bit-identical to sklearn's.
+"""
+import numpy as np
+
+LEAF = -1  # sklearn's TREE_LEAF marker in children_left / children_right
+
+class FlatTree:
+    """Node arrays of one fitted tree; predicts the probability of the positive class"""
+
+    def __init__(self, feature, threshold, left, right, missing_left, proba, n_features, max_depth):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.proba = np.asarray(proba, dtype=np.float64)
+        self.n_features = n_features
+        self.max_depth = max_depth
+        # Batch walk: leaves point to themselves and read feature 0, so no per-step masking is needed
+        is_leaf = self.left == LEAF
+        nodes = np.arange(len(self.left))
+        self._walk_left = np.where(is_leaf, nodes, self.left)
+        self._walk_right = np.where(is_leaf, nodes, self.right)
+        self._walk_feature = np.where(is_leaf, 0, self.feature)
+        # Plain lists for the single-row walk: list indexing is far cheaper than NumPy scalar access
+        self._nodes = (self.feature.tolist(), self.threshold.tolist(), self.left.tolist(),
+                       self.right.tolist(), self.missing_left.tolist(), self.proba.tolist())
+
+    @classmethod
+    def from_sklearn(cls, model, positive_class=1) -> "FlatTree":
+        tree = model.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Only single-output trees can be flattened")
+        value = tree.value[:, 0, :model.n_classes_].copy()
+        if _normalize_leaves():
+            # Same normalisation as DecisionTreeClassifier.predict_proba, applied per node up front
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+        column = list(model.classes_).index(positive_class)
+        return cls(tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                   tree.missing_go_to_left, value[:, column], tree.n_features, tree.max_depth)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.left)
+
+    def predict_row(self, x) -> float:
+        """Walk one sample (1-D, length n_features) from the root to its leaf"""
+        feature, threshold, left, right, missing_left, proba = self._nodes
+        row = np.asarray(x, dtype=np.float32).ravel().tolist()
+        node = 0
+        while left[node] != LEAF:
+            value = row[feature[node]]
+            # NaN compares False, so missing values go right unless the split sends them left
+            if value <= threshold[node] or (value != value and missing_left[node]):
+                node = left[node]
+            else:
+                node = right[node]
+        return proba[node]
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Positive-class probability for each row of X, shape (n,)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(len(X))
+        nodes = np.zeros(len(X), dtype=np.intp)
+        # Every row advances one level per step; rows already on a leaf stay put (self-loops)
+        for _ in range(self.max_depth):
+            values = X[rows, self._walk_feature[nodes]]
+            go_left = (values <= self.threshold[nodes]) | (np.isnan(values) & self.missing_left[nodes])
+            nodes = np.where(go_left, self._walk_left[nodes], self._walk_right[nodes])
+        return self.proba[nodes]
+
+def _normalize_leaves() -> bool:
+    """
+    sklearn 1.4+ stores class fractions in tree_.value and returns them as-is;
+    older versions store weighted counts and normalise them in predict_proba
+    """
+    import sklearn  # Already loaded with the model; not imported with this module
+    from sklearn.utils.fixes import parse_version
+    return parse_version(sklearn.__version__) < parse_version("1.4")
+
+def mismatches(model, flat_tree: FlatTree, X) -> int:
+    """Rows where the flat tree's probability is not bit-identical to sklearn's"""
+    expected = model.predict_proba(np.asarray(X, dtype=np.float32))[:, list(model.classes_).index(1)]
+    return int(np.count_nonzero(flat_tree.predict_proba(X) != expected))
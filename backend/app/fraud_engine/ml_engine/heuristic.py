@@ -0,0 +1,30 @@
+"""
+Rule-of-thumb fraud probability used when the ML models are unavailable or too slow.
+Pure Python on purpose: the scorer can call it on the event loop without importing
+NumPy or waiting for the models to load.
+"""
+
+HIGH_RISK_CATEGORIES = ['crypto', 'electronics', 'transfer', 'gambling', 'gaming']
+
+def heuristic_probability(transaction) -> float:
+    base_risk = 0.05
+
+    # Amount-based risk
+    if transaction.amount > 5000:
+        base_risk += 0.4
+    elif transaction.amount > 1000:
+        base_risk += 0.2
+    elif transaction.amount > 500:
+        base_risk += 0.1
+
+    # Category-based risk
+    if transaction.category.lower() in HIGH_RISK_CATEGORIES:
+        base_risk += 0.3
+
+    # Balance change risk
+    if transaction.old_balance_orig and transaction.new_balance_orig:
+        balance_change = abs(transaction.old_balance_orig - transaction.new_balance_orig)
+        if balance_change > transaction.amount * 1.5:  # Suspicious balance change
+            base_risk += 0.2
+
+    return min(float(base_risk), 0.95)
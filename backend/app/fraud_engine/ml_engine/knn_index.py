@@ -0,0 +1,209 @@
+"""
+Inverted-file (IVF) index for the KNN model
+The PCA-space training rows are clustered with k-means into `nlist` lists and
+stored contiguously per list. A query scans only the `nprobe` lists whose
+centroids are closest, trading a little recall for a search that no longer
+touches every training row. Index files are plain .npy arrays loaded with
+mmap_mode='r', so every worker process shares one copy through the page cache.
+nprobe is chosen at query time (KNN_NPROBE env var in MLEngine); measure its
+recall against exact search with recall_at_k or:
+    python -m app.fraud_engine.ml_engine.knn_index knn.joblib knn_index
+"""
+import os
+import sys
+import json
+import shutil
+import numpy as np
+from typing import Dict, List, Optional
+
+INDEX_FILES = ("centroids", "vectors", "labels", "ids", "offsets")
+
+def default_nlist(n_samples: int) -> int:
+    """~4*sqrt(n) lists keeps both the centroid scan and the probed lists small"""
+    return int(max(1, min(n_samples, round(4 * np.sqrt(n_samples)))))
+
+def _squared_distances(X: np.ndarray, C: np.ndarray, C_norms: np.ndarray) -> np.ndarray:
+    distances = np.einsum('ij,ij->i', X, X)[:, None] - 2.0 * (X @ C.T) + C_norms[None, :]
+    return np.maximum(distances, 0.0, out=distances)
+
+def _assign(X: np.ndarray, C: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    C_norms = np.einsum('ij,ij->i', C, C)
+    assignment = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), chunk_size):
+        block = X[start:start + chunk_size]
+        assignment[start:start + chunk_size] = _squared_distances(block, C, C_norms).argmin(axis=1)
+    return assignment
+
+def kmeans(X: np.ndarray, k: int, n_iter: int = 10, sample_size: Optional[int] = None, seed: int = 42) -> np.ndarray:
+    """Lloyd's k-means on a random sample of X; returns (k, d) float32 centroids"""
+    rng = np.random.RandomState(seed)
+    sample_size = min(len(X), sample_size or k * 32)
+    sample = X[rng.choice(len(X), sample_size, replace=False)] if sample_size < len(X) else X
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = _assign(sample, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        # Per-cluster sums via one sorted reduceat (np.add.at is far slower)
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[~empty]
+        sums = np.add.reduceat(sample[order], starts, axis=0, dtype=np.float64)
+        centroids[~empty] = sums / counts[~empty, None]
+        # Reseed empty lists on random sample points
+        centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+    return centroids
+
+class IVFIndex:
+    """
+    Exact distances within the probed lists; predict_proba mirrors
+    KNeighborsClassifier (uniform or inverse-distance weights)
+    """
+
+    def __init__(self, centroids, vectors, labels, ids, offsets, meta: Dict):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.labels = labels
+        self.ids = ids
+        self.offsets = offsets
+        self.meta = meta
+        self.classes = np.asarray(meta["classes"])
+        self.n_neighbors = meta["n_neighbors"]
+        self.weights = meta["weights"]
+        self._centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, X, y, classes, n_neighbors: int = 5, weights: str = "uniform",
+              nlist: Optional[int] = None, seed: int = 42) -> "IVFIndex":
+        """y holds class indices into `classes` (as KNeighborsClassifier._y)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        nlist = nlist or default_nlist(len(X))
+        centroids = kmeans(X, nlist, seed=seed)
+        assignment = _assign(X, centroids)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+        meta = {
+            "classes": np.asarray(classes).tolist(),
+            "n_neighbors": int(n_neighbors),
+            "weights": weights,
+            "nlist": int(nlist),
+            "rows": int(len(X)),
+            "dim": int(X.shape[1]),
+        }
+        return cls(centroids, X[order], np.asarray(y, dtype=np.int8)[order], order.astype(np.int64), offsets, meta)
+
+    @classmethod
+    def from_sklearn(cls, knn, nlist: Optional[int] = None) -> "IVFIndex":
+        """Index over the rows a fitted KNeighborsClassifier searches"""
+        if not callable(knn.weights) and knn.weights in ("uniform", "distance") and knn.effective_metric_ == "euclidean":
+            return cls.build(knn._fit_X, knn._y, knn.classes_, knn.n_neighbors, knn.weights, nlist)
+        raise ValueError("Only euclidean KNN with uniform or distance weights can be indexed")
+
+    def save(self, path: str):
+        """Write to a temp directory and swap it in, so readers never see a partial index"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in INDEX_FILES:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in INDEX_FILES}
+        # Centroids are scanned on every query; keep them in process memory
+        arrays["centroids"] = np.array(arrays["centroids"])
+        return cls(meta=meta, **arrays)
+
+    def _probe_order(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        distances = self._centroid_norms - 2.0 * (self.centroids @ q)
+        if nprobe >= self.nlist:
+            return np.argsort(distances)
+        nearest = np.argpartition(distances, nprobe - 1)[:nprobe]
+        return nearest[np.argsort(distances[nearest])]
+
+    def _candidates(self, q: np.ndarray, k: int, nprobe: int):
+        lists = self._probe_order(q, nprobe)
+        sizes = self.offsets[lists + 1] - self.offsets[lists]
+        if sizes.sum() < k and nprobe < self.nlist:
+            # Too few rows in the probed lists: widen to every list, nearest first
+            lists = self._probe_order(q, self.nlist)
+            sizes = self.offsets[lists + 1] - self.offsets[lists]
+            lists = lists[:np.searchsorted(np.cumsum(sizes), k) + 1]
+        slices = [slice(self.offsets[l], self.offsets[l + 1]) for l in lists]
+        return (np.concatenate([self.vectors[s] for s in slices]),
+                np.concatenate([self.labels[s] for s in slices]),
+                np.concatenate([self.ids[s] for s in slices]))
+
+    def search(self, Q, k: Optional[int] = None, nprobe: int = 16):
+        """(distances, class indices, training row ids), each (n_queries, k), nearest first"""
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float32))
+        k = k or self.n_neighbors
+        distances = np.empty((len(Q), k), dtype=np.float32)
+        labels = np.empty((len(Q), k), dtype=np.int8)
+        ids = np.empty((len(Q), k), dtype=np.int64)
+        for i, q in enumerate(Q):
+            vectors, list_labels, list_ids = self._candidates(q, k, nprobe)
+            diff = vectors - q
+            d = np.einsum('ij,ij->i', diff, diff)
+            nearest = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+            nearest = nearest[np.argsort(d[nearest], kind='stable')]
+            distances[i] = np.sqrt(d[nearest])
+            labels[i] = list_labels[nearest]
+            ids[i] = list_ids[nearest]
+        return distances, labels, ids
+
+    def predict_proba(self, Q, nprobe: int = 16, positive_class=1) -> np.ndarray:
+        """Positive-class probability per query, weighted as KNeighborsClassifier does"""
+        distances, labels, _ = self.search(Q, nprobe=nprobe)
+        if self.weights == "distance":
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / distances.astype(np.float64)
+            # Exact matches take all the weight, as in sklearn
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+        else:
+            weights = np.ones(distances.shape)
+        positive = int(np.flatnonzero(self.classes == positive_class)[0])
+        total = weights.sum(axis=1)
+        total[total == 0.0] = 1.0
+        return (weights * (labels == positive)).sum(axis=1) / total
+
+def recall_at_k(index: IVFIndex, knn, Q, nprobes: List[int], k: Optional[int] = None) -> Dict[int, float]:
+    """Fraction of the exact k nearest neighbours (from the sklearn model) the index returns, per nprobe"""
+    k = k or index.n_neighbors
+    exact = knn.kneighbors(np.asarray(Q, dtype=np.float32), n_neighbors=k, return_distance=False)
+    recalls = {}
+    for nprobe in nprobes:
+        _, _, found = index.search(Q, k, nprobe)
+        hits = sum(len(np.intersect1d(a, b)) for a, b in zip(exact, found))
+        recalls[nprobe] = hits / exact.size
+    return recalls
+
+if __name__ == "__main__":
+    import time
+    import joblib
+    source, target = sys.argv[1], sys.argv[2]
+    model = joblib.load(source)
+    start = time.time()
+    ivf = IVFIndex.from_sklearn(model)
+    ivf.save(target)
+    print(f"Indexed {len(ivf):,} rows into {ivf.nlist} lists in {time.time() - start:.1f}s -> {target}")
+    probe = model._fit_X[np.random.RandomState(0).choice(len(model._fit_X), min(1000, len(model._fit_X)), replace=False)]
+    probe = probe + np.random.RandomState(1).normal(scale=0.1, size=probe.shape)
+    for nprobe, recall in recall_at_k(ivf, model, probe, [1, 4, 16, 64]).items():
+        print(f"  nprobe={nprobe:<3} recall@{ivf.n_neighbors}={recall:.4f}")
@@ -1,83 +1,210 @@
 """
 ML Engine for fraud detection using trained models
 Supports: Decision Tree, Naive Bayes, KNN, ANN
+The ANN is served from exported NumPy weights (ann_weights.npz) when present,
+so TensorFlow is only imported as a fallback for a bare ann_model.h5.
+The decision tree is scored through its flattened node arrays (FlatTree), and
+KNN searches a memory-mapped IVF index (knn_index/) instead of every training row.
+The ensemble extracts features once and scores its members concurrently in a
+thread pool; in cascade mode KNN/ANN only run on rows the cheap models disagree on.
+Artifacts are read from the current versioned bundle (bundle.py); a new bundle
+is picked up in the background and swapped in without a restart. Bundle arrays
+are memory-mapped, and get_engine() gives each process one engine per model
+type, so workers on a host share model memory through the page cache.
+Probabilities are cached per feature-vector fingerprint on each engine, so
+repeated feature vectors skip the model.
 """
 import os
+import time
+import hashlib
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
+from app.fraud_engine.ml_engine.numpy_ann import NumpyANN
+from app.fraud_engine.ml_engine.flat_tree import FlatTree
+from app.fraud_engine.ml_engine.knn_index import IVFIndex
+from app.fraud_engine.ml_engine.heuristic import heuristic_probability
+from app.fraud_engine.ml_engine.bundle import (
+    BUNDLE_DIR, BundleError, current_bundle, resolve_model_dir, load_manifest
+)
+from app.core.config import settings
+from app.core.cache import LRUCache
+
+# Above this batch size sklearn's compiled traversal beats the NumPy level-by-level walk
+FLAT_TREE_MAX_BATCH = 500
+
+# Cascade stages: cheap members score every row, costly ones only the uncertain band
+CASCADE_CHEAP_MODELS = ["naive_bayes", "decision_tree"]
+CASCADE_COSTLY_MODELS = ["knn", "ann"]
+
+# One thread per member, but no pool on a single core (threads would only add overhead)
+ENSEMBLE_THREADS = min(len(CASCADE_CHEAP_MODELS + CASCADE_COSTLY_MODELS), os.cpu_count() or 1)
+
+_ensemble_pool = None
+
+def ensemble_pool() -> Optional[ThreadPoolExecutor]:
+    """Threads shared by all ensembles; the sklearn/NumPy kernels release the GIL"""
+    global _ensemble_pool
+    if _ensemble_pool is None and ENSEMBLE_THREADS > 1:
+        _ensemble_pool = ThreadPoolExecutor(max_workers=ENSEMBLE_THREADS, thread_name_prefix="ensemble")
+    return _ensemble_pool
+
+_engines: Dict[tuple, "MLEngine"] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(model_type: str = "decision_tree", ensemble_mode: Optional[str] = None) -> "MLEngine":
+    """
+    Process-wide engine per model type. Engines hot-swap bundles themselves, so callers
+    (e.g. a Scorer per request) can share one instead of each loading the models again.
+    """
+    key = (model_type, ensemble_mode or settings.ENSEMBLE_MODE)
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = _engines[key] = MLEngine(model_type, ensemble_mode)
+    return engine
+
+def loaded_engine(model_type: str = "decision_tree", ensemble_mode: Optional[str] = None) -> Optional["MLEngine"]:
+    """The process-wide engine if it has been created, without loading anything"""
+    return _engines.get((model_type, ensemble_mode or settings.ENSEMBLE_MODE))
 
 class MLEngine:
-    def __init__(self, model_type: str = "decision_tree"):
+    def __init__(self, model_type: str = "decision_tree", ensemble_mode: Optional[str] = None,
+                 shared_from: Optional["MLEngine"] = None, bundle_path: Optional[str] = None):
         """
         Initialize ML Engine
         model_type: 'decision_tree', 'naive_bayes', 'knn', 'ann', or 'ensemble'
+        ensemble_mode: 'parallel' (average every member) or 'cascade'; defaults to settings.ENSEMBLE_MODE
+        shared_from: engine whose feature columns and encoders are reused instead of reloaded
+        bundle_path: load this bundle instead of the one CURRENT points at
         """
         self.model_type = model_type
+        self.ensemble_mode = ensemble_mode or settings.ENSEMBLE_MODE
         self.model = None
+        self.models = {}
         self.scaler = None
         self.pca = None
+        self.tree = None
         self.label_encoders = {}
+        self._encoder_lookups = {}
         self.feature_columns = None
+        self.cascade_stats = {"rows": 0, "escalated": 0}
+        # Feature-row fingerprint -> probability; per engine, so a bundle swap starts empty
+        self.probability_cache = LRUCache(settings.PROBABILITY_CACHE_SIZE)
+        self._shared_from = shared_from
         
-        # Get model directory
+        # Get model directory: base_dir holds the training workspace and the bundles,
+        # model_dir is what this engine loads (the current bundle, or base_dir if unbundled)
         current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.model_dir = os.path.join(current_dir, "..", "..", "ml_models")
+        self.base_dir = shared_from.base_dir if shared_from else os.path.join(current_dir, "..", "..", "ml_models")
+        if shared_from is not None:
+            self.model_dir = shared_from.model_dir
+        else:
+            self.model_dir = bundle_path or resolve_model_dir(self.base_dir)
+        self.manifest = shared_from.manifest if shared_from else self._read_manifest()
+        self.bundle = self.manifest["name"] if self.manifest else None
+        
+        # Hot-swap state: _swapped is a fully loaded engine for a newer bundle
+        self._swapped = None
+        self._reload_lock = threading.Lock()
+        self._next_reload_check = time.monotonic() + settings.MODEL_RELOAD_INTERVAL
+        self._failed_bundle = None
         
         # Load models if available
         self._load_models()
     
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        if self.model_dir == self.base_dir:
+            return None
+        try:
+            return load_manifest(self.model_dir)
+        except BundleError as e:
+            print(f"Error reading model bundle manifest: {e}")
+            return None
+    
+    def _load_artifact(self, path: str):
+        """Bundle files are immutable, so their arrays can be memory-mapped and shared between workers"""
+        import joblib
+        return joblib.load(path, mmap_mode='r' if self.manifest else None)
+    
     def _load_models(self):
         """Load trained models and preprocessors"""
         try:
             import joblib
-            import tensorflow as tf
             
             # Load feature columns
             feature_path = os.path.join(self.model_dir, 'feature_columns.joblib')
-            if os.path.exists(feature_path):
+            if self._shared_from is not None:
+                self.feature_columns = self._shared_from.feature_columns
+                self.label_encoders = self._shared_from.label_encoders
+                self._encoder_lookups = self._shared_from._encoder_lookups
+            elif self.manifest:
+                # Feature schema and encoder classes come from the manifest; no encoder unpickling
+                self.feature_columns = self.manifest["feature_columns"]
+                self._encoder_lookups = {
+                    col: {c: i for i, c in enumerate(classes)}
+                    for col, classes in self.manifest["encoder_classes"].items()
+                }
+            elif os.path.exists(feature_path):
                 self.feature_columns = joblib.load(feature_path)
             
             # Load label encoders for categorical features
-            if self.feature_columns:
+            if self.feature_columns and self._shared_from is None and not self.manifest:
                 for col in self.feature_columns:
                     le_path = os.path.join(self.model_dir, f'le_{col}.joblib')
                     if os.path.exists(le_path):
                         self.label_encoders[col] = joblib.load(le_path)
+                        self._encoder_lookup(col)
             
             # Load model based on type
             if self.model_type == "decision_tree":
                 model_path = os.path.join(self.model_dir, 'decision_tree.joblib')
                 if os.path.exists(model_path):
-                    self.model = joblib.load(model_path)
+                    self.model = self._load_artifact(model_path)
+                    self.tree = FlatTree.from_sklearn(self.model)
             
             elif self.model_type == "naive_bayes":
                 model_path = os.path.join(self.model_dir, 'naive_bayes.joblib')
                 if os.path.exists(model_path):
-                    self.model = joblib.load(model_path)
+                    self.model = self._load_artifact(model_path)
             
             elif self.model_type == "knn":
                 scaler_path = os.path.join(self.model_dir, 'knn_scaler.joblib')
                 pca_path = os.path.join(self.model_dir, 'knn_pca.joblib')
+                index_path = os.path.join(self.model_dir, 'knn_index')
                 model_path = os.path.join(self.model_dir, 'knn.joblib')
                 
-                if all(os.path.exists(p) for p in [scaler_path, pca_path, model_path]):
-                    self.scaler = joblib.load(scaler_path)
-                    self.pca = joblib.load(pca_path)
-                    self.model = joblib.load(model_path)
+                if os.path.exists(scaler_path) and os.path.exists(pca_path):
+                    if os.path.isdir(index_path):
+                        # Memory-mapped: workers share the indexed rows through the page cache
+                        self.model = IVFIndex.load(index_path)
+                    elif os.path.exists(model_path):
+                        self.model = self._load_artifact(model_path)
+                    if self.model is not None:
+                        self.scaler = self._load_artifact(scaler_path)
+                        self.pca = self._load_artifact(pca_path)
             
             elif self.model_type == "ann":
                 scaler_path = os.path.join(self.model_dir, 'ann_scaler.joblib')
+                weights_path = os.path.join(self.model_dir, 'ann_weights.npz')
                 model_path = os.path.join(self.model_dir, 'ann_model.h5')
                 
-                if all(os.path.exists(p) for p in [scaler_path, model_path]):
-                    self.scaler = joblib.load(scaler_path)
+                if os.path.exists(scaler_path) and os.path.exists(weights_path):
+                    self.scaler = self._load_artifact(scaler_path)
+                    self.model = NumpyANN.load(weights_path)
+                elif all(os.path.exists(p) for p in [scaler_path, model_path]):
+                    # Not exported yet: needs TensorFlow
+                    import tensorflow as tf
+                    self.scaler = self._load_artifact(scaler_path)
                     self.model = tf.keras.models.load_model(model_path)
             
             elif self.model_type == "ensemble":
-                # Load all models for ensemble
-                self.models = {}
+                # Members share this engine's feature columns and encoders
                 for mt in ["decision_tree", "naive_bayes", "knn", "ann"]:
-                    engine = MLEngine(model_type=mt)
+                    engine = MLEngine(model_type=mt, shared_from=self)
                     if engine.model is not None:
                         self.models[mt] = engine
             
@@ -93,9 +220,39 @@ class MLEngine:
         Extract features from Transaction model
         Maps transaction fields to model features
         """
+        return self._extract_feature_matrix([transaction])
+    
+    def _extract_feature_matrix(self, transactions) -> np.ndarray:
+        """
+        Extract a (n_transactions, n_features) matrix in one pass
+        Categorical columns are encoded column-wise with a class -> index lookup
+        """
         if not self.feature_columns:
             return None
         
+        rows = [self._raw_feature_values(t) for t in transactions]
+        matrix = np.zeros((len(rows), len(self.feature_columns)), dtype=np.float64)
+        
+        for j, col in enumerate(self.feature_columns):
+            column = [row[j] for row in rows]
+            if col in self._encoder_lookups:
+                # Same result as LabelEncoder.transform (index into sorted classes_), 0 if unseen
+                lookup = self._encoder_lookup(col)
+                matrix[:, j] = [lookup.get(str(val), 0) for val in column]
+            else:
+                matrix[:, j] = [hash(val) % 1000 if isinstance(val, str) else float(val) for val in column]
+        
+        return matrix
+    
+    def _encoder_lookup(self, col: str) -> Dict[str, int]:
+        """Cached class -> code mapping for a fitted LabelEncoder (prebuilt from the manifest for bundles)"""
+        if col not in self._encoder_lookups:
+            classes = self.label_encoders[col].classes_
+            self._encoder_lookups[col] = {str(c): i for i, c in enumerate(classes)}
+        return self._encoder_lookups[col]
+    
+    def _raw_feature_values(self, transaction) -> list:
+        """Raw (unencoded) values for each feature column of a single transaction"""
         features = {}
         
         # Map transaction fields to feature columns
@@ -128,28 +285,15 @@ class MLEngine:
         for i in range(1, 10):
             features[f'M{i}'] = 'T' if i % 2 == 0 else 'F'
         
-        # Build feature vector
-        feature_vector = []
+        values = []
         for col in self.feature_columns:
             if col in feature_mapping:
-                val = feature_mapping[col]
+                values.append(feature_mapping[col])
             elif col in features:
-                val = features[col]
+                values.append(features[col])
             else:
-                val = 0.0  # Default
-            
-            # Encode categorical features
-            if col in self.label_encoders:
-                try:
-                    val = self.label_encoders[col].transform([str(val)])[0]
-                except:
-                    val = 0
-            elif isinstance(val, str):
-                val = hash(val) % 1000  # Simple hash encoding
-            
-            feature_vector.append(float(val))
-        
-        return np.array([feature_vector])
+                values.append(0.0)  # Default
+        return values
     
     def _map_category_to_product_cd(self, category: str) -> str:
         """Map category to ProductCD"""
@@ -167,67 +311,165 @@ class MLEngine:
         Predict fraud probability for a transaction
         Returns: probability between 0 and 1
         """
-        if self.model is None:
-            return self._heuristic_prediction(transaction)
+        return float(self.predict_batch([transaction])[0])
+    
+    @property
+    def probability_cache_stats(self) -> Dict[str, Any]:
+        """Hit rates of the serving engine's feature-fingerprint cache"""
+        return (self._swapped or self).probability_cache.stats()
+    
+    @property
+    def serving_bundle(self) -> Optional[str]:
+        """Bundle predictions are currently made with (changes after a hot swap)"""
+        return (self._swapped or self).bundle
+    
+    def _serving_engine(self) -> "MLEngine":
+        """
+        Engine to score with. Every MODEL_RELOAD_INTERVAL seconds CURRENT is re-read; a new
+        bundle is verified and loaded on a background thread, then swapped in with a single
+        reference assignment. Calls already running keep the engine they started with.
+        """
+        if settings.MODEL_RELOAD_INTERVAL > 0 and self._shared_from is None:
+            now = time.monotonic()
+            if now >= self._next_reload_check:
+                self._next_reload_check = now + settings.MODEL_RELOAD_INTERVAL
+                name = current_bundle(self.base_dir)
+                if name and name not in (self.serving_bundle, self._failed_bundle) and not self._reload_lock.locked():
+                    threading.Thread(target=self._swap_to, args=(name,), daemon=True).start()
+        return self._swapped or self
+    
+    def _swap_to(self, name: str):
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            path = os.path.join(self.base_dir, BUNDLE_DIR, name)
+            load_manifest(path, verify=True)
+            engine = MLEngine(self.model_type, self.ensemble_mode, bundle_path=path)
+            if engine.model is None and not engine.models:
+                raise ValueError(f"no {self.model_type} model in the bundle")
+            self._swapped = engine
+            print(f"ML engine ({self.model_type}) switched to model bundle {name}")
+        except Exception as e:
+            self._failed_bundle = name
+            print(f"Model bundle {name} not loaded, keeping {self.serving_bundle}: {e}")
+        finally:
+            self._reload_lock.release()
+    
+    def predict_batch(self, transactions) -> np.ndarray:
+        """
+        Predict fraud probabilities for many transactions in one vectorized call
+        Returns: array of probabilities between 0 and 1, in input order
+        """
+        return self._serving_engine()._score_batch(transactions)
+    
+    def _score_batch(self, transactions) -> np.ndarray:
+        if not transactions:
+            return np.zeros(0)
+        
+        if self.model is None and not self.models:
+            return self._heuristic_batch(transactions)
         
         try:
-            # Extract features
-            features = self._extract_features_from_transaction(transaction)
+            # Extract features (once, also for the ensemble)
+            features = self._extract_feature_matrix(transactions)
             if features is None:
-                return self._heuristic_prediction(transaction)
-            
-            # Preprocess based on model type
-            if self.model_type == "knn":
-                if self.scaler and self.pca:
-                    features = self.scaler.transform(features)
-                    features = self.pca.transform(features)
-            
-            elif self.model_type == "ann":
-                if self.scaler:
-                    features = self.scaler.transform(features)
-            
-            # Predict
-            if self.model_type == "ann":
-                probability = float(self.model.predict(features, verbose=0)[0][0])
-            elif self.model_type == "ensemble":
-                # Average predictions from all models
-                probabilities = []
-                for mt, engine in self.models.items():
-                    prob = engine.predict(transaction)
-                    probabilities.append(prob)
-                probability = float(np.mean(probabilities))
-            else:
-                probability = float(self.model.predict_proba(features)[0][1])
+                return self._heuristic_batch(transactions)
             
-            return min(max(probability, 0.0), 1.0)
+            return self._cached_predict(features)
         
         except Exception as e:
             print(f"ML prediction error: {e}")
-            return self._heuristic_prediction(transaction)
+            return self._heuristic_batch(transactions)
     
-    def _heuristic_prediction(self, transaction) -> float:
-        """
-        Fallback heuristic prediction when ML models are not available
-        """
-        base_risk = 0.05
+    def _cached_predict(self, features: np.ndarray) -> np.ndarray:
+        """Model probabilities, reused for feature rows this engine has already scored"""
+        if self.probability_cache.maxsize <= 0:
+            return self._predict_uncached(features)
+        keys = [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in features]
+        cached = [self.probability_cache.get(key) for key in keys]
+        missing = [i for i, probability in enumerate(cached) if probability is None]
+        if not missing:
+            return np.array(cached, dtype=np.float64)
+        computed = self._predict_uncached(features[missing] if len(missing) < len(features) else features)
+        for i, probability in zip(missing, computed):
+            cached[i] = probability
+            self.probability_cache.set(keys[i], probability)
+        return np.array(cached, dtype=np.float64)
+    
+    def _predict_uncached(self, features: np.ndarray) -> np.ndarray:
+        if self.model_type == "ensemble":
+            probabilities = self._predict_ensemble(features)
+        else:
+            probabilities = self._predict_features(features)
+        return np.clip(np.asarray(probabilities, dtype=np.float64), 0.0, 1.0)
+    
+    def _predict_features(self, features: np.ndarray) -> np.ndarray:
+        """Probabilities for an already extracted feature matrix (single model types)"""
+        # Preprocess based on model type
+        if self.model_type == "knn":
+            if self.scaler and self.pca:
+                features = self.scaler.transform(features)
+                features = self.pca.transform(features)
         
-        # Amount-based risk
-        if transaction.amount > 5000:
-            base_risk += 0.4
-        elif transaction.amount > 1000:
-            base_risk += 0.2
-        elif transaction.amount > 500:
-            base_risk += 0.1
+        elif self.model_type == "ann":
+            if self.scaler:
+                features = self.scaler.transform(features)
         
-        # Category-based risk
-        high_risk_cats = ['crypto', 'electronics', 'transfer', 'gambling', 'gaming']
-        if transaction.category.lower() in high_risk_cats:
-            base_risk += 0.3
+        # Predict
+        if self.model_type == "ann":
+            if isinstance(self.model, NumpyANN):
+                probabilities = self.model.predict_proba(features)
+            else:
+                probabilities = self.model.predict(features, verbose=0)[:, 0]
+        elif isinstance(self.model, IVFIndex):
+            probabilities = self.model.predict_proba(features, nprobe=settings.KNN_NPROBE)
+        elif self.tree is not None and len(features) <= FLAT_TREE_MAX_BATCH:
+            if len(features) == 1:
+                probabilities = [self.tree.predict_row(features[0])]
+            else:
+                probabilities = self.tree.predict_proba(features)
+        else:
+            probabilities = self.model.predict_proba(features)[:, 1]
         
-        # Balance change risk
-        if transaction.old_balance_orig and transaction.new_balance_orig:
-            balance_change = abs(transaction.old_balance_orig - transaction.new_balance_orig)
-            if balance_change > transaction.amount * 1.5:  # Suspicious balance change
-                base_risk += 0.2
+        return np.asarray(probabilities, dtype=np.float64)
+    
+    def _member_scores(self, names, features: np.ndarray) -> np.ndarray:
+        """(len(names), n_rows) member probabilities, computed concurrently"""
+        pool = ensemble_pool()
+        if len(names) == 1 or pool is None:
+            return np.vstack([self.models[name]._predict_features(features) for name in names])
+        futures = [pool.submit(self.models[name]._predict_features, features) for name in names]
+        return np.vstack([future.result() for future in futures])
+    
+    def _predict_ensemble(self, features: np.ndarray) -> np.ndarray:
+        """
+        parallel: average of every member
+        cascade: rows where the cheap members all agree outside the uncertain band keep
+        their average; only the remaining rows are sent to the costly members
+        """
+        cheap = [name for name in CASCADE_CHEAP_MODELS if name in self.models]
+        costly = [name for name in CASCADE_COSTLY_MODELS if name in self.models]
+        if self.ensemble_mode != "cascade" or not cheap or not costly:
+            return self._member_scores(list(self.models), features).mean(axis=0)
         
-        return min(float(base_risk), 0.95)
+        cheap_scores = self._member_scores(cheap, features)
+        probabilities = cheap_scores.mean(axis=0)
+        clear_cut = ((cheap_scores <= settings.ENSEMBLE_CASCADE_LOW).all(axis=0) |
+                     (cheap_scores >= settings.ENSEMBLE_CASCADE_HIGH).all(axis=0))
+        uncertain = np.flatnonzero(~clear_cut)
+        self.cascade_stats["rows"] += len(features)
+        self.cascade_stats["escalated"] += len(uncertain)
+        
+        if uncertain.size:
+            costly_scores = self._member_scores(costly, features[uncertain])
+            probabilities[uncertain] = np.vstack([cheap_scores[:, uncertain], costly_scores]).mean(axis=0)
+        return probabilities
+    
+    def _heuristic_batch(self, transactions) -> np.ndarray:
+        return np.array([self._heuristic_prediction(t) for t in transactions], dtype=np.float64)
+    
+    def _heuristic_prediction(self, transaction) -> float:
+        """
+        Fallback heuristic prediction when ML models are not available
+        """
+        return heuristic_probability(transaction)
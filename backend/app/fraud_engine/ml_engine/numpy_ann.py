@@ -0,0 +1,93 @@
+"""
+TensorFlow-free inference for the ANN model
+train_ann exports the Dense layers (weights, biases, activations) to a compact
+.npz file; NumpyANN runs the forward pass with plain NumPy matrix products.
+Dropout layers are identity at inference time and are not exported.
+Convert an existing Keras model without retraining:
+    python -m app.fraud_engine.ml_engine.numpy_ann ann_model.h5 ann_weights.npz
+"""
+import sys
+import numpy as np
+from typing import List
+
+ACTIVATIONS = {
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "linear": lambda x: x,
+}
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # Clipping keeps exp within float32 range; sigmoid is already 0/1 there
+    np.clip(x, -80.0, 80.0, out=x)
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1.0
+    return np.reciprocal(x, out=x)
+
+ACTIVATIONS["sigmoid"] = _sigmoid
+
+class NumpyANN:
+    """Dense feed-forward network evaluated in float32, like Keras"""
+
+    def __init__(self, weights: List[np.ndarray], biases: List[np.ndarray], activations: List[str]):
+        unknown = set(activations) - set(ACTIVATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported activations: {sorted(unknown)}")
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyANN":
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(a) for a in data["activations"]]
+            weights = [data[f"W{i}"] for i in range(len(activations))]
+            biases = [data[f"b{i}"] for i in range(len(activations))]
+        return cls(weights, biases, activations)
+
+    @property
+    def n_features(self) -> int:
+        return self.weights[0].shape[0]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Output of the final unit for each row, shape (n,)"""
+        h = np.asarray(X, dtype=np.float32)
+        if h.ndim == 1:
+            h = h[None, :]
+        for W, b, activation in zip(self.weights, self.biases, self.activations):
+            h = h @ W
+            h += b
+            h = ACTIVATIONS[activation](h)
+        return h[:, 0]
+
+def export_keras_model(model, path: str) -> NumpyANN:
+    """Write the Dense layers of a Keras Sequential model to `path` (.npz) and return the NumPy model"""
+    weights, biases, activations = [], [], []
+    for layer in model.layers:
+        params = layer.get_weights()
+        if not params:
+            continue  # Dropout / activation-free layers carry no weights
+        config = layer.get_config()
+        if "units" not in config:
+            raise ValueError(f"Only Dense layers can be exported, got {layer.__class__.__name__}")
+        weights.append(params[0])
+        biases.append(params[1] if len(params) > 1 else np.zeros(params[0].shape[1], dtype=np.float32))
+        activations.append(config.get("activation", "linear"))
+
+    arrays = {f"W{i}": w.astype(np.float32) for i, w in enumerate(weights)}
+    arrays.update({f"b{i}": b.astype(np.float32) for i, b in enumerate(biases)})
+    np.savez(path, activations=np.array(activations), **arrays)
+    return NumpyANN(weights, biases, activations)
+
+def max_deviation(model, numpy_model: NumpyANN, X: np.ndarray) -> float:
+    """Largest absolute difference between Keras and NumPy outputs on X"""
+    expected = model.predict(np.asarray(X, dtype=np.float32), verbose=0)[:, 0]
+    return float(np.max(np.abs(expected - numpy_model.predict_proba(X)))) if len(X) else 0.0
+
+if __name__ == "__main__":
+    import tensorflow as tf
+    source, target = sys.argv[1], sys.argv[2]
+    keras_model = tf.keras.models.load_model(source)
+    exported = export_keras_model(keras_model, target)
+    probe = np.random.RandomState(0).randn(1000, exported.n_features).astype(np.float32)
+    print(f"Exported {len(exported.weights)} layers to {target} "
+          f"(max deviation from Keras: {max_deviation(keras_model, exported, probe):.2e})")
@@ -1,12 +1,51 @@
-from typing import List, Dict, Any
-from app.models.models import Transaction, Rule
+import json
+import time
+import hashlib
+from typing import List, Dict, Any, Optional
+from pymongo import ReturnDocument
+from app.models.models import Transaction, Rule, Counter
+
+# Rule-set revision shared by every worker: a counter document bumped by each rule edit.
+# A worker re-reads it at most once per REVISION_CHECK_INTERVAL, so another worker's
+# edit can go unnoticed for up to that long; the worker that made the edit sees it at once.
+RULES_REVISION_KEY = "rules-revision"
+REVISION_CHECK_INTERVAL = 1.0  # Seconds
+_revision: Optional[int] = None
+_revision_checked = 0.0
+
+async def rules_revision() -> int:
+    global _revision, _revision_checked
+    now = time.monotonic()
+    if _revision is None or now - _revision_checked >= REVISION_CHECK_INTERVAL:
+        counter = await Counter.get_pymongo_collection().find_one({"_id": RULES_REVISION_KEY})
+        _revision, _revision_checked = (counter["seq"] if counter else 0), now
+    return _revision
+
+async def rules_changed():
+    """Called after a rule edit: results scored under the old rules stop matching in every worker"""
+    global _revision, _revision_checked
+    counter = await Counter.get_pymongo_collection().find_one_and_update(
+        {"_id": RULES_REVISION_KEY},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _revision, _revision_checked = counter["seq"], time.monotonic()
 
 class RulesEngine:
     def __init__(self):
         self.rules = []
+        self.version: Optional[str] = None  # Fingerprint of the loaded rule set; changes with any rule edit
+        self.revision: Optional[int] = None  # rules_revision() read before the rules were loaded
 
     async def initialize(self):
+        # Read first: an edit landing mid-load leaves the revision behind, never ahead of the rules
+        self.revision = await rules_revision()
         self.rules = await Rule.find(Rule.is_active == True).sort(+Rule.priority).to_list()
+        self.version = hashlib.sha1(json.dumps(
+            [[str(rule.id), rule.name, rule.description, rule.score_impact, rule.conditions] for rule in self.rules],
+            sort_keys=True, default=str,
+        ).encode()).hexdigest()
 
     def evaluate(self, transaction: Transaction) -> Dict[str, Any]:
         triggered_rules = []
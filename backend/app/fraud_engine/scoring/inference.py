@@ -0,0 +1,120 @@
+"""
+Off-event-loop model inference
+Model prediction is CPU-bound, so the scorer hands it to a dedicated thread pool
+and awaits the result; the worker's event loop keeps serving other requests.
+Threads rather than processes: the models are memory-mapped once per process and
+the sklearn/NumPy kernels release the GIL, so a process pool would only copy the
+models and pickle every batch. Time spent waiting for a free thread (queue) and
+time spent predicting (run) are tracked separately, and a call that exceeds its
+latency budget is answered by the caller's fallback instead.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+
+LATENCY_WINDOW = 1024  # Recent samples kept per timer for percentiles
+
+class LatencyStats:
+    """Count / mean / max over the process lifetime, percentiles over a recent window"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+
+        def percentile(q):
+            return round(recent[min(int(q * len(recent)), len(recent) - 1)] * 1000, 3) if recent else None
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+class InferenceMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queue = LatencyStats()  # Submitted -> picked up by an inference thread
+        self.run = LatencyStats()    # Picked up -> prediction returned
+        self.completed = 0
+        self.timeouts = 0            # Budget exceeded; the fallback answered
+        self.cancelled = 0           # Timed out while still queued, so never run
+
+    def record(self, queue_seconds: float, run_seconds: float):
+        with self._lock:
+            self.queue.record(queue_seconds)
+            self.run.record(run_seconds)
+            self.completed += 1
+
+    def record_timeout(self, cancelled: bool):
+        with self._lock:
+            self.timeouts += 1
+            self.cancelled += int(cancelled)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": inference_workers(),
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "queue": self.queue.snapshot(),
+                "run": self.run.snapshot(),
+            }
+
+metrics = InferenceMetrics()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def inference_workers() -> int:
+    return settings.INFERENCE_WORKERS or min(4, os.cpu_count() or 1)
+
+def inference_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=inference_workers(), thread_name_prefix="inference")
+    return _executor
+
+async def run_inference(predict: Callable, arg, budget_ms: float, fallback: Callable) -> Tuple[Any, bool]:
+    """
+    Run predict(arg) on the inference pool. Returns (result, fell_back): past budget_ms
+    (0 = no limit) the result is fallback(arg), computed on the loop, so it must be cheap.
+    """
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        try:
+            return predict(arg)
+        finally:
+            metrics.record(started - submitted, time.perf_counter() - started)
+
+    future = inference_executor().submit(timed)
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(future), budget_ms / 1000 if budget_ms > 0 else None)
+        return result, False
+    except asyncio.TimeoutError:
+        # A queued call is dropped; one already running finishes in the background and is discarded
+        metrics.record_timeout(cancelled=future.cancelled() or future.cancel())
+        return fallback(arg), True
@@ -1,33 +1,186 @@
-from app.fraud_engine.rules_engine.engine import RulesEngine
-from app.fraud_engine.ml_engine.model import MLEngine
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.cache import LRUCache
+from app.fraud_engine.rules_engine.engine import RulesEngine, rules_revision
+from app.fraud_engine.ml_engine.heuristic import heuristic_probability
+from app.fraud_engine.scoring.inference import run_inference
 from app.models.models import Transaction
 
+# Score thresholds for downstream actions
+ALERT_THRESHOLD = 50  # Create an alert above this score
+CASE_THRESHOLD = 90   # Auto-create a case above this score
+
+# Decisions per scoring tier in this process: 0 = rules + heuristic only, 1 = ML model ran
+tier_counts = {0: 0, 1: 0}
+
+def tier_stats() -> Dict[str, Any]:
+    total = tier_counts[0] + tier_counts[1]
+    return {"tier_0": tier_counts[0], "tier_1": tier_counts[1],
+            "ml_share": round(tier_counts[1] / total, 4) if total else None}
+
+# transaction_id -> (transaction, result, version) for transactions whose writes completed.
+# Payment-switch retries and replays are answered from here; version is the
+# (rules revision, model bundle) the result was scored under.
+score_cache = LRUCache(settings.SCORE_CACHE_SIZE, settings.SCORE_CACHE_TTL)
+stale_lookups = 0  # Cached, but scored under an older rule set or model bundle
+
+def serving_bundle() -> Optional[str]:
+    # Never import or load the models just to read their version
+    model = sys.modules.get("app.fraud_engine.ml_engine.model")
+    engine = model.loaded_engine() if model else None
+    return engine.serving_bundle if engine else None
+
+async def cache_version() -> Tuple[int, Optional[str]]:
+    """
+    The version a cached result must match. The rules revision is shared through the
+    database but re-read at most once a second per worker (see rules_revision), so a
+    rule edit made on another worker can leave its old results served for up to a second
+    """
+    return await rules_revision(), serving_bundle()
+
+def remember_scores(transactions: List[Transaction], results: List[Dict[str, Any]]):
+    """Cache results once their transaction (and any alert / case) has been written"""
+    for transaction, result in zip(transactions, results):
+        score_cache.set(transaction.transaction_id,
+                        (transaction, result, (result["rules_revision"], result["model_bundle"])))
+
+def cached_score(transaction_id: str, version: Tuple[int, Optional[str]]) -> Optional[Tuple[Transaction, Dict[str, Any]]]:
+    """The stored transaction and its result, if cached and scored under `version` (see cache_version)"""
+    global stale_lookups
+    entry = score_cache.get(transaction_id)
+    if entry is None:
+        return None
+    if entry[2] != version:
+        stale_lookups += 1
+        return None
+    return entry[0], entry[1]
+
+def persisted_transaction(transaction_id: str) -> Optional[Transaction]:
+    """The transaction this worker already wrote under transaction_id, whatever it was scored with"""
+    entry = score_cache.get(transaction_id)
+    return entry[0] if entry is not None else None
+
+def cache_stats() -> Dict[str, Any]:
+    model = sys.modules.get("app.fraud_engine.ml_engine.model")
+    engine = model.loaded_engine() if model else None
+    results = score_cache.stats()
+    # A stale entry was found but not used: count it as a miss
+    results.update(hits=results["hits"] - stale_lookups, misses=results["misses"] + stale_lookups,
+                   stale=stale_lookups)
+    lookups = results["hits"] + results["misses"]
+    results["hit_rate"] = round(results["hits"] / lookups, 4) if lookups else None
+    return {"results": results, "probabilities": engine.probability_cache_stats if engine else None}
+
 class Scorer:
-    def __init__(self):
+    """
+    Tiered scoring: tier 0 combines the rules with the heuristic probability into a
+    provisional score, and only a provisional score inside the uncertainty band
+    [band_low, band_high] pays for the ML model (tier 1). Outside the band the tier 0
+    score is the decision. scripts/replay_tiered_scoring.py checks a band against
+    the full path before it is deployed.
+    Results cached per transaction_id (remember_scores, after the writes) answer a
+    retried or replayed transaction with one lookup instead of re-running the pipeline.
+    """
+    def __init__(self, tiered: Optional[bool] = None, band_low: Optional[float] = None,
+                 band_high: Optional[float] = None, use_cache: bool = True):
         self.rules_engine = RulesEngine()
-        self.ml_engine = MLEngine()
+        self.use_cache = use_cache
+        self.tiered = settings.SCORING_TIERED if tiered is None else tiered
+        self.band_low = settings.SCORING_TIER_BAND_LOW if band_low is None else band_low
+        self.band_high = settings.SCORING_TIER_BAND_HIGH if band_high is None else band_high
+
+    @property
+    def ml_engine(self):
+        # Resolved on an inference thread: importing NumPy and loading the models never blocks the loop
+        from app.fraud_engine.ml_engine.model import get_engine
+        return get_engine()  # Shared per process; loading models per Scorer multiplied memory
+
+    def needs_model(self, rule_result: Dict[str, Any], heuristic_prob: float) -> bool:
+        if not self.tiered:
+            return True
+        provisional = self.hybrid_score(rule_result["total_rule_score"], heuristic_prob)
+        return self.band_low <= provisional <= self.band_high
 
     async def calculate_score(self, transaction: Transaction):
+        if self.use_cache:
+            cached = cached_score(transaction.transaction_id, await cache_version())
+            if cached is not None:
+                return cached[1]
         await self.rules_engine.initialize()
+        return await self._score(transaction)
+
+    async def _score(self, transaction: Transaction) -> Dict[str, Any]:
         rule_result = self.rules_engine.evaluate(transaction)
-        ml_prob = self.ml_engine.predict(transaction.amount, transaction.category)
-        
-        ml_score = int(ml_prob * 100)
-        rule_score = rule_result["total_rule_score"]
-        
+        heuristic_prob = heuristic_probability(transaction)
+        if not self.needs_model(rule_result, heuristic_prob):
+            return self._build_result(rule_result, heuristic_prob, tier=0)
+        ml_prob, fell_back = await run_inference(
+            lambda t: self.ml_engine.predict(t), transaction,
+            settings.SCORING_LATENCY_BUDGET_MS, heuristic_probability,
+        )
+        return self._build_result(rule_result, ml_prob, tier=1, ml_fallback=fell_back)
+
+    async def calculate_scores(self, transactions: List[Transaction]) -> List[Dict[str, Any]]:
+        """Score a batch: rules are loaded once and the ML model runs in one vectorized call over the uncertain rows"""
+        if not transactions:
+            return []
+        version = await cache_version() if self.use_cache else None
+        cached = [cached_score(t.transaction_id, version) if self.use_cache else None for t in transactions]
+        pending = [t for t, hit in zip(transactions, cached) if hit is None]
+        if not pending:
+            return [hit[1] for hit in cached]
+        await self.rules_engine.initialize()
+        scored = iter(await self._score_batch(pending))
+        return [hit[1] if hit is not None else next(scored) for hit in cached]
+
+    async def _score_batch(self, transactions: List[Transaction]) -> List[Dict[str, Any]]:
+        rule_results = [self.rules_engine.evaluate(transaction) for transaction in transactions]
+        heuristic_probs = [heuristic_probability(transaction) for transaction in transactions]
+        uncertain = [i for i, (rule_result, heuristic_prob) in enumerate(zip(rule_results, heuristic_probs))
+                     if self.needs_model(rule_result, heuristic_prob)]
+
+        ml_probs, fell_back = {}, False
+        if uncertain:
+            probs, fell_back = await run_inference(
+                lambda ts: self.ml_engine.predict_batch(ts), [transactions[i] for i in uncertain],
+                settings.SCORING_BATCH_LATENCY_BUDGET_MS, lambda ts: [heuristic_probability(t) for t in ts],
+            )
+            ml_probs = dict(zip(uncertain, probs))
+
+        return [
+            self._build_result(rule_result, ml_probs[i], tier=1, ml_fallback=fell_back) if i in ml_probs
+            else self._build_result(rule_result, heuristic_probs[i], tier=0)
+            for i, rule_result in enumerate(rule_results)
+        ]
+
+    def hybrid_score(self, rule_score: int, ml_prob: float) -> int:
         # Hybrid score (weighted average)
         # 40% Rules, 60% ML
-        final_score = int((0.4 * rule_score) + (0.6 * ml_score))
-        
+        return int((0.4 * rule_score) + (0.6 * int(ml_prob * 100)))
+
+    def _build_result(self, rule_result: Dict[str, Any], ml_prob: float, tier: int,
+                      ml_fallback: bool = False) -> Dict[str, Any]:
+        tier_counts[tier] += 1
+        ml_score = int(ml_prob * 100)
+        rule_score = rule_result["total_rule_score"]
+        final_score = self.hybrid_score(rule_score, ml_prob)
+
         # Map to risk level
         risk_level = self._get_risk_level(final_score)
-        
+
         return {
             "risk_score": final_score,
             "risk_level": risk_level,
             "rule_score": rule_score,
             "ml_score": ml_score,
-            "triggered_rules": rule_result["triggered_rules"]
+            "tier": tier,  # 0 = decided by rules + heuristic, 1 = ML model ran
+            "ml_fallback": ml_fallback,  # Heuristic stood in: the model missed its latency budget
+            "triggered_rules": rule_result["triggered_rules"],
+            # What the decision was made with; cached results are only reused while both still hold
+            "rules_version": self.rules_engine.version,
+            "rules_revision": self.rules_engine.revision,
+            "model_bundle": serving_bundle(),
         }
 
     def _get_risk_level(self, score: int) -> str:
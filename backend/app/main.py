@@ -1,3 +1,6 @@
+import sys
+import time
+import asyncio
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
@@ -7,6 +10,8 @@ from app.db.session import init_db
 from app.api.api import api_router
 from app.models.models import Rule
 from app.db.seed import seed_data
+from app.core.config import settings
+from app.core.worker_stats import publish_worker_stats, collect_worker_stats
 from datetime import datetime
 
 async def seed_rules():
@@ -43,6 +48,35 @@ async def seed_rules():
         for rule in baseline_rules:
             await rule.insert()
 
+def load_models():
+    """Runs on a worker thread: imports the ML stack and loads (memory-maps) the models"""
+    start = time.perf_counter()
+    from app.fraud_engine.ml_engine.model import get_engine
+    engine = get_engine()
+    print(f"ML models loaded in {time.perf_counter() - start:.2f}s (bundle: {engine.serving_bundle})")
+    return engine
+
+async def preload_models():
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, load_models)
+    except Exception as e:
+        print(f"Error preloading ML models: {e}")
+
+def worker_info():
+    # Never import or load the models just to report on them
+    model = sys.modules.get("app.fraud_engine.ml_engine.model")
+    engine = model.loaded_engine() if model else None
+    return {"models_loaded": engine is not None, "model_bundle": engine.serving_bundle if engine else None}
+
+async def report_worker_stats():
+    """Refresh this worker's memory report so /health/workers can show every worker"""
+    while True:
+        try:
+            publish_worker_stats(worker_info())
+        except OSError as e:
+            print(f"Error writing worker stats: {e}")
+        await asyncio.sleep(settings.WORKER_STATS_INTERVAL)
+
 app = FastAPI(title="Fraud Detection & Case Management API")
 
 # Initialize MongoDB with Beanie
@@ -55,6 +89,11 @@ async def startup_event():
         await seed_data()
     except Exception as e:
         print(f"Error during database initialization: {e}")
+    
+    # Model loading never delays startup: it runs in the background (or on the first scoring request)
+    if settings.PRELOAD_MODELS:
+        app.state.preload_task = asyncio.create_task(preload_models())
+    app.state.worker_stats_task = asyncio.create_task(report_worker_stats())
 
 app.add_middleware(
     CORSMiddleware,
@@ -68,6 +107,34 @@ app.add_middleware(
 def health_check():
     return {"status": "healthy", "message": "Backend API is running"}
 
+@app.get("/api/health/workers")
+def worker_health():
+    """Memory per API worker on this host; shared model pages are split across workers in pss_mb"""
+    current = publish_worker_stats(worker_info())
+    workers = collect_worker_stats()
+    return {
+        "worker": current,
+        "workers": workers,
+        "totals": {
+            "workers": len(workers),
+            "rss_mb": round(sum(w.get("rss_mb") or 0 for w in workers), 1),
+            "pss_mb": round(sum(w.get("pss_mb") or 0 for w in workers), 1),
+        },
+    }
+
+@app.get("/api/health/scoring")
+def scoring_health():
+    """This worker's inference pool (queue wait and model run time, reported separately) and tier split"""
+    from app.fraud_engine.scoring.inference import metrics
+    from app.fraud_engine.scoring.scorer import tier_stats, cache_stats
+    return {
+        **metrics.snapshot(),
+        "tiers": tier_stats(),
+        "cache": cache_stats(),
+        "latency_budget_ms": settings.SCORING_LATENCY_BUDGET_MS,
+        "batch_latency_budget_ms": settings.SCORING_BATCH_LATENCY_BUDGET_MS,
+    }
+
 @app.get("/api/docs", include_in_schema=False)
 async def api_docs_redirect():
     return RedirectResponse(url="/docs")
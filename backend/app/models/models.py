@@ -1,10 +1,10 @@
 from typing import Optional, List, Any, Dict
 from datetime import datetime, timezone
-from beanie import Document, Link
+from beanie import Document, Indexed, Link
 from pydantic import Field
 
 class Transaction(Document):
-    transaction_id: str = Field(unique=True)
+    transaction_id: Indexed(str, unique=True)  # Created by init_beanie; rejects concurrent duplicate inserts
     amount: float
     customer_id: int
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -28,7 +28,9 @@ class Alert(Document):
     status: str = Field(default="Pending") # Pending, Reviewed, Dismissed
     assigned_queue: Optional[str] = "General Queue"
     explanation: Optional[str] = None # AI-generated explanation
+    score_tier: Optional[int] = None # Scoring tier that decided: 0 = rules + heuristic, 1 = ML model
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
     
     class Settings:
         name = "alerts"
@@ -78,6 +80,13 @@ class SAR(Document):
     class Settings:
         name = "sars"
 
+class Counter(Document):
+    id: str # Sequence name, e.g. "sar-2026"
+    seq: int = 0
+
+    class Settings:
+        name = "counters"
+
 class AnalysisResult(Document):
     model_name: str # decision_tree, naive_bayes, etc.
     accuracy: float
@@ -86,6 +95,8 @@ class AnalysisResult(Document):
     recall: float = 0.0
     auc_roc: float = 0.0
     feature_importance: Optional[Dict[str, float]] = None
+    best_params: Optional[Dict[str, Any]] = None # Set by the hyperparameter search
+    tuning: Optional[Dict[str, Any]] = None # Search method, CV score and held-out metrics of best_params
     last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
@@ -0,0 +1,310 @@
+"""
+Incremental retraining from analyst outcomes
+Pulls transactions labelled since the last run (cases filed as SARs = fraud,
+cases closed or alerts dismissed = legitimate) and updates the served models
+in place of a full train_models.py run:
+- Naive Bayes: partial_fit on the new samples
+- KNN: new samples appended to the neighbour set (newest KNN_MAX_NEW_SAMPLES kept)
+  and the IVF index rebuilt
+- ANN: a few warm-start epochs at a low learning rate
+- Decision Tree: rebuilt on a rolling window of recent labelled samples
+A share of every run's labels is held out and never trained on. Each updated model
+is a candidate: it replaces the current one in the model directory (the training
+workspace) only if its held-out metrics are no worse, and a new versioned bundle is
+published only when at least one model was accepted.
+Usage: python -m app.retrain_models [--since 2024-01-01T00:00:00] [--dry-run]
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import joblib
+from datetime import datetime, timezone
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.metrics import precision_recall_fscore_support
+from app.db.session import init_db
+from app.models.models import Alert, Case, Transaction
+from app.fraud_engine.ml_engine.model import MLEngine
+from app.fraud_engine.ml_engine.numpy_ann import export_keras_model
+from app.fraud_engine.ml_engine.knn_index import IVFIndex
+from app.fraud_engine.ml_engine.bundle import publish_bundle
+
+# Analyst outcomes -> labels (a case outcome wins over its alert's status)
+FRAUD_CASE_STATUSES = ["SAR Filed"]
+LEGITIMATE_CASE_STATUSES = ["Closed"]
+LEGITIMATE_ALERT_STATUSES = ["Dismissed"]
+
+WINDOW_SIZE = 50000          # Most recent labelled samples kept for rebuilding the tree
+MIN_REBUILD_SAMPLES = 200    # Below this the current tree is kept
+KNN_MAX_NEW_SAMPLES = 50000  # Appended outcomes kept in the KNN neighbour set (the offline samples always stay)
+HOLDOUT_FRACTION = 0.2       # Share of each run's labels held out for accepting candidates
+HOLDOUT_SIZE = 10000         # Most recent held-out samples kept
+MIN_HOLDOUT_SAMPLES = 50     # Below this (or with a single class) no candidate can be validated
+METRIC_TOLERANCE = 0.005     # A candidate may not lose more than this in held-out F1 or recall
+ANN_EPOCHS = 3
+ANN_LEARNING_RATE = 1e-4
+
+STATE_FILE = 'retrain_state.json'
+WINDOW_FILE = 'retrain_window.npz'
+
+class IncrementalTrainer:
+    def __init__(self, model_dir=None):
+        # The engine provides the served feature columns and encoders, so new samples
+        # are encoded exactly as they will be at prediction time
+        self.engine = MLEngine(model_type="naive_bayes")
+        self.model_dir = model_dir or self.engine.base_dir
+
+    def path(self, name):
+        return os.path.join(self.model_dir, name)
+
+    def load_state(self):
+        if not os.path.exists(self.path(STATE_FILE)):
+            return {}
+        with open(self.path(STATE_FILE)) as f:
+            return json.load(f)
+
+    async def fetch_labelled(self, since=None):
+        """(transactions, labels) for outcomes recorded after `since`"""
+        updated = {"updated_at": {"$gt": since}} if since else {}
+        labels = {}  # alert _id -> label
+
+        alerts = await Alert.get_pymongo_collection().find(
+            {"status": {"$in": LEGITIMATE_ALERT_STATUSES}, **updated}, {"_id": 1}
+        ).to_list(length=None)
+        for alert in alerts:
+            labels[alert["_id"]] = 0
+
+        cases = await Case.get_pymongo_collection().find(
+            {"status": {"$in": FRAUD_CASE_STATUSES + LEGITIMATE_CASE_STATUSES}, **updated},
+            {"alert": 1, "status": 1}
+        ).to_list(length=None)
+        for case in cases:
+            if case.get("alert") is not None:
+                labels[case["alert"].id] = 1 if case["status"] in FRAUD_CASE_STATUSES else 0
+
+        if not labels:
+            return [], np.zeros(0, dtype=np.int8)
+
+        alert_docs = await Alert.get_pymongo_collection().find(
+            {"_id": {"$in": list(labels)}}, {"transaction": 1}
+        ).to_list(length=None)
+        tx_labels = {doc["transaction"].id: labels[doc["_id"]] for doc in alert_docs if doc.get("transaction")}
+        transactions = await Transaction.find({"_id": {"$in": list(tx_labels)}}).to_list()
+        y = np.array([tx_labels[t.id] for t in transactions], dtype=np.int8)
+        return transactions, y
+
+    def save_state(self, state):
+        tmp_path = self.path(f"{STATE_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp_path, self.path(STATE_FILE))
+
+    def update_window(self, X, y, holdout_X, holdout_y):
+        """
+        Append to the rolling training window (newest WINDOW_SIZE) and to the held-out
+        set (newest HOLDOUT_SIZE); held-out samples are never trained on
+        """
+        window_path = self.path(WINDOW_FILE)
+        if os.path.exists(window_path):
+            window = np.load(window_path)
+            X = np.vstack([window["X"], X])
+            y = np.concatenate([window["y"], y])
+            if "holdout_X" in window:
+                holdout_X = np.vstack([window["holdout_X"], holdout_X])
+                holdout_y = np.concatenate([window["holdout_y"], holdout_y])
+        X, y = X[-WINDOW_SIZE:], y[-WINDOW_SIZE:]
+        holdout_X, holdout_y = holdout_X[-HOLDOUT_SIZE:], holdout_y[-HOLDOUT_SIZE:]
+        tmp_path = f"{window_path}.tmp.npz"
+        np.savez(tmp_path, X=X, y=y, holdout_X=holdout_X, holdout_y=holdout_y)
+        os.replace(tmp_path, window_path)
+        return X, y, holdout_X, holdout_y
+
+    # Each update returns (current predictions, candidate predictions) on the held-out
+    # set and a commit callback that writes the candidate into the workspace
+
+    def update_naive_bayes(self, X, y, H):
+        nb = joblib.load(self.path('naive_bayes.joblib'))
+        current = nb.predict(H)
+        nb.partial_fit(X, y)
+        return current, nb.predict(H), lambda: self.dump(nb, 'naive_bayes.joblib')
+
+    def update_knn(self, X, y, H, state):
+        scaler = joblib.load(self.path('knn_scaler.joblib'))
+        pca = joblib.load(self.path('knn_pca.joblib'))
+        knn = joblib.load(self.path('knn.joblib'))
+        to_pca = lambda A: pca.transform(scaler.transform(A))
+        H_pca = to_pca(H)
+        current = knn.predict(H_pca)
+        # KNN has no partial_fit: extend the fitted sample set and rebuild the index (no re-learning).
+        # The offline samples always stay; appended outcomes are capped to the newest ones
+        base = state.setdefault("knn_base_samples", len(knn._fit_X))
+        fit_X = np.vstack([knn._fit_X, to_pca(X)])
+        fit_y = np.concatenate([knn.classes_[knn._y], y])
+        keep = np.r_[0:base, max(base, len(fit_y) - KNN_MAX_NEW_SAMPLES):len(fit_y)]
+        knn.fit(fit_X[keep], fit_y[keep])
+
+        def commit():
+            self.dump(knn, 'knn.joblib')
+            # Serving searches the IVF index, so re-cluster it over the extended sample set
+            IVFIndex.from_sklearn(knn).save(self.path('knn_index'))
+        return current, knn.predict(H_pca), commit
+
+    def update_ann(self, X, y, H):
+        import tensorflow as tf
+        from sklearn.utils.class_weight import compute_class_weight
+
+        scaler = joblib.load(self.path('ann_scaler.joblib'))
+        model = tf.keras.models.load_model(self.path('ann_model.h5'))
+        predict = lambda A: (model.predict(scaler.transform(A), verbose=0)[:, 0] > 0.5).astype(int)
+        current = predict(H)
+
+        # Fine-tune from the current weights; a low learning rate keeps what was learned offline
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=ANN_LEARNING_RATE),
+                      loss='binary_crossentropy', metrics=['accuracy'])
+        classes = np.unique(y)
+        class_weight = None
+        if len(classes) > 1:
+            class_weight = dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y)))
+        model.fit(scaler.transform(X), y, epochs=ANN_EPOCHS, batch_size=64, class_weight=class_weight, verbose=0)
+
+        def commit():
+            tmp_path = self.path('ann_model.tmp.h5')
+            model.save(tmp_path)
+            os.replace(tmp_path, self.path('ann_model.h5'))
+            # Serving reads the exported weights, so they must follow the fine-tuned model
+            tmp_path = self.path('ann_weights.tmp.npz')
+            export_keras_model(model, tmp_path)
+            os.replace(tmp_path, self.path('ann_weights.npz'))
+        return current, predict(H), commit
+
+    def rebuild_decision_tree(self, window_X, window_y, H):
+        dt = joblib.load(self.path('decision_tree.joblib'))
+        if len(window_y) < MIN_REBUILD_SAMPLES or len(np.unique(window_y)) < 2:
+            print(f"  decision_tree: window has {len(window_y)} samples - keeping the current tree")
+            return None
+        # Same hyperparameters as the current tree, refitted on the recent window
+        params = dt.get_params()
+        params["class_weight"] = "balanced"
+        rebuilt = DecisionTreeClassifier(**params).fit(window_X, window_y)
+        return dt.predict(H), rebuilt.predict(H), lambda: self.dump(rebuilt, 'decision_tree.joblib')
+
+    def dump(self, obj, name):
+        """Write-then-rename so a serving process never loads a half-written model"""
+        tmp_path = self.path(f"{name}.tmp")
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, self.path(name))
+
+    def publish(self, updated_models, samples, report):
+        manifest = publish_bundle(self.model_dir, info={
+            "trigger": "incremental",
+            "new_samples": samples,
+            "updated_models": updated_models,
+            "holdout_metrics": report,
+        })
+        return {key: manifest[key] for key in ("version", "name", "created_at", "trigger", "new_samples", "updated_models")}
+
+    async def run(self, since=None, dry_run=False):
+        start = time.time()
+        # Watermark taken before querying, so outcomes recorded during the run are picked up next time
+        started_at = datetime.now(timezone.utc)
+        state = self.load_state()
+        if since is None:
+            last_run = state.get("last_run")
+            since = datetime.fromisoformat(last_run) if last_run else None
+
+        if not self.engine.feature_columns:
+            print("✗ No trained models found - run train_models.py first")
+            return None
+
+        print(f"Fetching outcomes labelled since {since.isoformat() if since else 'the beginning'}...")
+        transactions, y = await self.fetch_labelled(since)
+        print(f"✓ {len(y)} labelled transactions ({int(y.sum())} fraud)")
+        if not len(y):
+            return None
+
+        X = self.engine._extract_feature_matrix(transactions)
+        if dry_run:
+            print("Dry run - no models updated")
+            return None
+
+        held_out = np.random.default_rng().random(len(y)) < HOLDOUT_FRACTION
+        X, y, new_holdout_X, new_holdout_y = X[~held_out], y[~held_out], X[held_out], y[held_out]
+        window_X, window_y, H, holdout_y = self.update_window(X, y, new_holdout_X, new_holdout_y)
+        # The new labels are stored in the window and held-out set either way; don't fetch them again
+        state["last_run"] = started_at.isoformat()
+
+        if len(holdout_y) < MIN_HOLDOUT_SAMPLES or len(np.unique(holdout_y)) < 2:
+            self.save_state(state)
+            print(f"✗ {len(holdout_y)} held-out labels ({int(holdout_y.sum())} fraud) are not enough to validate "
+                  f"candidates - current models kept, no bundle published")
+            return {"version": None, "holdout": {}}
+
+        print(f"\nHeld-out metrics on {len(holdout_y)} labels ({int(holdout_y.sum())} fraud), current -> candidate:")
+        updated, report = [], {}
+        # Incremental updates need new training samples; the tree is rebuilt from the window
+        steps = [
+            ("naive_bayes", lambda: self.update_naive_bayes(X, y, H)),
+            ("knn", lambda: self.update_knn(X, y, H, state)),
+            ("ann", lambda: self.update_ann(X, y, H)),
+        ] if len(y) else []
+        steps.append(("decision_tree", lambda: self.rebuild_decision_tree(window_X, window_y, H)))
+        for name, step in steps:
+            try:
+                outcome = step()
+            except FileNotFoundError:
+                print(f"  {name}: model files not found - skipped")
+                continue
+            except ImportError as e:
+                print(f"  {name}: {e} - skipped")
+                continue
+            if outcome is None:
+                continue
+            current, candidate, commit = outcome
+            before, after = evaluate(current, holdout_y), evaluate(candidate, holdout_y)
+            accepted = not_worse(before, after)
+            report[name] = {"before": before, "after": after, "accepted": accepted}
+            print(f"  {name}: f1 {before['f1_score']:.4f} -> {after['f1_score']:.4f}, "
+                  f"recall {before['recall']:.4f} -> {after['recall']:.4f} "
+                  f"{'✓ accepted' if accepted else '✗ rejected, current model kept'}")
+            if accepted:
+                commit()
+                updated.append(name)
+
+        self.save_state(state)
+        if not updated:
+            print("\n✗ No candidate matched the current models on held-out labels - no bundle published")
+            return {"version": None, "holdout": report}
+        info = self.publish(updated, len(y), report)
+        print(f"\n✓ Published model bundle {info['name']} ({', '.join(updated)} updated) "
+              f"in {time.time() - start:.1f}s")
+        return {"version": info, "holdout": report}
+
+def not_worse(before, after):
+    """A candidate is accepted only if neither held-out F1 nor recall drops beyond the tolerance"""
+    return all(after[key] >= before[key] - METRIC_TOLERANCE for key in ("f1_score", "recall"))
+
+def evaluate(y_pred, y_true):
+    y_pred = np.asarray(y_pred).astype(int)
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_true, y_pred, average='binary', zero_division=0)
+    return {
+        "accuracy": float((y_pred == y_true).mean()),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+    }
+
+async def main(args):
+    await init_db()
+    since = datetime.fromisoformat(args.since) if args.since else None
+    if since and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    await IncrementalTrainer().run(since=since, dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the served models from newly labelled cases")
+    parser.add_argument("--since", default=None, help="ISO timestamp to pull outcomes from (default: last run)")
+    parser.add_argument("--dry-run", action="store_true", help="Fetch and encode labels without updating models")
+    asyncio.run(main(parser.parse_args()))
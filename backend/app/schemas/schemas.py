@@ -65,6 +65,7 @@ class Alert(AlertBase):
     id: Optional[str] = Field(None, alias="_id", serialization_alias="id")
     created_at: datetime
     transaction: Optional[Transaction] = None
+    score_tier: Optional[int] = None
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -0,0 +1,211 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from beanie import Document, PydanticObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from app.models.models import Transaction, Alert, Case
+from app.schemas.schemas import TransactionCreate
+from app.fraud_engine.scoring.scorer import Scorer, ALERT_THRESHOLD, CASE_THRESHOLD, remember_scores
+
+DUPLICATE_KEY_ERROR = 11000
+
+class IngestionService:
+    """
+    Batch transaction ingestion: validate -> de-duplicate -> score -> persist.
+    Each step works on a whole batch so a batch costs a handful of round trips
+    (one duplicate lookup and one ordered insert_many per collection). The lookup is
+    only a fast path: the unique index on transaction_id is what keeps concurrent
+    retries of the same batch from writing anything twice.
+    """
+
+    def parse_ndjson(self, body: bytes) -> List[Any]:
+        """Split an NDJSON body into items; malformed lines are kept as errors for per-item reporting"""
+        items = []
+        for line in body.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            items.append(self.parse_line(line))
+        return items
+
+    def parse_line(self, line: bytes) -> Any:
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return ValueError(f"Malformed JSON: {e}")
+
+    def validate(self, index: int, raw: Any) -> Tuple[Optional[TransactionCreate], Optional[Dict[str, Any]]]:
+        """Validate one raw item, returning either the payload or an `invalid` result"""
+        if isinstance(raw, Exception):
+            return None, self.make_result(index, None, "invalid", error=str(raw))
+        try:
+            return TransactionCreate.model_validate(raw), None
+        except ValidationError as e:
+            transaction_id = raw.get("transaction_id") if isinstance(raw, dict) else None
+            errors = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+            return None, self.make_result(index, transaction_id, "invalid", error=errors)
+
+    async def filter_duplicates(
+        self, indexed: List[Tuple[int, TransactionCreate]]
+    ) -> Tuple[List[Tuple[int, TransactionCreate]], List[Dict[str, Any]]]:
+        """
+        Drop items whose transaction_id repeats earlier in the batch or already exists,
+        so retried batches are idempotent
+        """
+        existing = await self._existing_ids(list({payload.transaction_id for _, payload in indexed}))
+
+        fresh, duplicates, seen = [], [], set()
+        for index, payload in indexed:
+            tid = payload.transaction_id
+            if tid in existing:
+                duplicates.append(self.make_result(index, tid, "duplicate", id=existing[tid]))
+            elif tid in seen:
+                duplicates.append(self.make_result(index, tid, "duplicate", error="Repeated within batch"))
+            else:
+                seen.add(tid)
+                fresh.append((index, payload))
+        return fresh, duplicates
+
+    def build_transactions(self, indexed: List[Tuple[int, TransactionCreate]]) -> List[Transaction]:
+        """Create Transaction documents with client-side ids so alerts can link to them before insert"""
+        return [Transaction(id=PydanticObjectId(), **payload.model_dump()) for _, payload in indexed]
+
+    async def persist(
+        self, indices: List[int], transactions: List[Transaction], scores: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Write scored transactions, then their alerts, then their cases, each with one
+        ordered insert_many. A transaction_id inserted concurrently by another request
+        is reported as a duplicate; items after any other failed write are reported as failed.
+        """
+        results = [
+            self.make_result(index, t.transaction_id, "created", id=str(t.id),
+                         risk_score=score["risk_score"], risk_level=score["risk_level"], tier=score["tier"])
+            for index, t, score in zip(indices, transactions, scores)
+        ]
+
+        written, duplicated, error = await self._insert_ordered(Transaction, transactions)
+        if duplicated:
+            existing = await self._existing_ids([transactions[pos].transaction_id for pos in duplicated])
+            for pos in duplicated:
+                results[pos] = self.make_result(indices[pos], transactions[pos].transaction_id, "duplicate",
+                                                id=existing.get(transactions[pos].transaction_id))
+        for pos in sorted(set(range(len(transactions))) - set(written) - set(duplicated)):
+            results[pos].update(status="failed", error=error, risk_score=None, risk_level=None, tier=None)
+
+        alerts, alert_positions = [], []
+        for pos in written:
+            score = scores[pos]
+            if score["risk_score"] > ALERT_THRESHOLD:
+                alerts.append(Alert(
+                    id=PydanticObjectId(),
+                    transaction=transactions[pos],
+                    risk_score=score["risk_score"],
+                    risk_level=score["risk_level"],
+                    score_tier=score["tier"],
+                    status="Pending",
+                    assigned_queue="General Queue"
+                ))
+                alert_positions.append(pos)
+
+        alerts_written, _, error = await self._insert_ordered(Alert, alerts)
+        cases, case_positions = [], []
+        for i in alerts_written:
+            alert, pos = alerts[i], alert_positions[i]
+            results[pos]["alert_id"] = str(alert.id)
+            if alert.risk_score > CASE_THRESHOLD:
+                cases.append(Case(id=PydanticObjectId(), alert=alert, status="Open"))
+                case_positions.append(pos)
+        for pos in alert_positions[len(alerts_written):]:
+            results[pos]["error"] = f"Alert not created: {error}"
+
+        cases_written, _, error = await self._insert_ordered(Case, cases)
+        for i in cases_written:
+            results[case_positions[i]]["case_id"] = str(cases[i].id)
+        for pos in case_positions[len(cases_written):]:
+            results[pos]["error"] = f"Case not created: {error}"
+
+        # Only fully written items may answer retries from the score cache
+        complete = [pos for pos in written if results[pos]["error"] is None]
+        remember_scores([transactions[pos] for pos in complete], [scores[pos] for pos in complete])
+        return results
+
+    async def ingest_batch(self, raw_items: List[Any], scorer: Scorer) -> List[Dict[str, Any]]:
+        """Validate, de-duplicate, score and persist a batch; returns one result per input item"""
+        results, valid = [], []
+        for index, raw in enumerate(raw_items):
+            payload, invalid = self.validate(index, raw)
+            if invalid:
+                results.append(invalid)
+            else:
+                valid.append((index, payload))
+
+        fresh, duplicates = await self.filter_duplicates(valid)
+        results.extend(duplicates)
+
+        if fresh:
+            transactions = self.build_transactions(fresh)
+            scores = await scorer.calculate_scores(transactions)
+            results.extend(await self.persist([index for index, _ in fresh], transactions, scores))
+
+        results.sort(key=lambda r: r["index"])
+        return results
+
+    def summarize(self, results: List[Dict[str, Any]]) -> Dict[str, int]:
+        summary = {"received": len(results), "created": 0, "duplicate": 0, "invalid": 0, "failed": 0}
+        for result in results:
+            summary[result["status"]] += 1
+        return summary
+
+    async def _existing_ids(self, transaction_ids: List[str]) -> Dict[str, str]:
+        """transaction_id -> stored _id for the ids that already exist (an index lookup)"""
+        if not transaction_ids:
+            return {}
+        docs = await Transaction.get_pymongo_collection().find(
+            {"transaction_id": {"$in": transaction_ids}},
+            {"_id": 1, "transaction_id": 1}
+        ).to_list(length=None)
+        return {doc["transaction_id"]: str(doc["_id"]) for doc in docs}
+
+    async def _insert_ordered(
+        self, model: Document, docs: List[Document]
+    ) -> Tuple[List[int], List[int], Optional[str]]:
+        """
+        Ordered insert_many that skips duplicate-key rejections and continues after them.
+        Returns the positions written, the positions rejected as duplicates, and the
+        first other error (positions after it were not attempted).
+        """
+        written, duplicated, start = [], [], 0
+        while start < len(docs):
+            try:
+                await model.insert_many(docs[start:], ordered=True)
+                written.extend(range(start, len(docs)))
+                break
+            except BulkWriteError as e:
+                inserted = e.details.get("nInserted", 0)
+                written.extend(range(start, start + inserted))
+                write_errors = e.details.get("writeErrors", [])
+                first = write_errors[0] if write_errors else {}
+                if first.get("code") != DUPLICATE_KEY_ERROR:
+                    return written, duplicated, first.get("errmsg") or str(e)
+                duplicated.append(start + first.get("index", inserted))
+                start = duplicated[-1] + 1
+        return written, duplicated, None
+
+    def make_result(self, index: int, transaction_id: Optional[str], status: str, **fields) -> Dict[str, Any]:
+        result = {
+            "index": index,
+            "transaction_id": transaction_id,
+            "status": status,
+            "id": None,
+            "risk_score": None,
+            "risk_level": None,
+            "tier": None,
+            "alert_id": None,
+            "case_id": None,
+            "error": None
+        }
+        result.update(fields)
+        return result
+
+ingestion_service = IngestionService()
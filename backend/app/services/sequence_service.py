@@ -0,0 +1,77 @@
+from typing import List, Optional, Set
+from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.models.models import Counter, SAR
+
+class SequenceService:
+    """
+    Atomic, per-year sequence counters backed by the `counters` collection.
+    Each allocation is a single find_one_and_update($inc), so concurrent
+    callers always receive disjoint ranges.
+    """
+
+    def __init__(self):
+        # Counters known to exist in this process (skips the bootstrap check)
+        self._initialized: Set[str] = set()
+
+    async def next_sar_id(self, year: Optional[int] = None) -> str:
+        """Allocate a single SAR ID"""
+        return (await self.allocate_sar_ids(1, year))[0]
+
+    async def allocate_sar_ids(self, count: int, year: Optional[int] = None) -> List[str]:
+        """
+        Allocate `count` consecutive SAR IDs for the given year in one round trip
+        """
+        if count < 1:
+            return []
+
+        year = year or datetime.now().year
+        key = f"sar-{year}"
+        await self._ensure_sar_counter(key, year)
+
+        counter = await Counter.get_pymongo_collection().find_one_and_update(
+            {"_id": key},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        end = counter["seq"]
+        return [self.format_sar_id(year, seq) for seq in range(end - count + 1, end + 1)]
+
+    @staticmethod
+    def format_sar_id(year: int, seq: int) -> str:
+        return f"SAR-{year}-{str(seq).zfill(3)}"
+
+    async def _ensure_sar_counter(self, key: str, year: int):
+        """
+        Create the counter on first use, starting after the highest SAR ID
+        already issued for that year so existing IDs are never reused
+        """
+        if key in self._initialized:
+            return
+
+        collection = Counter.get_pymongo_collection()
+        if await collection.find_one({"_id": key}) is None:
+            existing = await SAR.get_pymongo_collection().aggregate([
+                {"$match": {"sar_id": {"$regex": f"^SAR-{year}-\\d+$"}}},
+                {"$group": {
+                    "_id": None,
+                    "max_seq": {"$max": {"$toInt": {"$arrayElemAt": [{"$split": ["$sar_id", "-"]}, 2]}}}
+                }}
+            ]).to_list(length=None)
+            start = existing[0]["max_seq"] if existing else 0
+
+            try:
+                # $setOnInsert keeps this a no-op if another worker created it first
+                await collection.update_one(
+                    {"_id": key},
+                    {"$setOnInsert": {"seq": start}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass
+
+        self._initialized.add(key)
+
+sequence_service = SequenceService()
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.fraud_engine.scoring.scorer import Scorer
+from app.services.ingestion_service import ingestion_service
+from app.core.config import settings
+
+_DONE = object()  # End-of-stream sentinel passed between stages
+
+class StreamPipeline:
+    """
+    Bounded parse -> score -> persist pipeline for a long-lived transaction feed.
+
+    Every hand-off between stages goes through a bounded asyncio.Queue, so when
+    scoring or Mongo writes fall behind the upstream stage blocks on `put` and the
+    reader stops pulling bytes from the client (TCP / WebSocket flow control).
+    Results are produced on `results()` as each micro-batch is persisted.
+    """
+
+    def __init__(self, scorer: Optional[Scorer] = None, queue_size: Optional[int] = None,
+                 batch_size: Optional[int] = None, dedupe_window: Optional[int] = None):
+        self.scorer = scorer or Scorer()
+        self.batch_size = batch_size or settings.STREAM_BATCH_SIZE
+        queue_size = queue_size or settings.STREAM_QUEUE_SIZE
+        batch_slots = max(1, queue_size // self.batch_size)
+
+        self._score_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._persist_queue: asyncio.Queue = asyncio.Queue(maxsize=batch_slots)
+        self._output_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        # transaction_ids accepted recently; covers items still in flight that
+        # the database duplicate check cannot see yet
+        self._recent_ids: "OrderedDict[str, None]" = OrderedDict()
+        self._dedupe_window = dedupe_window or settings.STREAM_DEDUPE_WINDOW
+
+        self._tasks: List[asyncio.Task] = []
+        self._started_at = 0.0
+        self.stats = {"received": 0, "created": 0, "duplicate": 0, "invalid": 0, "failed": 0}
+
+    def start(self, lines: AsyncIterator[bytes]):
+        """Launch the stage tasks consuming `lines` (one JSON document per line)"""
+        self._started_at = time.perf_counter()
+        self._tasks = [
+            asyncio.create_task(self._read(lines)),
+            asyncio.create_task(self._score()),
+            asyncio.create_task(self._persist()),
+        ]
+
+    async def results(self) -> AsyncIterator[Dict[str, Any]]:
+        """Per-record decisions as they are committed, followed by a final summary"""
+        try:
+            while True:
+                item = await self._output_queue.get()
+                if item is _DONE:
+                    break
+                yield item
+            elapsed = time.perf_counter() - self._started_at
+            yield {"summary": {
+                **self.stats,
+                "elapsed_seconds": round(elapsed, 3),
+                "records_per_second": round(self.stats["received"] / elapsed, 1) if elapsed > 0 else 0.0
+            }}
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _read(self, lines: AsyncIterator[bytes]):
+        index = 0
+        try:
+            async for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                payload, invalid = ingestion_service.validate(index, ingestion_service.parse_line(line))
+                self.stats["received"] += 1
+                if invalid:
+                    await self._emit(invalid)
+                else:
+                    # Blocks while the scoring stage is saturated
+                    await self._score_queue.put((index, payload))
+                index += 1
+        except Exception as e:
+            await self._output_queue.put({"error": f"Stream read failed: {e}"})
+        # Not in `finally`: a cancelled stage must not block on a full queue
+        await self._score_queue.put(_DONE)
+
+    async def _score(self):
+        done = False
+        try:
+            while not done:
+                batch = [await self._score_queue.get()]
+                # Drain whatever is already queued into one micro-batch
+                while len(batch) < self.batch_size and not self._score_queue.empty():
+                    batch.append(self._score_queue.get_nowait())
+                if batch[-1] is _DONE:
+                    batch.pop()
+                    done = True
+                if not batch:
+                    continue
+
+                fresh, duplicates = await ingestion_service.filter_duplicates(batch)
+                for result in duplicates:
+                    await self._emit(result)
+
+                accepted = []
+                for index, payload in fresh:
+                    if payload.transaction_id in self._recent_ids:
+                        await self._emit(ingestion_service.make_result(
+                            index, payload.transaction_id, "duplicate", error="Repeated within stream"))
+                    else:
+                        self._remember(payload.transaction_id)
+                        accepted.append((index, payload))
+                if not accepted:
+                    continue
+
+                transactions = ingestion_service.build_transactions(accepted)
+                scores = await self.scorer.calculate_scores(transactions)
+                # Blocks while Mongo writes are behind
+                await self._persist_queue.put(([index for index, _ in accepted], transactions, scores))
+        except Exception as e:
+            await self._output_queue.put({"error": f"Scoring failed: {e}"})
+        await self._persist_queue.put(_DONE)
+
+    async def _persist(self):
+        try:
+            while True:
+                item = await self._persist_queue.get()
+                if item is _DONE:
+                    break
+                indices, transactions, scores = item
+                for result in await ingestion_service.persist(indices, transactions, scores):
+                    await self._emit(result)
+        except Exception as e:
+            await self._output_queue.put({"error": f"Persist failed: {e}"})
+        await self._output_queue.put(_DONE)
+
+    async def _emit(self, result: Dict[str, Any]):
+        self.stats[result["status"]] += 1
+        # Blocks while the client is not consuming results
+        await self._output_queue.put(result)
+
+    def _remember(self, transaction_id: str):
+        self._recent_ids[transaction_id] = None
+        if len(self._recent_ids) > self._dedupe_window:
+            self._recent_ids.popitem(last=False)
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Re-split an arbitrary chunked byte stream into newline-delimited records"""
+    buffer = b""
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer.strip():
+        yield buffer
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    return (json.dumps(result, default=str) + "\n").encode()
@@ -4,6 +4,7 @@ Train all 4 ML models with proper class imbalance handling
 2. Naive Bayes (Baseline)
 3. KNN (Distance-based with PCA)
 4. ANN (Deep Learning)
+Run with --parallel to train them concurrently in a process pool
 """
 import pandas as pd
 import numpy as np
@@ -17,18 +18,25 @@ from sklearn.metrics import classification_report, confusion_matrix, roc_auc_sco
 from imblearn.over_sampling import SMOTE
 from imblearn.under_sampling import RandomUnderSampler
 from imblearn.pipeline import Pipeline as ImbPipeline
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout
-from tensorflow.keras.callbacks import EarlyStopping
+from threadpoolctl import threadpool_limits
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
 import json
 import os
+import sys
 import joblib
 import warnings
 import asyncio
+from datetime import datetime, timezone
+import time
 from app.db.session import init_db
 from app.models.models import AnalysisResult, AnalysisTrend
 from app.services.llm_service import llm_service
+from app.fraud_engine.ml_engine.dataset_cache import DatasetCache, CATEGORICAL_COLUMNS
+from app.fraud_engine.ml_engine.numpy_ann import export_keras_model, max_deviation
+from app.fraud_engine.ml_engine.flat_tree import FlatTree, mismatches
+from app.fraud_engine.ml_engine.knn_index import IVFIndex, recall_at_k
+from app.fraud_engine.ml_engine.bundle import publish_bundle
 warnings.filterwarnings('ignore')
 
 # Configuration
@@ -45,33 +53,80 @@ FEATURE_COLUMNS = [
     'M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M7', 'M8', 'M9'
 ]
 
-def load_and_preprocess(nrows=100000, use_smote=True):
-    """
-    Load and preprocess Kaggle data
-    nrows: Number of rows to load (None for all)
-    use_smote: Whether to use SMOTE for class imbalance
-    """
-    print("=" * 60)
-    print("Loading and Preprocessing Data")
-    print("=" * 60)
-    
+# Hyperparameters used unless tune_models.py has written tuned ones to TUNED_PARAMS_FILE
+DECISION_TREE_PARAMS = {"max_depth": 15, "min_samples_leaf": 10, "min_samples_split": 20}
+KNN_PARAMS = {"n_neighbors": 5, "weights": "distance", "n_components": 50}
+TUNED_PARAMS_FILE = 'best_params.json'
+
+# nprobe values whose recall against exact KNN search is reported after indexing
+KNN_RECALL_NPROBES = [1, 4, 16, 64]
+KNN_RECALL_QUERIES = 2000
+
+# Max |Keras - NumPy| allowed for the exported ANN (both compute in float32)
+ANN_EXPORT_TOLERANCE = 1e-4
+
+# Training runs in float32 end to end: half the memory of float64 for every copy
+TRAINING_DTYPE = np.float32
+
+# (stage, current RSS MB, peak RSS MB) recorded by log_memory
+MEMORY_LOG = []
+
+def memory_usage_mb():
+    """Current and peak resident set size of this process in MB (None where unavailable)"""
+    current = peak = None
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    return current, peak
+
+def log_memory(stage):
+    current, peak = memory_usage_mb()
+    MEMORY_LOG.append((stage, current, peak))
+    if current is not None or peak is not None:
+        print(f"[memory] {stage}: rss={current or 0:,.0f} MB, peak={peak or 0:,.0f} MB")
+
+def print_memory_summary():
+    if not MEMORY_LOG:
+        return
+    print(f"\n{'Stage':<28} {'RSS (MB)':>10} {'Peak (MB)':>10}")
+    for stage, current, peak in MEMORY_LOG:
+        print(f"{stage:<28} {current or 0:>10,.0f} {peak or 0:>10,.0f}")
+
+def load_tuned_params():
+    """Best hyperparameters found by tune_models.py, keyed by model name ({} if it has not run)"""
+    path = os.path.join(MODEL_DIR, TUNED_PARAMS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def load_from_csv(nrows):
+    """Parse the CSV, fill missing values and label-encode categoricals"""
     print(f"Loading transaction data from {DATA_DIR}/train_transaction.csv...")
-    train_trans = pd.read_csv(
+    target = 'isFraud'
+    # Only the feature columns are parsed, numeric ones straight into float32
+    df = pd.read_csv(
         os.path.join(DATA_DIR, 'train_transaction.csv'),
-        nrows=nrows
+        nrows=nrows,
+        usecols=lambda col: col in FEATURE_COLUMNS or col == target,
+        dtype={col: TRAINING_DTYPE for col in FEATURE_COLUMNS if col not in CATEGORICAL_COLUMNS}
     )
-    print(f"Loaded {len(train_trans)} records")
+    print(f"Loaded {len(df)} records")
     
     # Select features
-    available_features = [f for f in FEATURE_COLUMNS if f in train_trans.columns]
+    available_features = [f for f in FEATURE_COLUMNS if f in df.columns]
     print(f"Using {len(available_features)} features: {available_features[:10]}...")
     
-    target = 'isFraud'
-    df = train_trans[available_features + [target]].copy()
-    
-    print(f"\nOriginal class distribution:")
-    print(f"  Fraud: {df[target].sum()} ({df[target].mean()*100:.2f}%)")
-    print(f"  Legitimate: {(df[target]==0).sum()} ({(1-df[target].mean())*100:.2f}%)")
+    print_class_distribution(df[target])
     
     # Handle missing values
     print("\nHandling missing values...")
@@ -85,13 +140,65 @@ def load_and_preprocess(nrows=100000, use_smote=True):
         else:
             df[col] = df[col].fillna(df[col].median())
     
-    X = df[available_features]
-    y = df[target]
+    y = df.pop(target).astype(np.int8)
+    return df[available_features].astype(TRAINING_DTYPE), y, available_features
+
+def load_from_cache(nrows):
+    """
+    Same preprocessing as load_from_csv, served from the columnar dataset cache:
+    encodings and fill values come from the cache, columns are memory-mapped
+    """
+    source = os.path.join(DATA_DIR, 'train_transaction.csv')
+    print(f"Loading transaction data from cache of {source}...")
+    start = time.time()
+    dataset = DatasetCache(source).load(nrows)
+    print(f"Loaded {len(dataset)} records in {time.time() - start:.1f}s ({dataset.path})")
+    
+    available_features = [f for f in FEATURE_COLUMNS if f in dataset.manifest["columns"]]
+    print(f"Using {len(available_features)} features: {available_features[:10]}...")
+    
+    y = pd.Series(dataset.column('isFraud'), name='isFraud')
+    print_class_distribution(y)
+    
+    print("\nHandling missing values...")
+    X = dataset.training_frame(available_features, dtype=TRAINING_DTYPE)
+    for col in available_features:
+        if col in dataset.categories:
+            # Equivalent to the encoder fitted in load_from_csv, rebuilt from the cached classes
+            le = LabelEncoder()
+            le.classes_ = np.array(dataset.encoder_classes(col), dtype=object)
+            joblib.dump(le, os.path.join(MODEL_DIR, f'le_{col}.joblib'))
+    
+    return X, y, available_features
+
+def print_class_distribution(y):
+    print(f"\nOriginal class distribution:")
+    print(f"  Fraud: {y.sum()} ({y.mean()*100:.2f}%)")
+    print(f"  Legitimate: {(y==0).sum()} ({(1-y.mean())*100:.2f}%)")
+
+def load_and_preprocess(nrows=100000, use_smote=True, use_cache=True):
+    """
+    Load and preprocess Kaggle data
+    nrows: Number of rows to load (None for all)
+    use_smote: Whether to use SMOTE for class imbalance
+    use_cache: Read the memory-mapped columnar cache (built on first use) instead of parsing the CSV
+    """
+    print("=" * 60)
+    print("Loading and Preprocessing Data")
+    print("=" * 60)
+    
+    if use_cache:
+        X, y, available_features = load_from_cache(nrows)
+    else:
+        X, y, available_features = load_from_csv(nrows)
+    log_memory("load")
     
     # Train-test split
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
+    del X, y  # The split holds the only copies we need
+    log_memory("split")
     
     print(f"\nTrain set: {len(X_train)} samples ({y_train.sum()} fraud)")
     print(f"Test set: {len(X_test)} samples ({y_test.sum()} fraud)")
@@ -101,15 +208,28 @@ def load_and_preprocess(nrows=100000, use_smote=True):
         print("\nApplying SMOTE to balance training data...")
         smote = SMOTE(random_state=42, sampling_strategy=0.1)  # 10% fraud rate
         X_train, y_train = smote.fit_resample(X_train, y_train)
+        X_train = X_train.astype(TRAINING_DTYPE, copy=False)
         print(f"After SMOTE - Train set: {len(X_train)} samples ({y_train.sum()} fraud, {y_train.mean()*100:.2f}%)")
+        log_memory("smote")
     
     # Save feature columns for later use
     joblib.dump(available_features, os.path.join(MODEL_DIR, 'feature_columns.joblib'))
     
     return X_train, X_test, y_train, y_test, available_features
 
-def train_decision_tree(X_train, X_test, y_train, y_test, feature_names):
-    """Train Decision Tree with class weighting"""
+def scale_features(X_train, X_test):
+    """
+    Standardize once for every model that needs scaled input (KNN and the ANN fit
+    identical scalers); float32 in, float32 out
+    Returns (scaler, X_train_scaled, X_test_scaled)
+    """
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train).astype(TRAINING_DTYPE, copy=False)
+    X_test_scaled = scaler.transform(X_test).astype(TRAINING_DTYPE, copy=False)
+    return scaler, X_train_scaled, X_test_scaled
+
+def train_decision_tree(X_train, X_test, y_train, y_test, feature_names, params=None):
+    """Train Decision Tree with class weighting (params override DECISION_TREE_PARAMS)"""
     print("\n" + "=" * 60)
     print("Training Decision Tree (Primary Model)")
     print("=" * 60)
@@ -120,10 +240,10 @@ def train_decision_tree(X_train, X_test, y_train, y_test, feature_names):
     class_weights = compute_class_weight('balanced', classes=classes, y=y_train)
     class_weight_dict = dict(zip(classes, class_weights))
     
+    dt_params = {**DECISION_TREE_PARAMS, **(params or {})}
+    print(f"Hyperparameters: {dt_params}")
     dt = DecisionTreeClassifier(
-        max_depth=15,
-        min_samples_leaf=10,
-        min_samples_split=20,
+        **dt_params,
         class_weight=class_weight_dict,
         random_state=42
     )
@@ -152,6 +272,13 @@ def train_decision_tree(X_train, X_test, y_train, y_test, feature_names):
     for feat, imp in top_features:
         print(f"  {feat}: {imp:.4f}")
     
+    # Serving walks the flattened tree; it must reproduce sklearn exactly
+    flat_tree = FlatTree.from_sklearn(dt)
+    mismatched = mismatches(dt, flat_tree, X_test)
+    print(f"\nFlattened tree: {flat_tree.node_count} nodes, {mismatched} mismatches vs sklearn on the test set")
+    if mismatched:
+        raise ValueError(f"Flattened decision tree differs from sklearn on {mismatched} test rows")
+    
     # Save model
     joblib.dump(dt, os.path.join(MODEL_DIR, 'decision_tree.joblib'))
     
@@ -200,19 +327,22 @@ def train_naive_bayes(X_train, X_test, y_train, y_test):
         "f1_score": float(f1)
     }
 
-def train_knn(X_train, X_test, y_train, y_test):
-    """Train KNN with PCA and scaling"""
+def train_knn(X_train, X_test, y_train, y_test, params=None, scaled=None):
+    """
+    Train KNN with PCA and scaling (params override KNN_PARAMS)
+    scaled: Shared (scaler, X_train_scaled, X_test_scaled) from scale_features
+    """
     print("\n" + "=" * 60)
     print("Training KNN with PCA (Distance-Based Model)")
     print("=" * 60)
+    knn_params = {**KNN_PARAMS, **(params or {})}
+    print(f"Hyperparameters: {knn_params}")
     
     # Scale features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    scaler, X_train_scaled, X_test_scaled = scaled or scale_features(X_train, X_test)
     
     # PCA for dimensionality reduction
-    n_components = min(50, X_train.shape[1])  # Use 50 components or all features if less
+    n_components = min(knn_params["n_components"], X_train.shape[1])  # Use n_components or all features if less
     pca = PCA(n_components=n_components, random_state=42)
     X_train_pca = pca.fit_transform(X_train_scaled)
     X_test_pca = pca.transform(X_test_scaled)
@@ -221,7 +351,7 @@ def train_knn(X_train, X_test, y_train, y_test):
     print(f"Explained variance: {pca.explained_variance_ratio_.sum():.4f}")
     
     # Train KNN
-    knn = KNeighborsClassifier(n_neighbors=5, weights='distance')
+    knn = KNeighborsClassifier(n_neighbors=knn_params["n_neighbors"], weights=knn_params["weights"])
     knn.fit(X_train_pca, y_train)
     
     # Evaluate
@@ -244,6 +374,15 @@ def train_knn(X_train, X_test, y_train, y_test):
     joblib.dump(pca, os.path.join(MODEL_DIR, 'knn_pca.joblib'))
     joblib.dump(knn, os.path.join(MODEL_DIR, 'knn.joblib'))
     
+    # IVF index served by MLEngine; recall is measured against the exact search above
+    start = time.time()
+    index = IVFIndex.from_sklearn(knn)
+    index.save(os.path.join(MODEL_DIR, 'knn_index'))
+    print(f"\nIVF index: {index.nlist} lists over {len(index)} rows ({time.time() - start:.1f}s)")
+    index_recall = recall_at_k(index, knn, X_test_pca[:KNN_RECALL_QUERIES], KNN_RECALL_NPROBES)
+    for nprobe, value in index_recall.items():
+        print(f"  nprobe={nprobe:<3} recall@{knn.n_neighbors}: {value:.4f}")
+    
     return {
         "accuracy": float(accuracy),
         "auc_roc": float(auc),
@@ -251,19 +390,28 @@ def train_knn(X_train, X_test, y_train, y_test):
         "recall": float(recall),
         "f1_score": float(f1),
         "n_components": n_components,
-        "explained_variance": float(pca.explained_variance_ratio_.sum())
+        "explained_variance": float(pca.explained_variance_ratio_.sum()),
+        "index_lists": index.nlist,
+        "index_recall": {str(nprobe): value for nprobe, value in index_recall.items()}
     }
 
-def train_ann(X_train, X_test, y_train, y_test):
-    """Train ANN (Deep Learning Model)"""
+def train_ann(X_train, X_test, y_train, y_test, scaled=None):
+    """
+    Train ANN (Deep Learning Model)
+    scaled: Shared (scaler, X_train_scaled, X_test_scaled) from scale_features
+    """
+    # Imported here so the other trainers (and their worker processes) never load TensorFlow
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Dropout
+    from tensorflow.keras.callbacks import EarlyStopping
+    
     print("\n" + "=" * 60)
     print("Training ANN (Deep Learning Model)")
     print("=" * 60)
     
     # Scale features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    scaler, X_train_scaled, X_test_scaled = scaled or scale_features(X_train, X_test)
     
     # Calculate class weights for ANN
     from sklearn.utils.class_weight import compute_class_weight
@@ -328,6 +476,13 @@ def train_ann(X_train, X_test, y_train, y_test):
     model.save(os.path.join(MODEL_DIR, 'ann_model.h5'))
     joblib.dump(scaler, os.path.join(MODEL_DIR, 'ann_scaler.joblib'))
     
+    # Export Dense weights for TensorFlow-free serving and check it reproduces Keras
+    numpy_model = export_keras_model(model, os.path.join(MODEL_DIR, 'ann_weights.npz'))
+    deviation = max_deviation(model, numpy_model, X_test_scaled)
+    print(f"  NumPy export max deviation from Keras: {deviation:.2e}")
+    if deviation > ANN_EXPORT_TOLERANCE:
+        raise ValueError(f"Exported ANN deviates from Keras by {deviation:.2e} (tolerance {ANN_EXPORT_TOLERANCE:.0e})")
+    
     return {
         "accuracy": float(accuracy),
         "auc_roc": float(auc),
@@ -337,6 +492,118 @@ def train_ann(X_train, X_test, y_train, y_test):
         "epochs_trained": len(history.history['loss'])
     }
 
+def thread_budgets(cpu_count=None):
+    """
+    Threads per trainer when they run side by side: the tree and Naive Bayes are
+    single-threaded, KNN (PCA/BLAS, neighbour search) and the ANN split the rest
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    spare = max(cpu_count - 2, 2)
+    knn_threads = max(1, spare // 3)
+    return {
+        "decision_tree": 1,
+        "naive_bayes": 1,
+        "knn": knn_threads,
+        "ann": max(1, spare - knn_threads),
+    }
+
+def share_arrays(arrays):
+    """Copy arrays into shared memory blocks; returns the blocks and a picklable spec to attach them"""
+    blocks, spec = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, spec
+
+def attach_arrays(spec):
+    """Zero-copy views of arrays published with share_arrays"""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+def run_trainer(name, spec, feature_names, threads, params=None, scaler=None):
+    """Process-pool entry point: train one model on the shared train/test arrays under a thread budget"""
+    start = time.time()
+    blocks, arrays = attach_arrays(spec)
+    X_train = pd.DataFrame(arrays["X_train"], columns=feature_names, copy=False)
+    X_test = pd.DataFrame(arrays["X_test"], columns=feature_names, copy=False)
+    y_train = pd.Series(arrays["y_train"], name='isFraud', copy=False)
+    y_test = pd.Series(arrays["y_test"], name='isFraud', copy=False)
+    scaled = (scaler, arrays["X_train_scaled"], arrays["X_test_scaled"]) if scaler is not None else None
+    
+    if name == "ann":
+        # TensorFlow keeps its own thread pools; cap them before the first op
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    
+    with threadpool_limits(limits=threads):
+        if name == "decision_tree":
+            result = train_decision_tree(X_train, X_test, y_train, y_test, feature_names, params)
+        elif name == "naive_bayes":
+            result = train_naive_bayes(X_train, X_test, y_train, y_test)
+        elif name == "knn":
+            result = train_knn(X_train, X_test, y_train, y_test, params, scaled)
+        else:
+            result = train_ann(X_train, X_test, y_train, y_test, scaled)
+    
+    # Drop the views before detaching from the shared blocks
+    del X_train, X_test, y_train, y_test, arrays, scaled
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass  # A view is still referenced; the mapping goes away with the worker
+    return name, result, time.time() - start
+
+def train_parallel(X_train, X_test, y_train, y_test, feature_names, max_workers=None, tuned_params=None, scaled=None):
+    """
+    Train the four independent models concurrently. The train/test arrays are
+    placed in shared memory once, so workers attach to them instead of each
+    receiving a pickled copy. Returns results in the same order as the sequential run.
+    """
+    budgets = thread_budgets()
+    names = list(budgets)
+    scaler, X_train_scaled, X_test_scaled = scaled or scale_features(X_train, X_test)
+    blocks, spec = share_arrays({
+        "X_train": np.asarray(X_train, dtype=TRAINING_DTYPE),
+        "X_test": np.asarray(X_test, dtype=TRAINING_DTYPE),
+        "y_train": np.asarray(y_train),
+        "y_test": np.asarray(y_test),
+        "X_train_scaled": X_train_scaled,
+        "X_test_scaled": X_test_scaled,
+    })
+    print(f"\nTraining {len(names)} models in parallel (threads per model: {budgets})")
+    
+    results, timings = {}, {}
+    try:
+        # spawn: TensorFlow and OpenMP runtimes are not fork-safe
+        with ProcessPoolExecutor(max_workers=max_workers or len(names), mp_context=get_context("spawn")) as pool:
+            tuned_params = tuned_params or {}
+            futures = [
+                pool.submit(run_trainer, name, spec, feature_names, budgets[name], tuned_params.get(name),
+                            scaler if name in ("knn", "ann") else None)
+                for name in names
+            ]
+            for future in as_completed(futures):
+                name, result, elapsed = future.result()
+                results[name] = result
+                timings[name] = elapsed
+                print(f"✓ {name} finished in {elapsed:.1f}s")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    
+    print("\nTraining time per model: " + ", ".join(f"{name}={timings[name]:.1f}s" for name in names))
+    return {name: results[name] for name in names}
+
 async def save_results_to_db(results):
     """Save training results and trends to MongoDB"""
     print("\nSaving results to MongoDB...")
@@ -411,23 +678,42 @@ async def save_results_to_db(results):
     
     print("Results successfully saved to DB.")
 
-async def main():
+async def main(parallel=False, nrows=None):
     print("=" * 60)
     print("ML Model Training Pipeline")
     print("=" * 60)
     
     # Load and preprocess data
     X_train, X_test, y_train, y_test, feature_names = load_and_preprocess(
-        nrows=100000,  # Use 100k for training
+        nrows=nrows,  # None trains on the full dataset
         use_smote=True
     )
     
+    # One scaled copy shared by KNN and the ANN
+    scaled = scale_features(X_train, X_test)
+    log_memory("scale")
+    
     # Train all models
-    results = {}
-    results['decision_tree'] = train_decision_tree(X_train, X_test, y_train, y_test, feature_names)
-    results['naive_bayes'] = train_naive_bayes(X_train, X_test, y_train, y_test)
-    results['knn'] = train_knn(X_train, X_test, y_train, y_test)
-    results['ann'] = train_ann(X_train, X_test, y_train, y_test)
+    train_start = time.time()
+    tuned_params = load_tuned_params()
+    if tuned_params:
+        print(f"Using tuned hyperparameters for: {', '.join(tuned_params)}")
+    if parallel:
+        results = train_parallel(X_train, X_test, y_train, y_test, feature_names, tuned_params=tuned_params,
+                                 scaled=scaled)
+        log_memory("train (parallel)")
+    else:
+        results = {}
+        results['decision_tree'] = train_decision_tree(X_train, X_test, y_train, y_test, feature_names,
+                                                       tuned_params.get('decision_tree'))
+        log_memory("decision_tree")
+        results['naive_bayes'] = train_naive_bayes(X_train, X_test, y_train, y_test)
+        log_memory("naive_bayes")
+        results['knn'] = train_knn(X_train, X_test, y_train, y_test, tuned_params.get('knn'), scaled)
+        log_memory("knn")
+        results['ann'] = train_ann(X_train, X_test, y_train, y_test, scaled)
+        log_memory("ann")
+    print(f"\nTrained {len(results)} models in {time.time() - train_start:.1f}s")
     
     # Determine best model
     best_model = max(results.items(), key=lambda x: x[1].get('f1_score', 0))
@@ -438,13 +724,30 @@ async def main():
     with open(os.path.join(MODEL_DIR, 'results.json'), 'w') as f:
         json.dump(results, f, indent=4)
     
+    # Serving only reads published bundles, never the files written above
+    manifest = publish_bundle(MODEL_DIR, info={
+        "trigger": "full",
+        "train_rows": len(X_train),
+        "best_model": results['best_model'],
+        "metrics": {
+            name: {k: metrics[k] for k in ("accuracy", "auc_roc", "precision", "recall", "f1_score") if k in metrics}
+            for name, metrics in results.items() if isinstance(metrics, dict)
+        },
+    })
+    print(f"\n✓ Published model bundle {manifest['name']} ({', '.join(manifest['models'])})")
+    
     # Save results to MongoDB
     await save_results_to_db(results)
     
     print("\n" + "=" * 60)
     print("Training Complete!")
     print("=" * 60)
+    print_memory_summary()
 
 if __name__ == "__main__":
-    from datetime import datetime, timezone
-    asyncio.run(main())
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the fraud detection models")
+    parser.add_argument("--parallel", action="store_true", help="Train the four models concurrently in a process pool")
+    parser.add_argument("--nrows", type=int, default=0, help="Rows to train on (0 for the full dataset)")
+    args = parser.parse_args()
+    asyncio.run(main(parallel=args.parallel, nrows=args.nrows or None))
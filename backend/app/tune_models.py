@@ -0,0 +1,206 @@
+"""
+Hyperparameter search for the Decision Tree and KNN models
+Candidates are scored with stratified cross-validation, fanned out over all
+cores (n_jobs), on the cached preprocessed dataset. Search methods:
+- grid: every combination in SEARCH_SPACES
+- random: n_iter combinations sampled from SEARCH_SPACES
+- halving: successive halving - every candidate starts on a small subsample and
+  only the best third advances to 3x more data, so weak configs are pruned cheaply
+SMOTE runs inside each CV fold (imblearn pipeline) so validation folds stay untouched.
+The best configs are written to ml_models/best_params.json (picked up by
+train_models.py) and to AnalysisResult.
+Usage: python -m app.tune_models --method halving --nrows 200000
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingGridSearchCV)
+from sklearn.model_selection import (
+    GridSearchCV, RandomizedSearchCV, HalvingGridSearchCV, StratifiedKFold, train_test_split
+)
+from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import PCA
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.metrics import roc_auc_score, precision_recall_fscore_support
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline as ImbPipeline
+from app.db.session import init_db
+from app.models.models import AnalysisResult
+from app.fraud_engine.ml_engine.dataset_cache import DatasetCache
+from app.train_models import DATA_DIR, MODEL_DIR, FEATURE_COLUMNS, TUNED_PARAMS_FILE, load_tuned_params
+warnings.filterwarnings('ignore')
+
+# Pipeline step prefix -> train_models parameter names
+SEARCH_SPACES = {
+    "decision_tree": {
+        "model__max_depth": [8, 12, 15, 20, 30],
+        "model__min_samples_leaf": [1, 5, 10, 25, 50],
+        "model__min_samples_split": [2, 20, 50, 100],
+        "model__criterion": ["gini", "entropy"],
+    },
+    "knn": {
+        "pca__n_components": [10, 20, 30, 50],
+        "model__n_neighbors": [3, 5, 7, 11, 15, 25],
+        "model__weights": ["uniform", "distance"],
+    },
+}
+
+def build_estimator(model_name, use_smote=True):
+    """The trainer's model as a pipeline, so scaling/PCA/SMOTE are fitted per CV fold"""
+    steps = []
+    if use_smote:
+        steps.append(("smote", SMOTE(random_state=42, sampling_strategy=0.1)))  # Same 10% rate as training
+    if model_name == "decision_tree":
+        # 'balanced' is what train_decision_tree computes with compute_class_weight
+        steps.append(("model", DecisionTreeClassifier(class_weight='balanced', random_state=42)))
+    elif model_name == "knn":
+        steps.append(("scaler", StandardScaler()))
+        steps.append(("pca", PCA(random_state=42)))
+        steps.append(("model", KNeighborsClassifier()))
+    else:
+        raise ValueError(f"No search space for model: {model_name}")
+    return ImbPipeline(steps)
+
+def search_space(model_name, n_features):
+    space = dict(SEARCH_SPACES[model_name])
+    if "pca__n_components" in space:
+        space["pca__n_components"] = [n for n in space["pca__n_components"] if n <= n_features] or [n_features]
+    return space
+
+def build_search(model_name, method, n_features, n_iter, cv, n_jobs, min_resources, use_smote):
+    estimator = build_estimator(model_name, use_smote)
+    space = search_space(model_name, n_features)
+    common = dict(scoring="f1", cv=cv, n_jobs=n_jobs, refit=True, verbose=1)
+    if method == "grid":
+        return GridSearchCV(estimator, space, **common)
+    if method == "random":
+        return RandomizedSearchCV(estimator, space, n_iter=n_iter, random_state=42, **common)
+    if method == "halving":
+        # Rounds grow the sample 3x and keep the top third; min_resources must leave
+        # enough fraud rows per fold for SMOTE's neighbours
+        return HalvingGridSearchCV(estimator, space, factor=3, resource="n_samples",
+                                   min_resources=min_resources, random_state=42, **common)
+    raise ValueError(f"Unknown search method: {method}")
+
+def trainer_params(best_params):
+    """Strip pipeline prefixes: {'model__max_depth': 12} -> {'max_depth': 12}"""
+    return {key.split("__", 1)[1]: value for key, value in best_params.items()}
+
+def evaluate(estimator, X_test, y_test):
+    """Held-out metrics in the same shape as the train_models results"""
+    y_pred = estimator.predict(X_test)
+    y_pred_proba = estimator.predict_proba(X_test)[:, 1]
+    precision, recall, f1, _ = precision_recall_fscore_support(y_test, y_pred, average='binary', zero_division=0)
+    return {
+        "accuracy": float((y_pred == np.asarray(y_test)).mean()),
+        "auc_roc": float(roc_auc_score(y_test, y_pred_proba)),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+    }
+
+def load_data(nrows):
+    """Preprocessed features from the dataset cache (no encoder/model files are touched)"""
+    dataset = DatasetCache(os.path.join(DATA_DIR, 'train_transaction.csv')).load(nrows)
+    features = [f for f in FEATURE_COLUMNS if f in dataset.manifest["columns"]]
+    X = dataset.training_frame(features).astype(np.float32)
+    y = pd.Series(dataset.column('isFraud'), name='isFraud')
+    # Same split as train_models, so the held-out metrics are comparable
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def tune(model_name, X_train, X_test, y_train, y_test, method="halving", n_iter=30, folds=3,
+         n_jobs=-1, min_resources=5000, use_smote=True):
+    print("\n" + "=" * 60)
+    print(f"Tuning {model_name} ({method} search)")
+    print("=" * 60)
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    search = build_search(model_name, method, X_train.shape[1], n_iter, cv, n_jobs,
+                          min(min_resources, len(X_train)), use_smote)
+    start = time.time()
+    search.fit(X_train, y_train)
+    elapsed = time.time() - start
+
+    metrics = evaluate(search.best_estimator_, X_test, y_test)
+    best = trainer_params(search.best_params_)
+    print(f"\nBest params: {best}")
+    print(f"  CV F1: {search.best_score_:.4f}")
+    print(f"  Test F1: {metrics['f1_score']:.4f}  AUC-ROC: {metrics['auc_roc']:.4f}")
+    print(f"  {len(search.cv_results_['params'])} candidate fits in {elapsed:.1f}s")
+    return {
+        "best_params": best,
+        "tuning": {
+            "method": method,
+            "cv_f1": float(search.best_score_),
+            "candidates": len(search.cv_results_['params']),
+            "duration_seconds": round(elapsed, 1),
+            "train_rows": len(X_train),
+            "tuned_at": datetime.now(timezone.utc).isoformat(),
+            **metrics,
+        },
+    }
+
+def save_best_params(results):
+    """Merge into best_params.json so the next train_models run uses them"""
+    params = load_tuned_params()
+    params.update({name: result["best_params"] for name, result in results.items()})
+    with open(os.path.join(MODEL_DIR, TUNED_PARAMS_FILE), 'w') as f:
+        json.dump(params, f, indent=4)
+
+async def save_results_to_db(results):
+    await init_db()
+    for model_name, result in results.items():
+        tuning = result["tuning"]
+        existing = await AnalysisResult.find_one(AnalysisResult.model_name == model_name)
+        if existing:
+            existing.best_params = result["best_params"]
+            existing.tuning = tuning
+            existing.last_updated = datetime.now(timezone.utc)
+            await existing.save()
+        else:
+            await AnalysisResult(
+                model_name=model_name,
+                accuracy=tuning["accuracy"],
+                f1_score=tuning["f1_score"],
+                precision=tuning["precision"],
+                recall=tuning["recall"],
+                auc_roc=tuning["auc_roc"],
+                best_params=result["best_params"],
+                tuning=tuning
+            ).insert()
+
+async def main(args):
+    print("=" * 60)
+    print("Hyperparameter Search")
+    print("=" * 60)
+    X_train, X_test, y_train, y_test = load_data(args.nrows or None)
+    print(f"Train set: {len(X_train)} samples ({int(y_train.sum())} fraud), test set: {len(X_test)} samples")
+
+    results = {}
+    for model_name in args.models:
+        results[model_name] = tune(
+            model_name, X_train, X_test, y_train, y_test, method=args.method, n_iter=args.n_iter,
+            folds=args.folds, n_jobs=args.n_jobs, min_resources=args.min_resources, use_smote=not args.no_smote
+        )
+
+    save_best_params(results)
+    await save_results_to_db(results)
+    print(f"\nBest params saved to {os.path.join(MODEL_DIR, TUNED_PARAMS_FILE)}; retrain with train_models.py to apply them")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search hyperparameters for the decision tree and KNN models")
+    parser.add_argument("--models", nargs="+", choices=list(SEARCH_SPACES), default=list(SEARCH_SPACES))
+    parser.add_argument("--method", choices=["grid", "random", "halving"], default="halving")
+    parser.add_argument("--nrows", type=int, default=200000, help="Rows to use (0 for all)")
+    parser.add_argument("--n-iter", type=int, default=30, help="Candidates sampled by random search")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel CV fits (-1 = all cores)")
+    parser.add_argument("--min-resources", type=int, default=5000, help="Rows per candidate in the first halving round")
+    parser.add_argument("--no-smote", action="store_true", help="Tune without SMOTE oversampling in the folds")
+    asyncio.run(main(parser.parse_args()))
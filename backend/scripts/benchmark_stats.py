@@ -0,0 +1,177 @@
+"""
+Benchmark /sars/stats and /reports/stats before and after the aggregation rewrite
+Seeds a large synthetic dataset into a separate benchmark database, then times the
+legacy (count + full document load) implementations against the aggregation ones
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bson import DBRef, ObjectId
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.models.models import Transaction, Alert, Case, SAR, CaseNote
+from app.api.endpoints.sars import get_sar_stats
+from app.api.endpoints.reports import get_report_stats
+
+MONGODB_URL = os.getenv("MONGODB_URL") or os.getenv("MONGODB_URI") or "mongodb://localhost:27017"
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "fraud_detection_bench")
+
+async def legacy_sar_stats():
+    """Original /sars/stats implementation (four count queries)"""
+    total = await SAR.count()
+    pending = await SAR.find(SAR.status == "Pending").count()
+    filed = await SAR.find(SAR.status == "Filed").count()
+    drafts = await SAR.find(SAR.status == "Draft").count()
+    return {"pending_filings": pending, "successfully_filed": filed, "drafts": drafts, "total": total}
+
+async def legacy_report_stats():
+    """Original /reports/stats implementation (loads all alerts and closed/SAR cases)"""
+    total_transactions = await Transaction.count()
+    total_alerts = await Alert.count()
+    total_cases = await Case.count()
+    alerts = await Alert.find_all().to_list()
+    avg_risk_score = sum(a.risk_score for a in alerts) / len(alerts) if alerts else 0
+    closed_cases = await Case.find(Case.status == "Closed").to_list()
+    sar_cases = await Case.find(Case.status == "SAR Filed").to_list()
+    false_positive_rate = (len(closed_cases) / total_cases * 100) if total_cases > 0 else 0
+    detection_rate = (total_alerts / total_transactions * 100) if total_transactions > 0 else 0
+    return {
+        "avg_fraud_score": round(avg_risk_score, 2),
+        "false_positive_rate": round(false_positive_rate, 2),
+        "detection_rate": round(detection_rate, 2),
+        "approval_rate": round(100 - false_positive_rate, 2),
+        "false_negative_rate": round(1.2, 2)
+    }
+
+async def seed_synthetic(n_transactions, alert_rate, case_rate, batch_size=10000):
+    """Insert a synthetic transactions/alerts/cases/SARs dataset with raw bulk inserts"""
+    print(f"Seeding {n_transactions:,} synthetic transactions into '{BENCH_DB_NAME}'...")
+    for model in (SAR, Case, Alert, Transaction):
+        await model.get_pymongo_collection().delete_many({})
+
+    now = datetime.now(timezone.utc)
+    case_statuses = ["Open", "In Progress", "Closed", "SAR Filed"]
+    sar_statuses = ["Draft", "Pending", "Filed"]
+    sar_seq = 0
+
+    for start in range(0, n_transactions, batch_size):
+        transactions, alerts, cases, sars = [], [], [], []
+        for i in range(start, min(start + batch_size, n_transactions)):
+            trans_id = ObjectId()
+            transactions.append({
+                "_id": trans_id,
+                "transaction_id": f"BENCH{i}",
+                "amount": round(random.uniform(1.0, 8000.0), 2),
+                "customer_id": random.randint(10000, 99999),
+                "merchant_id": random.randint(1000, 9999),
+                "category": random.choice(["Web", "Credit", "Retail", "Service", "Home"]),
+                "transaction_type": "PAYMENT",
+                "timestamp": now - timedelta(minutes=i),
+            })
+            if random.random() >= alert_rate:
+                continue
+            alert_id = ObjectId()
+            alerts.append({
+                "_id": alert_id,
+                "transaction": DBRef("transactions", trans_id),
+                "risk_score": random.randint(50, 99),
+                "risk_level": "High",
+                "status": "Pending",
+                "assigned_queue": "General Queue",
+                "created_at": now,
+            })
+            if random.random() >= case_rate:
+                continue
+            case_id = ObjectId()
+            case_status = random.choice(case_statuses)
+            cases.append({
+                "_id": case_id,
+                "alert": DBRef("alerts", alert_id),
+                "status": case_status,
+                "analyst_id": random.randint(1, 5),
+                "created_at": now,
+                "updated_at": now,
+                "notes": [],
+            })
+            if case_status == "SAR Filed":
+                sar_seq += 1
+                sars.append({
+                    "sar_id": f"SAR-BENCH-{sar_seq:07d}",
+                    "case": DBRef("cases", case_id),
+                    "amount": transactions[-1]["amount"],
+                    "status": random.choice(sar_statuses),
+                    "description": "Synthetic benchmark SAR",
+                    "created_at": now,
+                })
+
+        for model, docs in ((Transaction, transactions), (Alert, alerts), (Case, cases), (SAR, sars)):
+            if docs:
+                await model.get_pymongo_collection().insert_many(docs, ordered=False)
+
+    print(f"✓ Seeded {await Transaction.count():,} transactions, {await Alert.count():,} alerts, "
+          f"{await Case.count():,} cases, {await SAR.count():,} SARs")
+
+async def measure(func, runs):
+    """Return (median seconds, peak traced memory in bytes, last result) for an async callable"""
+    timings = []
+    peak = 0
+    result = None
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = await func()
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    timings.sort()
+    return timings[len(timings) // 2], peak, result
+
+async def run_benchmark(n_transactions, alert_rate, case_rate, runs, skip_seed):
+    client = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
+    await client.admin.command('ping')
+    await init_beanie(database=client[BENCH_DB_NAME], document_models=[Transaction, Alert, Case, CaseNote, SAR])
+
+    if not skip_seed:
+        await seed_synthetic(n_transactions, alert_rate, case_rate)
+
+    # The endpoint is wrapped by @cached; benchmark the undecorated coroutine
+    report_stats = getattr(get_report_stats, "__wrapped__", get_report_stats)
+
+    print(f"\n{'Endpoint':<16} {'Variant':<12} {'Median (ms)':>12} {'Peak mem (MB)':>14}")
+    print("-" * 58)
+    for name, legacy, current in (
+        ("/sars/stats", legacy_sar_stats, get_sar_stats),
+        ("/reports/stats", legacy_report_stats, report_stats),
+    ):
+        legacy_time, legacy_peak, legacy_result = await measure(legacy, runs)
+        current_time, current_peak, current_result = await measure(current, runs)
+        print(f"{name:<16} {'legacy':<12} {legacy_time * 1000:>12.1f} {legacy_peak / 1e6:>14.2f}")
+        print(f"{name:<16} {'aggregation':<12} {current_time * 1000:>12.1f} {current_peak / 1e6:>14.2f}")
+        if legacy_result != current_result:
+            print(f"  ⚠ Result mismatch:\n    legacy:      {legacy_result}\n    aggregation: {current_result}")
+        else:
+            print(f"  ✓ Results identical ({legacy_time / current_time:.1f}x faster)" if current_time > 0 else "  ✓ Results identical")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark stats endpoints on a synthetic dataset")
+    parser.add_argument("--transactions", type=int, default=500000, help="Number of synthetic transactions")
+    parser.add_argument("--alert-rate", type=float, default=0.2, help="Fraction of transactions with an alert")
+    parser.add_argument("--case-rate", type=float, default=0.5, help="Fraction of alerts escalated to a case")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per variant")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the existing benchmark database")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.transactions, args.alert_rate, args.case_rate, args.runs, args.skip_seed))
@@ -0,0 +1,97 @@
+"""
+Benchmark the flattened decision tree against sklearn's predict_proba
+Checks that FlatTree is bit-identical to DecisionTreeClassifier on the test
+split, then times single-row scoring (the API path) and batch scoring.
+Uses the served decision_tree.joblib and the cached Kaggle test split, or a
+tree fitted on synthetic data with --synthetic.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.fraud_engine.ml_engine.model import MLEngine
+from app.fraud_engine.ml_engine.flat_tree import FlatTree
+
+def load_served(nrows):
+    """Served tree plus the same held-out split train_models evaluates on"""
+    import joblib
+    from app.tune_models import load_data
+    engine = MLEngine(model_type="decision_tree")
+    model = joblib.load(os.path.join(engine.model_dir, 'decision_tree.joblib'))
+    _, X_test, _, _ = load_data(nrows)
+    return model, X_test.to_numpy(dtype=np.float32)
+
+def fit_synthetic(n_samples, n_features, max_depth):
+    from sklearn.tree import DecisionTreeClassifier
+    rng = np.random.RandomState(42)
+    X = rng.randn(n_samples, n_features).astype(np.float32)
+    y = ((X[:, 0] + 0.5 * X[:, 1] * X[:, 2] + rng.randn(n_samples)) > 1.5).astype(int)
+    split = int(n_samples * 0.8)
+    model = DecisionTreeClassifier(max_depth=max_depth, class_weight='balanced', random_state=42)
+    model.fit(X[:split], y[:split])
+    return model, X[split:]
+
+def time_per_call(func, inputs):
+    """Median and p99 microseconds per call over the inputs"""
+    timings = np.empty(len(inputs))
+    for i, x in enumerate(inputs):
+        start = time.perf_counter()
+        func(x)
+        timings[i] = time.perf_counter() - start
+    return np.median(timings) * 1e6, np.percentile(timings, 99) * 1e6
+
+def run_benchmark(model, X_test, rows, batch_sizes):
+    flat_tree = FlatTree.from_sklearn(model)
+    positive = list(model.classes_).index(1)
+    print(f"Tree: {flat_tree.node_count} nodes, depth {model.get_depth()}, test set: {len(X_test):,} rows")
+
+    expected = model.predict_proba(X_test)[:, positive]
+    batch_diff = np.count_nonzero(flat_tree.predict_proba(X_test) != expected)
+    row_diff = sum(flat_tree.predict_row(x) != p for x, p in zip(X_test, expected))
+    print(f"Bit-identical to sklearn: batch {'✓' if not batch_diff else f'✗ {batch_diff} rows differ'}, "
+          f"single-row {'✓' if not row_diff else f'✗ {row_diff} rows differ'}")
+
+    sample = X_test[:rows]
+    print(f"\n{'Variant':<28} {'Median (µs)':>12} {'p99 (µs)':>10}")
+    print("-" * 52)
+    sk_median, sk_p99 = time_per_call(lambda x: model.predict_proba(x[None, :])[0, positive], sample)
+    flat_median, flat_p99 = time_per_call(flat_tree.predict_row, sample)
+    print(f"{'sklearn predict_proba':<28} {sk_median:>12.2f} {sk_p99:>10.2f}")
+    print(f"{'FlatTree.predict_row':<28} {flat_median:>12.2f} {flat_p99:>10.2f}")
+    print(f"  single row: {sk_median / flat_median:.1f}x faster")
+
+    print(f"\n{'Batch size':<12} {'sklearn (ms)':>14} {'FlatTree (ms)':>14}")
+    print("-" * 42)
+    for size in batch_sizes:
+        batch = X_test[:size]
+        sk_times, flat_times = [], []
+        for _ in range(5):
+            start = time.perf_counter()
+            model.predict_proba(batch)
+            sk_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            flat_tree.predict_proba(batch)
+            flat_times.append(time.perf_counter() - start)
+        print(f"{len(batch):<12,} {np.median(sk_times) * 1000:>14.3f} {np.median(flat_times) * 1000:>14.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark flattened decision tree scoring against sklearn")
+    parser.add_argument("--nrows", type=int, default=200000, help="Dataset rows to split the test set from (0 for all)")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows timed one at a time")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="Fit a tree on N synthetic samples instead of using the served model")
+    parser.add_argument("--max-depth", type=int, default=15, help="Depth of the synthetic tree")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model, X_test = fit_synthetic(args.synthetic, 50, args.max_depth)
+    else:
+        model, X_test = load_served(args.nrows or None)
+    run_benchmark(model, X_test, args.rows, args.batch_sizes)
@@ -2,9 +2,16 @@
 Ingest Kaggle IEEE-CIS Fraud Detection dataset into MongoDB
 Processes train_transaction.csv and train_identity.csv
 Optimized with progress bar and batch processing
+Rows are transformed column-wise into raw documents and each batch is written
+with one unordered insert_many per collection
+Use --stream to read the CSV in chunks with bounded memory (full dataset)
+Progress is checkpointed per chunk; --resume continues an interrupted run with idempotent upserts
+The selected columns are read from a memory-mapped columnar cache built on first use (--no-cache to parse the CSV)
 """
 import os
 import sys
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone
@@ -19,9 +26,13 @@ load_dotenv()
 sys.path.append(str(Path(__file__).parent.parent))
 
 from beanie import init_beanie
+from bson import DBRef, ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.models.models import Transaction, Alert, Case, Rule, CaseNote, SAR
 from app.fraud_engine.scoring.scorer import Scorer
+from app.fraud_engine.ml_engine.dataset_cache import DatasetCache
 
 # Try to import tqdm for progress bar, fallback to simple progress if not available
 try:
@@ -36,6 +47,10 @@ SOURCES_DIR = r'c:\Users\Wahid Khan\Desktop\g_project\sources'
 MONGODB_URL = os.getenv("MONGODB_URL") or os.getenv("MONGODB_URI") or "mongodb://localhost:27017"
 DB_NAME = os.getenv("DB_NAME", "fraud_detection")
 
+# Progress of the last run, used by --resume
+CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", str(Path(__file__).parent / ".ingest_checkpoint.json"))
+DUPLICATE_KEY_ERROR = 11000
+
 # Print configuration for debugging
 print(f"MongoDB URL: {MONGODB_URL.replace('://', '://***:***@') if '@' in MONGODB_URL else MONGODB_URL}")
 print(f"Database: {DB_NAME}")
@@ -56,6 +71,25 @@ IDENTITY_FEATURES = [
     'DeviceType', 'DeviceInfo'
 ]
 
+# Explicit dtypes keep the frames small: float32 for numeric features, category for
+# low-cardinality strings. TransactionDT and TransactionAmt stay 64-bit because
+# float32 cannot represent their full range / cents exactly.
+TRANSACTION_DTYPES = {
+    'TransactionID': np.int64, 'isFraud': np.int8, 'TransactionDT': np.int64, 'TransactionAmt': np.float64,
+    'ProductCD': 'category', 'card4': 'category', 'card6': 'category',
+    'P_emaildomain': 'category', 'R_emaildomain': 'category',
+    **{col: np.float32 for col in ['card1', 'card2', 'card3', 'card5', 'addr1', 'addr2']},
+    **{f'C{i}': np.float32 for i in range(1, 15)},
+    **{f'D{i}': np.float32 for i in range(1, 16)},
+    **{f'M{i}': 'category' for i in range(1, 10)},
+}
+
+IDENTITY_DTYPES = {
+    'TransactionID': np.int64, 'DeviceType': 'category', 'DeviceInfo': 'category',
+    **{f'id_{i:02d}': np.float32 for i in range(1, 12)},
+    **{f'id_{i:02d}': 'category' for i in range(12, 21)},
+}
+
 async def init_database():
     """Initialize MongoDB connection and Beanie"""
     try:
@@ -83,24 +117,548 @@ async def init_database():
         raise
     
     await init_beanie(database=client[DB_NAME], document_models=[Transaction, Alert, Case, Rule, CaseNote, SAR])
+    # Declared on the model too; created explicitly so no chunk is written before it exists.
+    # It makes transaction_id lookups index scans and rejects a second copy from a concurrent run
+    await Transaction.get_pymongo_collection().create_index("transaction_id", unique=True)
     print(f"✓ Connected to database: {DB_NAME}")
 
-def convert_transaction_dt(dt_value):
-    """Convert TransactionDT (seconds from reference) to datetime"""
-    # Reference date is 2017-12-01 00:00:00
-    reference = pd.Timestamp('2017-12-01 00:00:00')
-    return reference + pd.Timedelta(seconds=int(dt_value))
+# Reference date for TransactionDT (seconds offset) is 2017-12-01 00:00:00
+TRANSACTION_DT_REFERENCE = pd.Timestamp('2017-12-01 00:00:00')
+
+PRODUCT_CD_CATEGORIES = {
+    'W': 'Web',
+    'C': 'Credit',
+    'R': 'Retail',
+    'S': 'Service',
+    'H': 'Home'
+}
+
+def convert_transaction_dt(dt_values):
+    """Convert a TransactionDT column (seconds from reference) to datetimes"""
+    return TRANSACTION_DT_REFERENCE + pd.to_timedelta(dt_values.astype(np.int64), unit='s')
 
 def map_product_cd_to_category(product_cd):
-    """Map ProductCD to category"""
-    mapping = {
-        'W': 'Web',
-        'C': 'Credit',
-        'R': 'Retail',
-        'S': 'Service',
-        'H': 'Home'
+    """Map a ProductCD column to categories ('Other' for unknown or missing codes)"""
+    return product_cd.astype(object).map(PRODUCT_CD_CATEGORIES).fillna('Other')
+
+def calculate_risk_scores_fast(df, amount, category, product_cd, is_fraud, rng):
+    """
+    Fast heuristic risk scoring for bulk ingestion (no ML model loading), column-wise
+    Fraud rows get a random high score from the actual label
+    """
+    # Amount-based risk
+    risk = np.select([amount > 5000, amount > 1000, amount > 500], [40, 20, 10], default=0)
+    
+    # Category-based risk
+    risk += np.where(category.isin(['Service', 'Other']), 15, 0)
+    
+    # ProductCD risk (Service, Home categories)
+    risk += np.where(product_cd.isin(['S', 'H']), 10, 0)
+    
+    # Card type risk
+    if 'card4' in df.columns:
+        card4 = df['card4'].astype(object)
+        risky_card = card4.notna() & card4.astype(str).str.lower().isin(['discover', 'american express'])
+        risk += np.where(risky_card, 5, 0)
+    
+    # Email domain risk
+    if 'P_emaildomain' in df.columns:
+        p_email = df['P_emaildomain'].astype(object)
+        temp_email = p_email.notna() & p_email.astype(str).str.lower().str.contains('temp', regex=False)
+        risk += np.where(temp_email, 15, 0)
+    
+    risk = np.minimum(risk, 99)
+    
+    # Use actual fraud label - random high risk score
+    fraud = is_fraud.to_numpy()
+    risk[fraud] = rng.randint(75, 100, size=int(fraud.sum()))
+    return risk
+
+def stable_object_id(collection, transaction_id):
+    """Deterministic ObjectId for a document derived from a transaction, so replays hit the same _id"""
+    return ObjectId(hashlib.blake2b(f"{collection}:{transaction_id}".encode(), digest_size=12).digest())
+
+def transform_chunk(batch, seed=None):
+    """
+    Turn a DataFrame chunk into ready-to-insert transaction, alert and case documents
+    All fields are computed column-wise; ids are generated client-side so alerts and
+    cases can reference their parents before anything is written. Ids are derived from
+    transaction_id, so transforming the same chunk twice yields the same documents.
+    Returns a dict with the documents, the parent position of each alert/case and the
+    number of rows that could not be converted.
+    """
+    rng = np.random.RandomState(seed) if seed is not None else np.random
+    
+    # Rows that cannot be converted (the per-row int() conversions would fail)
+    merchant_source = batch['card1'] if 'card1' in batch.columns else \
+        batch['addr1'] if 'addr1' in batch.columns else pd.Series(0, index=batch.index)
+    valid = batch['TransactionID'].notna() & batch['TransactionDT'].notna() & merchant_source.notna()
+    errors = int((~valid).sum())
+    df = batch[valid]
+    merchant_source = merchant_source[valid]
+    
+    timestamps = convert_transaction_dt(df['TransactionDT']).dt.to_pydatetime()
+    transaction_ids = df['TransactionID'].astype(np.int64)
+    # Upsampled copies of a fraud row get a "-<n>" suffix so every document has a distinct transaction_id
+    if '_replica' in df.columns:
+        replica = df['_replica'].to_numpy()
+        transaction_keys = [str(tid) if r == 0 else f"{tid}-{r}" for tid, r in zip(transaction_ids.tolist(), replica.tolist())]
+    else:
+        transaction_keys = [str(tid) for tid in transaction_ids.tolist()]
+    
+    # Customer id from the last 6 digits of TransactionID, merchant id from card1 (or addr1)
+    customer_ids = transaction_ids % 1000000
+    merchant_ids = merchant_source.astype(np.int64) % 10000
+    
+    product_cd = df['ProductCD'].astype(object) if 'ProductCD' in df.columns else pd.Series('W', index=df.index)
+    category = map_product_cd_to_category(product_cd)
+    
+    # Ensure amount is valid (minimum $0.01)
+    amount = df['TransactionAmt'].astype(np.float64).clip(lower=0.01)
+    
+    zeros = pd.Series(0.0, index=df.index)
+    old_balance = df['C1'].astype(np.float64).fillna(0.0) if 'C1' in df.columns else zeros
+    new_balance = df['C2'].astype(np.float64).fillna(0.0) if 'C2' in df.columns else zeros
+    
+    is_fraud = df['isFraud'] == 1
+    risk_scores = calculate_risk_scores_fast(df, amount, category, product_cd, is_fraud, rng)
+    alert_mask = (risk_scores >= 50) | is_fraud.to_numpy()
+    case_mask = alert_mask & (risk_scores >= 85)
+    risk_levels = np.where(risk_scores >= 91, "Very High", np.where(risk_scores >= 71, "High", "Medium"))
+    queues = np.where(risk_scores >= 90, "High Profile Queue", "General Queue")
+    
+    transaction_oids = [stable_object_id("transactions", key) for key in transaction_keys]
+    transactions = [
+        {
+            "_id": oid,
+            "transaction_id": tid,
+            "amount": amt,
+            "customer_id": cid,
+            "timestamp": ts,
+            "merchant_id": mid,
+            "category": cat,
+            "transaction_type": "PAYMENT",
+            "old_balance_orig": old_bal,
+            "new_balance_orig": new_bal,
+            "old_balance_dest": None,
+            "new_balance_dest": None,
+        }
+        for oid, tid, amt, cid, ts, mid, cat, old_bal, new_bal in zip(
+            transaction_oids, transaction_keys, amount.tolist(), customer_ids.tolist(),
+            timestamps, merchant_ids.tolist(), category.tolist(), old_balance.tolist(), new_balance.tolist()
+        )
+    ]
+    
+    now = datetime.now(timezone.utc)
+    alert_parents = np.flatnonzero(alert_mask).tolist()
+    alerts = [
+        {
+            "_id": stable_object_id("alerts", transaction_keys[pos]),
+            "transaction": DBRef("transactions", transaction_oids[pos]),
+            "risk_score": int(risk_scores[pos]),
+            "risk_level": str(risk_levels[pos]),
+            "status": "Pending",
+            "assigned_queue": str(queues[pos]),
+            "explanation": None,
+            "created_at": now,
+            "updated_at": None,
+        }
+        for pos in alert_parents
+    ]
+    
+    # Auto-create case for very high risk
+    case_parents = [i for i, pos in enumerate(alert_parents) if case_mask[pos]]
+    cases = [
+        {
+            "_id": stable_object_id("cases", alerts[i]["_id"]),
+            "alert": DBRef("alerts", alerts[i]["_id"]),
+            "status": "Open",
+            "analyst_id": None,
+            "created_at": now,
+            "updated_at": now,
+            "notes": [],
+        }
+        for i in case_parents
+    ]
+    
+    return {
+        "transactions": transactions,
+        "alerts": alerts,
+        "alert_parents": alert_parents,
+        "cases": cases,
+        "case_parents": case_parents,
+        "errors": errors,
     }
-    return mapping.get(product_cd, 'Other')
+
+async def insert_many_unordered(model, documents, batch_errors, batch_number, collection):
+    """
+    Insert raw documents with a single unordered insert_many
+    Returns the indices of documents that failed; failures are recorded in batch_errors
+    """
+    if not documents:
+        return set()
+    try:
+        await model.get_pymongo_collection().insert_many(documents, ordered=False)
+        return set()
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        failed = {err["index"] for err in write_errors}
+        batch_errors.append({
+            "batch": batch_number,
+            "collection": collection,
+            "failed": len(failed),
+            "message": write_errors[0].get("errmsg") if write_errors else str(e)
+        })
+        return failed
+
+async def upsert_many_unordered(model, documents, key, batch_errors, batch_number, collection):
+    """
+    Idempotent write: one unordered bulk_write of $setOnInsert upserts matched on `key`,
+    so documents that already exist (from an interrupted run) are left untouched.
+    A duplicate-key rejection means another run already wrote the document, not a failure.
+    Returns the indices of documents that failed; failures are recorded in batch_errors
+    """
+    if not documents:
+        return set()
+    operations = [UpdateOne({key: doc[key]}, {"$setOnInsert": doc}, upsert=True) for doc in documents]
+    try:
+        await model.get_pymongo_collection().bulk_write(operations, ordered=False)
+        return set()
+    except BulkWriteError as e:
+        write_errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+        failed = {err["index"] for err in write_errors}
+        if not failed:
+            return failed
+        batch_errors.append({
+            "batch": batch_number,
+            "collection": collection,
+            "failed": len(failed),
+            "message": write_errors[0].get("errmsg") if write_errors else str(e)
+        })
+        return failed
+
+async def write_chunk(docs, batch_errors, batch_number, upsert=False):
+    """
+    Write a transformed chunk: transactions, then alerts whose transaction was
+    written, then cases whose alert was written
+    upsert: Use idempotent upserts (every document keyed on its derived _id, so each
+    upsert is a primary-key lookup) instead of plain inserts; used when replaying chunks
+    Returns (transactions, alerts, cases, failed) counts
+    """
+    async def write(model, documents, key, collection):
+        if upsert:
+            return await upsert_many_unordered(model, documents, key, batch_errors, batch_number, collection)
+        return await insert_many_unordered(model, documents, batch_errors, batch_number, collection)
+    
+    failed_tx = await write(Transaction, docs["transactions"], "_id", "transactions")
+    
+    alert_idx = [i for i, parent in enumerate(docs["alert_parents"]) if parent not in failed_tx]
+    failed_alerts = await write(Alert, [docs["alerts"][i] for i in alert_idx], "_id", "alerts")
+    written_alerts = {alert_idx[j] for j in range(len(alert_idx)) if j not in failed_alerts}
+    
+    case_idx = [i for i, parent in enumerate(docs["case_parents"]) if parent in written_alerts]
+    failed_cases = await write(Case, [docs["cases"][i] for i in case_idx], "_id", "cases")
+    
+    return (
+        len(docs["transactions"]) - len(failed_tx),
+        len(written_alerts),
+        len(case_idx) - len(failed_cases),
+        len(failed_tx) + len(failed_alerts) + len(failed_cases),
+    )
+
+def count_labels(path, nrows=None):
+    """First pass over the label column only: (row count, fraud count)"""
+    total = fraud = 0
+    for chunk in pd.read_csv(path, usecols=['isFraud'], dtype={'isFraud': np.int8}, nrows=nrows, chunksize=500000):
+        total += len(chunk)
+        fraud += int(chunk['isFraud'].sum())
+    return total, fraud
+
+def load_identity_index(path, nrows=None):
+    """Identity rows indexed by TransactionID so each chunk can be joined without a full merge"""
+    identity = pd.read_csv(path, nrows=nrows, usecols=IDENTITY_FEATURES, dtype=IDENTITY_DTYPES)
+    return identity.drop_duplicates('TransactionID').set_index('TransactionID')
+
+def upsample_factor(total, fraud, sample_fraud_rate):
+    """Copies per fraud row needed to reach the target fraud rate (1.0 = no upsampling)"""
+    if not sample_fraud_rate or not total or not fraud or fraud / total >= sample_fraud_rate:
+        return 1.0
+    target_fraud_count = int((total - fraud) * sample_fraud_rate / (1 - sample_fraud_rate))
+    return max(1.0, target_fraud_count / fraud)
+
+def upsample_chunk(chunk, factor, rng):
+    """
+    Replicate fraud rows on the fly: floor(factor) copies each, plus one more with
+    probability frac(factor), so the expected fraud count matches a global upsample.
+    Rows are shuffled within the chunk.
+    """
+    if factor > 1.0:
+        fraud = chunk['isFraud'].to_numpy() == 1
+        repeats = np.ones(len(chunk), dtype=np.int64)
+        whole = int(factor)
+        extra = rng.random_sample(int(fraud.sum())) < factor - whole
+        repeats[fraud] = whole + extra
+        chunk = chunk.iloc[np.repeat(np.arange(len(chunk)), repeats)]
+    # Each TransactionID lives in a single source chunk, so per-chunk numbering is global
+    chunk = chunk.assign(_replica=chunk.groupby('TransactionID').cumcount())
+    return chunk.iloc[rng.permutation(len(chunk))].reset_index(drop=True)
+
+def stream_chunks(path, identity, batch_size, factor, nrows=None, seed=42, start_chunk=0):
+    """
+    Yield (batch_number, DataFrame) from the transaction CSV, batch_size source rows at a time,
+    with identity columns joined and fraud rows upsampled per chunk. Only one chunk is
+    materialized at a time, so memory does not grow with the dataset.
+    start_chunk: Skip the rows of earlier chunks without parsing them (resume)
+    """
+    skipped = start_chunk * batch_size
+    if nrows is not None:
+        nrows -= skipped
+        if nrows <= 0:
+            return
+    reader = pd.read_csv(path, usecols=TRANSACTION_FEATURES, dtype=TRANSACTION_DTYPES, nrows=nrows,
+                         chunksize=batch_size, skiprows=range(1, skipped + 1) if skipped else None)
+    for batch_number, chunk in enumerate(reader, start=start_chunk):
+        if identity is not None:
+            chunk = chunk.join(identity, on='TransactionID')
+        # Per-chunk RNG: a chunk's contents do not depend on which chunks were read before it
+        yield batch_number, upsample_chunk(chunk, factor, np.random.RandomState(seed + batch_number))
+
+def cache_chunks(dataset, batch_size, factor, seed=42, start_chunk=0):
+    """stream_chunks over the columnar cache: each chunk is a slice of the memory-mapped columns"""
+    for batch_number, start in enumerate(range(start_chunk * batch_size, len(dataset), batch_size), start=start_chunk):
+        chunk = dataset.frame(TRANSACTION_FEATURES, start, start + batch_size).reset_index(drop=True)
+        yield batch_number, upsample_chunk(chunk, factor, np.random.RandomState(seed + batch_number))
+
+def peak_memory_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class Checkpoint:
+    """
+    Ingestion progress persisted to a JSON file after every written chunk.
+    Chunks can finish out of order in pipeline mode, so the committed offset is the
+    first chunk not yet written (every chunk before it is durable). A chunk with write
+    failures never counts as written: the offset stops before it, so --resume replays it
+    (and the chunks after it, which upserts make idempotent). The run parameters are
+    stored too: a resume must regenerate exactly the same chunks.
+    """
+    
+    def __init__(self, path, params, next_chunk=0):
+        self.path = path
+        self.params = params
+        self.next_chunk = next_chunk
+        self.completed = False
+        self.failed_chunks = set()
+        self._done = set()
+    
+    @classmethod
+    def load(cls, path):
+        """Return the saved checkpoint, or None if there is none"""
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        checkpoint = cls(path, state["params"], state["next_chunk"])
+        checkpoint.completed = state.get("completed", False)
+        return checkpoint
+    
+    def mark_done(self, batch_number, failed=0):
+        if failed:
+            self.failed_chunks.add(batch_number)
+            self.save()
+            return
+        self._done.add(batch_number)
+        advanced = False
+        while self.next_chunk in self._done:
+            self._done.remove(self.next_chunk)
+            self.next_chunk += 1
+            advanced = True
+        if advanced:
+            self.save()
+    
+    def finish(self):
+        """Completed only if every chunk was written; otherwise the run stays resumable"""
+        self.completed = not self.failed_chunks
+        self.save()
+    
+    def save(self):
+        state = {
+            "params": self.params,
+            "next_chunk": self.next_chunk,
+            "completed": self.completed,
+            "failed_chunks": sorted(self.failed_chunks),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def chunk_seed(seed, batch_number):
+    """Per-chunk seed so results do not depend on which worker transforms a chunk"""
+    return None if seed is None else seed + batch_number
+
+def record_chunk(totals, docs, written, batch_number):
+    """Add a written chunk's counts to the running totals"""
+    if docs["errors"] and totals["errors"] < 5:  # Only print for the first errors
+        print(f"\n⚠ Skipped {docs['errors']} unconvertible rows in batch {batch_number}")
+    totals["transactions"] += written[0]
+    totals["alerts"] += written[1]
+    totals["cases"] += written[2]
+    totals["errors"] += docs["errors"] + written[3]
+
+class StageMetrics:
+    """Throughput and idle-time accounting for one pipeline stage"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.records = 0
+        self.busy = 0.0     # Time spent doing the stage's work
+        self.idle = 0.0     # Time waiting for input from the previous stage
+        self.blocked = 0.0  # Time waiting for room in the next stage's queue
+    
+    def report(self):
+        rate = self.records / self.busy if self.busy > 0 else 0
+        return (f"{self.name:<12} {self.items:>7,} {self.records:>10,} {self.busy:>9.1f} "
+                f"{self.idle:>9.1f} {self.blocked:>12.1f} {rate:>10,.0f}")
+
+async def run_pipeline(chunks, totals, batch_errors, progress, transform_workers, writers, queue_size, seed=None,
+                       checkpoint=None, upsert=False):
+    """
+    Bounded producer/consumer ingestion pipeline:
+      reader -> [queue] -> transform (process pool) -> [queue] -> N async writers
+    Queues hold at most `queue_size` chunks, so memory stays capped while CSV reading,
+    CPU-bound transformation and Mongo I/O overlap. Returns per-stage metrics.
+    """
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    
+    loop = asyncio.get_running_loop()
+    transform_queue = asyncio.Queue(maxsize=queue_size)
+    write_queue = asyncio.Queue(maxsize=queue_size)
+    reader_metrics = StageMetrics("read")
+    transform_metrics = StageMetrics("transform")
+    write_metrics = StageMetrics("write")
+    if seed is None:
+        # Each chunk needs its own seed: forked workers would otherwise share one RNG state
+        seed = int(np.random.randint(0, 2**31 - 1))
+    
+    async def reader():
+        iterator = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            # Chunk sources may block on file I/O; keep the event loop free
+            item = await loop.run_in_executor(None, next, iterator, None)
+            reader_metrics.busy += time.perf_counter() - started
+            if item is None:
+                break
+            reader_metrics.items += 1
+            reader_metrics.records += len(item[1])
+            started = time.perf_counter()
+            await transform_queue.put(item)
+            reader_metrics.blocked += time.perf_counter() - started
+        for _ in range(transform_workers):
+            await transform_queue.put(None)
+    
+    async def transformer(pool):
+        while True:
+            started = time.perf_counter()
+            item = await transform_queue.get()
+            transform_metrics.idle += time.perf_counter() - started
+            if item is None:
+                break
+            batch_number, batch = item
+            started = time.perf_counter()
+            docs = await loop.run_in_executor(pool, transform_chunk, batch, chunk_seed(seed, batch_number))
+            transform_metrics.busy += time.perf_counter() - started
+            transform_metrics.items += 1
+            transform_metrics.records += len(batch)
+            started = time.perf_counter()
+            await write_queue.put((batch_number, len(batch), docs))
+            transform_metrics.blocked += time.perf_counter() - started
+    
+    async def writer():
+        while True:
+            started = time.perf_counter()
+            item = await write_queue.get()
+            write_metrics.idle += time.perf_counter() - started
+            if item is None:
+                break
+            batch_number, n_rows, docs = item
+            started = time.perf_counter()
+            written = await write_chunk(docs, batch_errors, batch_number, upsert=upsert)
+            elapsed = time.perf_counter() - started
+            write_metrics.busy += elapsed
+            write_metrics.items += 1
+            write_metrics.records += n_rows
+            totals["write_time"] += elapsed
+            record_chunk(totals, docs, written, batch_number)
+            if checkpoint:
+                checkpoint.mark_done(batch_number, failed=written[3])
+            progress.update(n_rows)
+    
+    async def close_writers(producers):
+        await asyncio.gather(*producers)
+        for _ in range(writers):
+            await write_queue.put(None)
+    
+    with ProcessPoolExecutor(max_workers=transform_workers) as pool:
+        producers = [asyncio.create_task(reader())]
+        producers += [asyncio.create_task(transformer(pool)) for _ in range(transform_workers)]
+        tasks = producers + [asyncio.create_task(writer()) for _ in range(writers)]
+        tasks.append(asyncio.create_task(close_writers(producers)))
+        try:
+            # A failed stage would leave the others blocked on a full queue: stop everything
+            # on the first error and re-raise it (written chunks stay checkpointed for --resume)
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Writers run concurrently, so their summed busy time exceeds wall-clock time
+    write_metrics.busy /= max(writers, 1)
+    write_metrics.idle /= max(writers, 1)
+    transform_metrics.busy /= max(transform_workers, 1)
+    transform_metrics.idle /= max(transform_workers, 1)
+    transform_metrics.blocked /= max(transform_workers, 1)
+    return [reader_metrics, transform_metrics, write_metrics]
+
+class ProgressReporter:
+    """tqdm progress bar with a plain-text fallback"""
+    
+    def __init__(self, total, start_time):
+        self.total = total
+        self.current = 0
+        self.start_time = start_time
+        if HAS_TQDM:
+            self.pbar = tqdm(total=total, desc="Ingesting", unit="records", ncols=100, mininterval=0.5)
+        else:
+            print_progress(0, total, "Ingesting", start_time)
+    
+    def update(self, n):
+        self.current += n
+        if HAS_TQDM:
+            self.pbar.update(n)
+        else:
+            print_progress(min(self.current, self.total), self.total, "Ingesting", self.start_time)
+    
+    def close(self):
+        if HAS_TQDM:
+            self.pbar.close()
+        else:
+            print()  # New line after progress
 
 def print_progress(current, total, prefix="Progress", start_time=None):
     """Print progress information"""
@@ -150,214 +708,199 @@ async def clear_all_data():
     print(f"\n✓ Total records deleted: {total_deleted:,}")
     print("="*60)
 
-async def ingest_data(nrows=None, sample_fraud_rate=0.035, batch_size=2000):
+async def ingest_data(nrows=None, sample_fraud_rate=0.035, batch_size=2000, pipeline=False,
+                      transform_workers=None, writers=4, queue_size=4, seed=None, streaming=False,
+                      resume=False, checkpoint_path=None, use_cache=True):
     """
     Ingest Kaggle data into MongoDB
     nrows: Limit number of rows (None for all)
     sample_fraud_rate: Target fraud rate for sampling (to balance dataset)
     batch_size: Number of records to process in each batch (larger = faster but more memory)
+    pipeline: Overlap reading, transformation (process pool) and writes (concurrent writers)
+    transform_workers: Transform processes in pipeline mode (default: all cores)
+    writers: Concurrent Mongo writers in pipeline mode
+    queue_size: Max chunks buffered between pipeline stages (bounds memory)
+    seed: Base seed for the random fraud risk scores (per-chunk seeds are derived from it)
+    streaming: Read the CSV in chunks (constant memory) instead of loading it whole
+    resume: Continue from the checkpoint instead of clearing the database; replayed
+        chunks are written with idempotent upserts
+    checkpoint_path: Checkpoint file (default: CHECKPOINT_PATH)
+    use_cache: Read the memory-mapped columnar cache (built on first use) instead of parsing the CSV
     """
+    transform_workers = transform_workers or os.cpu_count() or 1
+    checkpoint_path = checkpoint_path or CHECKPOINT_PATH
     start_time = time.time()
+    
+    # Everything that determines chunk contents; a resume must reproduce the same chunks
+    params = {
+        "nrows": nrows,
+        "sample_fraud_rate": sample_fraud_rate,
+        "batch_size": batch_size,
+        "streaming": streaming,
+        "seed": seed
+    }
+    saved = Checkpoint.load(checkpoint_path) if resume else None
+    if saved:
+        if saved.completed:
+            print(f"✓ Checkpoint {checkpoint_path} records a completed ingestion - nothing to resume")
+            return
+        mismatched = {key: (value, params[key]) for key, value in saved.params.items()
+                      if key != "seed" and params.get(key) != value}
+        if mismatched or (seed is not None and seed != saved.params["seed"]):
+            print(f"✗ Checkpoint {checkpoint_path} was written with different parameters:")
+            for key, (before, now) in mismatched.items():
+                print(f"   {key}: checkpoint={before} requested={now}")
+            return
+        params = saved.params
+    elif resume:
+        print(f"⚠ No checkpoint at {checkpoint_path}; replaying from the start without clearing data")
+    if params["seed"] is None:
+        # Fix the seed up front so a resumed run regenerates identical chunks
+        params["seed"] = int(np.random.randint(0, 2**31 - 1))
+    seed = params["seed"]
+    checkpoint = Checkpoint(checkpoint_path, params, saved.next_chunk if saved else 0)
+    start_chunk = checkpoint.next_chunk
+    
     await init_database()
     
     print("\n" + "=" * 60)
-    print("Starting Kaggle Data Ingestion")
+    print("Resuming Kaggle Data Ingestion" if resume else "Starting Kaggle Data Ingestion")
     print("=" * 60)
     
-    # Clear ALL existing data first
-    await clear_all_data()
-    
-    # Load transaction data
-    print(f"\n📂 Loading transaction data from {SOURCES_DIR}/train_transaction.csv...")
-    load_start = time.time()
-    train_trans = pd.read_csv(
-        os.path.join(SOURCES_DIR, 'train_transaction.csv'),
-        nrows=nrows,
-        usecols=TRANSACTION_FEATURES if nrows else None
-    )
-    print(f"✓ Loaded {len(train_trans):,} transaction records in {time.time() - load_start:.1f}s")
-    
-    # Load identity data
-    print(f"📂 Loading identity data from {SOURCES_DIR}/train_identity.csv...")
-    load_start = time.time()
-    try:
-        train_identity = pd.read_csv(
-            os.path.join(SOURCES_DIR, 'train_identity.csv'),
-            nrows=nrows,
-            usecols=IDENTITY_FEATURES if nrows else None
-        )
-        print(f"✓ Loaded {len(train_identity):,} identity records in {time.time() - load_start:.1f}s")
-        # Merge identity data
-        df = train_trans.merge(train_identity, on='TransactionID', how='left')
-    except Exception as e:
-        print(f"⚠ Warning: Could not load identity data: {e}")
-        df = train_trans.copy()
-    
-    # Sample data to balance fraud rate if needed
-    fraud_count = df['isFraud'].sum()
-    fraud_rate = fraud_count / len(df)
-    print(f"\n📊 Original fraud rate: {fraud_rate:.4f} ({fraud_count:,} fraud cases)")
-    
-    if sample_fraud_rate and fraud_rate < sample_fraud_rate:
-        # Upsample fraud cases
-        fraud_df = df[df['isFraud'] == 1]
-        non_fraud_df = df[df['isFraud'] == 0]
-        target_fraud_count = int(len(non_fraud_df) * sample_fraud_rate / (1 - sample_fraud_rate))
-        if target_fraud_count > len(fraud_df):
-            fraud_df = fraud_df.sample(n=target_fraud_count, replace=True, random_state=42)
-        df = pd.concat([non_fraud_df, fraud_df]).sample(frac=1, random_state=42).reset_index(drop=True)
-        print(f"📊 After sampling: {df['isFraud'].sum():,} fraud cases ({df['isFraud'].sum()/len(df):.4f} rate)")
-    
-    # Process and insert transactions
-    print(f"\n🔄 Processing and inserting {len(df):,} transactions...")
-    print(f"   Batch size: {batch_size:,} records")
-    print(f"   Note: Using fast heuristic scoring (ML models will be used in real-time)")
-    
-    # Don't initialize Scorer here - it loads ML models which is slow
-    # Use fast heuristic scoring instead for bulk ingestion
-    inserted_count = 0
-    alert_count = 0
-    case_count = 0
-    error_count = 0
-    
-    # Use tqdm if available, otherwise use simple progress
-    if HAS_TQDM:
-        pbar = tqdm(total=len(df), desc="Ingesting", unit="records", ncols=100, mininterval=0.5)
+    if resume:
+        print(f"\n↻ Resuming at chunk {start_chunk:,} (checkpoint: {checkpoint_path})")
     else:
-        print_progress(0, len(df), "Ingesting", start_time)
+        # Clear ALL existing data first
+        await clear_all_data()
+    checkpoint.save()
     
-    def calculate_risk_score_fast(transaction, is_fraud, row):
-        """Fast heuristic risk scoring for bulk ingestion (no ML model loading)"""
-        if is_fraud:
-            # Use actual fraud label - calculate high risk score
-            return np.random.randint(75, 100)
-        
-        # Fast heuristic scoring (no ML model needed)
-        base_risk = 0
-        
-        # Amount-based risk
-        if transaction.amount > 5000:
-            base_risk += 40
-        elif transaction.amount > 1000:
-            base_risk += 20
-        elif transaction.amount > 500:
-            base_risk += 10
-        
-        # Category-based risk
-        high_risk_cats = ['Service', 'Other']
-        if transaction.category in high_risk_cats:
-            base_risk += 15
-        
-        # ProductCD risk (from original data)
-        product_cd = row.get('ProductCD', 'W')
-        if product_cd in ['S', 'H']:  # Service, Home categories
-            base_risk += 10
-        
-        # Card type risk
-        card4 = row.get('card4', '')
-        if pd.notna(card4) and str(card4).lower() in ['discover', 'american express']:
-            base_risk += 5
-        
-        # Email domain risk
-        p_email = row.get('P_emaildomain', '')
-        if pd.notna(p_email) and 'temp' in str(p_email).lower():
-            base_risk += 15
-        
-        return min(int(base_risk), 99)
+    transaction_path = os.path.join(SOURCES_DIR, 'train_transaction.csv')
+    identity_path = os.path.join(SOURCES_DIR, 'train_identity.csv')
+    
+    dataset = None
+    if use_cache:
+        # Identity columns are not used by the documents, so the cache covers the transaction file only
+        print(f"\n📂 Opening columnar cache of {transaction_path}...")
+        load_start = time.time()
+        dataset = DatasetCache(transaction_path).load(nrows)
+        print(f"✓ {len(dataset):,} cached transaction records ready in {time.time() - load_start:.1f}s ({dataset.path})")
     
-    # Process in batches
-    for idx in range(0, len(df), batch_size):
-        batch = df.iloc[idx:idx+batch_size]
-        transactions_to_insert = []
+    if streaming:
+        # Label-only first pass sizes the upsampling without loading the feature columns
+        print(f"\n📂 Streaming transaction data from {transaction_path} in chunks of {batch_size:,}...")
+        load_start = time.time()
+        if dataset is not None:
+            total_rows, fraud_count = len(dataset), int(dataset.column('isFraud').sum())
+        else:
+            total_rows, fraud_count = count_labels(transaction_path, nrows)
+        print(f"✓ Counted {total_rows:,} transaction records in {time.time() - load_start:.1f}s")
         
-        # Prepare transactions
-        for _, row in batch.iterrows():
+        identity = None
+        if dataset is None:
+            print(f"📂 Indexing identity data from {identity_path}...")
             try:
-                # Convert TransactionDT to datetime
-                timestamp = convert_transaction_dt(row['TransactionDT'])
-                
-                # Extract customer_id from TransactionID (use last 6 digits)
-                customer_id = int(str(row['TransactionID'])[-6:]) % 1000000
-                
-                # Extract merchant_id from card1 (or use addr1)
-                merchant_id = int(row.get('card1', row.get('addr1', 0))) % 10000
-                
-                # Map ProductCD to category
-                category = map_product_cd_to_category(row.get('ProductCD', 'W'))
-                
-                # Ensure amount is valid (minimum $0.01)
-                amount = max(float(row['TransactionAmt']), 0.01)
-                
-                # Create transaction
-                transaction = Transaction(
-                    transaction_id=str(row['TransactionID']),
-                    amount=amount,
-                    customer_id=customer_id,
-                    timestamp=timestamp,
-                    merchant_id=merchant_id,
-                    category=category,
-                    transaction_type="PAYMENT",
-                    old_balance_orig=float(row.get('C1', 0)) if not pd.isna(row.get('C1')) else 0.0,
-                    new_balance_orig=float(row.get('C2', 0)) if not pd.isna(row.get('C2')) else 0.0,
-                )
-                transactions_to_insert.append((transaction, row))
-                
+                identity = load_identity_index(identity_path, nrows)
+                print(f"✓ Indexed {len(identity):,} identity records")
             except Exception as e:
-                error_count += 1
-                if error_count <= 5:  # Only print first 5 errors
-                    print(f"\n⚠ Error processing transaction {row.get('TransactionID', 'unknown')}: {e}")
-                continue
+                print(f"⚠ Warning: Could not load identity data: {e}")
+        
+        fraud_rate = fraud_count / total_rows if total_rows else 0
+        print(f"\n📊 Original fraud rate: {fraud_rate:.4f} ({fraud_count:,} fraud cases)")
+        factor = upsample_factor(total_rows, fraud_count, sample_fraud_rate)
+        expected_rows = int(total_rows - fraud_count + fraud_count * factor)
+        if factor > 1.0:
+            print(f"📊 Upsampling fraud rows on the fly ×{factor:.2f} (~{expected_rows - total_rows + fraud_count:,} fraud cases)")
         
-        # Insert transactions and create alerts/cases
-        for transaction, row in transactions_to_insert:
+        if dataset is not None:
+            chunks = cache_chunks(dataset, batch_size, factor, seed=seed, start_chunk=start_chunk)
+        else:
+            chunks = stream_chunks(transaction_path, identity, batch_size, factor, nrows=nrows, seed=seed,
+                                   start_chunk=start_chunk)
+        if start_chunk and total_rows:
+            remaining = max(0, total_rows - start_chunk * batch_size)
+            expected_rows = int(expected_rows * remaining / total_rows)
+    else:
+        if dataset is not None:
+            df = dataset.frame(TRANSACTION_FEATURES)
+        else:
+            # Load transaction data
+            print(f"\n📂 Loading transaction data from {transaction_path}...")
+            load_start = time.time()
+            train_trans = pd.read_csv(transaction_path, nrows=nrows, usecols=TRANSACTION_FEATURES, dtype=TRANSACTION_DTYPES)
+            print(f"✓ Loaded {len(train_trans):,} transaction records in {time.time() - load_start:.1f}s")
+            
+            # Load identity data
+            print(f"📂 Loading identity data from {identity_path}...")
+            load_start = time.time()
             try:
-                await transaction.insert()
-                inserted_count += 1
-                
-                # Get original row data
-                is_fraud = row['isFraud'] == 1
-                
-                # Calculate risk score using fast heuristic
-                risk_score = calculate_risk_score_fast(transaction, is_fraud, row)
-                
-                # Create alert if risk is high or is fraud
-                if risk_score >= 50 or is_fraud:
-                    risk_level = "Very High" if risk_score >= 91 else "High" if risk_score >= 71 else "Medium"
-                    
-                    alert = Alert(
-                        transaction=transaction,  # Transaction has ID now
-                        risk_score=risk_score,
-                        risk_level=risk_level,
-                        status="Pending",
-                        assigned_queue="High Profile Queue" if risk_score >= 90 else "General Queue"
-                    )
-                    await alert.insert()
-                    alert_count += 1
-                    
-                    # Auto-create case for very high risk
-                    if risk_score >= 85:
-                        case = Case(
-                            alert=alert,  # Alert has ID now
-                            status="Open",
-                            analyst_id=None
-                        )
-                        await case.insert()
-                        case_count += 1
+                train_identity = pd.read_csv(identity_path, nrows=nrows, usecols=IDENTITY_FEATURES, dtype=IDENTITY_DTYPES)
+                print(f"✓ Loaded {len(train_identity):,} identity records in {time.time() - load_start:.1f}s")
+                # Merge identity data
+                df = train_trans.merge(train_identity, on='TransactionID', how='left')
             except Exception as e:
-                error_count += 1
-                if error_count <= 5:
-                    print(f"\n⚠ Error inserting transaction {transaction.transaction_id}: {e}")
+                print(f"⚠ Warning: Could not load identity data: {e}")
+                df = train_trans.copy()
         
-        # Update progress
-        if HAS_TQDM:
-            pbar.update(len(batch))
-        else:
-            print_progress(min(idx + batch_size, len(df)), len(df), "Ingesting", start_time)
+        # Sample data to balance fraud rate if needed
+        fraud_count = df['isFraud'].sum()
+        fraud_rate = fraud_count / len(df)
+        print(f"\n📊 Original fraud rate: {fraud_rate:.4f} ({fraud_count:,} fraud cases)")
+        
+        if sample_fraud_rate and fraud_rate < sample_fraud_rate:
+            # Upsample fraud cases
+            fraud_df = df[df['isFraud'] == 1]
+            non_fraud_df = df[df['isFraud'] == 0]
+            target_fraud_count = int(len(non_fraud_df) * sample_fraud_rate / (1 - sample_fraud_rate))
+            if target_fraud_count > len(fraud_df):
+                fraud_df = fraud_df.sample(n=target_fraud_count, replace=True, random_state=42)
+            df = pd.concat([non_fraud_df, fraud_df]).sample(frac=1, random_state=42).reset_index(drop=True)
+            print(f"📊 After sampling: {df['isFraud'].sum():,} fraud cases ({df['isFraud'].sum()/len(df):.4f} rate)")
+        
+        df['_replica'] = df.groupby('TransactionID').cumcount()
+        expected_rows = max(0, len(df) - start_chunk * batch_size)
+        chunks = ((idx // batch_size, df.iloc[idx:idx+batch_size])
+                  for idx in range(start_chunk * batch_size, len(df), batch_size))
+    
+    # Process and insert transactions
+    print(f"\n🔄 Processing and inserting {expected_rows:,} transactions...")
+    print(f"   Batch size: {batch_size:,} records")
+    print(f"   Note: Using fast heuristic scoring (ML models will be used in real-time)")
     
-    if HAS_TQDM:
-        pbar.close()
+    # Don't initialize Scorer here - it loads ML models which is slow
+    # Use fast heuristic scoring instead for bulk ingestion
+    totals = {"transactions": 0, "alerts": 0, "cases": 0, "errors": 0, "write_time": 0.0}
+    batch_errors = []
+    progress = ProgressReporter(expected_rows, start_time)
+    stage_metrics = None
+    
+    if pipeline:
+        print(f"   Pipeline: {transform_workers} transform processes, {writers} writers, queue size {queue_size}")
+        stage_metrics = await run_pipeline(
+            chunks, totals, batch_errors, progress,
+            transform_workers=transform_workers, writers=writers, queue_size=queue_size, seed=seed,
+            checkpoint=checkpoint, upsert=resume
+        )
     else:
-        print()  # New line after progress
+        for batch_number, batch in chunks:
+            # Column-wise transformation into ready-to-insert documents
+            docs = transform_chunk(batch, chunk_seed(seed, batch_number))
+            
+            write_start = time.time()
+            written = await write_chunk(docs, batch_errors, batch_number, upsert=resume)
+            totals["write_time"] += time.time() - write_start
+            record_chunk(totals, docs, written, batch_number)
+            checkpoint.mark_done(batch_number, failed=written[3])
+            
+            # Update progress
+            progress.update(len(batch))
+    
+    progress.close()
+    checkpoint.finish()
+    inserted_count = totals["transactions"]
+    alert_count = totals["alerts"]
+    case_count = totals["cases"]
+    error_count = totals["errors"]
+    write_time = totals["write_time"]
     
     # Final summary
     elapsed_time = time.time() - start_time
@@ -370,15 +913,56 @@ async def ingest_data(nrows=None, sample_fraud_rate=0.035, batch_size=2000):
     print(f"  ⚠️  Errors: {error_count:,}")
     print(f"  ⏱️  Time: {elapsed_time:.1f}s ({elapsed_time/60:.1f} minutes)")
     print(f"  📈 Rate: {inserted_count/elapsed_time:.0f} records/second")
+    if write_time > 0:
+        print(f"  💾 Write: {write_time:.1f}s ({(inserted_count + alert_count + case_count)/write_time:.0f} documents/second)")
+    peak_mb = peak_memory_mb()
+    if peak_mb:
+        print(f"  🧠 Peak memory: {peak_mb:,.0f} MB")
     print(f"{'='*60}")
+    
+    if stage_metrics:
+        print(f"\n{'Stage':<12} {'Items':>7} {'Records':>10} {'Busy (s)':>9} {'Idle (s)':>9} {'Blocked (s)':>12} {'Records/s':>10}")
+        for metrics in stage_metrics:
+            print(metrics.report())
+    
+    if batch_errors:
+        print(f"\n⚠ Write errors in {len({e['batch'] for e in batch_errors}):,} batches (showing first 10):")
+        for err in batch_errors[:10]:
+            print(f"  Batch {err['batch']} {err['collection']}: {err['failed']:,} failed - {err['message']}")
+    if checkpoint.failed_chunks:
+        print(f"\n↻ Checkpoint stopped at chunk {checkpoint.next_chunk:,}: run again with --resume "
+              f"to retry the failed chunks")
 
 if __name__ == "__main__":
     import asyncio
+    import argparse
     
-    # Configuration
-    # Use nrows=50000 for quick testing, None for full dataset
+    parser = argparse.ArgumentParser(description="Ingest the Kaggle IEEE-CIS dataset into MongoDB")
+    # Use --nrows 50000 for quick testing, 0 for the full dataset
+    parser.add_argument("--nrows", type=int, default=50000, help="Rows to load (0 for all)")
     # Increase batch_size for faster processing (uses more memory)
+    parser.add_argument("--batch-size", type=int, default=2000, help="Records per batch (2000-5000 recommended)")
+    parser.add_argument("--pipeline", action="store_true", help="Run reading, transformation and writes as a parallel pipeline")
+    parser.add_argument("--transform-workers", type=int, default=None, help="Transform processes in pipeline mode (default: all cores)")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent Mongo writers in pipeline mode")
+    parser.add_argument("--queue-size", type=int, default=4, help="Max chunks buffered between pipeline stages")
+    parser.add_argument("--seed", type=int, default=None, help="Base seed for the random fraud risk scores")
+    parser.add_argument("--stream", action="store_true", help="Read the CSV in chunks with bounded memory (recommended for the full dataset)")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted ingestion from its checkpoint (does not clear data)")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the CSV instead of using the columnar dataset cache")
+    parser.add_argument("--checkpoint", default=None, help=f"Checkpoint file (default: {CHECKPOINT_PATH})")
+    args = parser.parse_args()
+    
     asyncio.run(ingest_data(
-        nrows=50000,  # Change to None for full dataset
-        batch_size=2000  # Increase for faster processing (2000-5000 recommended)
+        nrows=args.nrows or None,
+        batch_size=args.batch_size,
+        pipeline=args.pipeline,
+        transform_workers=args.transform_workers,
+        writers=args.writers,
+        queue_size=args.queue_size,
+        seed=args.seed,
+        streaming=args.stream,
+        resume=args.resume,
+        checkpoint_path=args.checkpoint,
+        use_cache=not args.no_cache
     ))
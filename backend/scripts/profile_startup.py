@@ -0,0 +1,107 @@
+"""
+Profile API cold start
+1. Import profile: runs `python -X importtime -c "import app.main"` in a fresh
+   interpreter and prints the cumulative import-time tree (modules above a threshold)
+2. Time to first request: starts uvicorn in a subprocess and measures the time
+   until /api/health answers, and until the background model preload finishes
+   (reported by /api/health/workers)
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+def import_profile(module="app.main"):
+    """[(depth, module, self_us, cumulative_us)] in import order, from a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": str(BACKEND_DIR)},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+def print_import_tree(entries, threshold_ms, max_depth):
+    """importtime lists children before their parent; print parents first, pruned by cumulative time"""
+    total = sum(cumulative for depth, _, _, cumulative in entries if depth == 0)
+    print(f"Total import time: {total / 1000:.0f} ms ({len(entries)} modules)\n")
+    print(f"{'Cumulative (ms)':>16} {'Self (ms)':>10}  Module")
+    for depth, name, self_us, cumulative_us in reversed(entries):
+        if cumulative_us / 1000 >= threshold_ms and depth <= max_depth:
+            print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {'  ' * depth}{name}")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def get_json(url, timeout=1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def time_to_first_request(timeout, preload):
+    port = free_port()
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR), "PRELOAD_MODELS": "true" if preload else "false"}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    timings = {}
+    try:
+        base = f"http://127.0.0.1:{port}/api"
+        while time.perf_counter() - start < timeout:
+            try:
+                if "health" not in timings:
+                    get_json(f"{base}/health")
+                    timings["health"] = time.perf_counter() - start
+                if not preload or get_json(f"{base}/health/workers")["worker"].get("models_loaded"):
+                    timings["models_loaded"] = time.perf_counter() - start
+                    break
+            except OSError:
+                pass
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile API import time and time to first request")
+    parser.add_argument("--threshold-ms", type=float, default=10.0, help="Hide modules below this cumulative time")
+    parser.add_argument("--depth", type=int, default=4, help="Deepest import level shown")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--skip-server", action="store_true", help="Only profile imports")
+    parser.add_argument("--no-preload", action="store_true", help="Start with PRELOAD_MODELS=false")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print_import_tree(import_profile(args.module), args.threshold_ms, args.depth)
+
+    if not args.skip_server:
+        timings = time_to_first_request(args.timeout, not args.no_preload)
+        print()
+        if "health" in timings:
+            print(f"Time to first /api/health response: {timings['health'] * 1000:.0f} ms")
+        else:
+            print(f"✗ /api/health did not respond within {args.timeout:.0f}s")
+        if not args.no_preload:
+            if "models_loaded" in timings:
+                print(f"Models loaded in the background after: {timings['models_loaded'] * 1000:.0f} ms")
+            else:
+                print("✗ Models were not loaded before the timeout")
@@ -0,0 +1,128 @@
+"""
+Replay stored transactions through the full scoring path and the tiered scorer
+Every transaction is scored twice with the live rules and the served model: once
+with ML on every row (the reference) and once per uncertainty band with tier 0
+early exits. For each band it reports the share of traffic that still needed the
+ML model and every alert / case decision that changed. It also prints the
+narrowest band that reproduces every reference decision on this traffic.
+Exits non-zero if the configured band (SCORING_TIER_BAND_LOW/HIGH) changes any
+alert decision, so it can gate a band change. --report writes the results as JSON,
+the record to keep with a band before enabling SCORING_TIERED.
+"""
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.db.session import init_db, MONGODB_URI
+from app.models.models import Transaction
+from app.fraud_engine.ml_engine.heuristic import heuristic_probability
+from app.fraud_engine.scoring.scorer import Scorer, ALERT_THRESHOLD, CASE_THRESHOLD
+
+def decisions(score):
+    return score["risk_score"] > ALERT_THRESHOLD, score["risk_score"] > CASE_THRESHOLD
+
+async def score_all(scorer, transactions, chunk_size):
+    scores = []
+    for start in range(0, len(transactions), chunk_size):
+        scores.extend(await scorer.calculate_scores(transactions[start:start + chunk_size]))
+    return scores
+
+def compare(reference, tiered):
+    report = {"ml_rows": 0, "missed_alerts": 0, "extra_alerts": 0, "case_changes": 0}
+    for ref, score in zip(reference, tiered):
+        report["ml_rows"] += score["tier"] == 1
+        (ref_alert, ref_case), (alert, case) = decisions(ref), decisions(score)
+        report["missed_alerts"] += ref_alert and not alert
+        report["extra_alerts"] += alert and not ref_alert
+        report["case_changes"] += ref_case != case
+    return report
+
+def safe_band(scorer, transactions, reference):
+    """
+    Tier 0 decides a row from its provisional score; a band is safe exactly when it
+    contains the provisional score of every row where that decision is wrong
+    """
+    unsafe = []
+    for transaction, ref in zip(transactions, reference):
+        provisional = scorer.hybrid_score(ref["rule_score"], heuristic_probability(transaction))
+        if decisions({"risk_score": provisional}) != decisions(ref):
+            unsafe.append(provisional)
+    return (min(unsafe), max(unsafe)) if unsafe else None
+
+def parse_band(text):
+    low, high = text.split(":")
+    return float(low), float(high)
+
+async def main(args):
+    if not MONGODB_URI:
+        sys.exit("MONGODB_URI is not set")
+    await init_db()
+    # Compare model decisions, not latency: no heuristic stand-ins on a slow batch
+    settings.SCORING_BATCH_LATENCY_BUDGET_MS = 0
+
+    transactions = await Transaction.find_all().sort(-Transaction.timestamp).limit(args.limit).to_list()
+    if not transactions:
+        sys.exit("No transactions to replay")
+    print(f"Replaying {len(transactions):,} transactions "
+          f"(alert > {ALERT_THRESHOLD}, case > {CASE_THRESHOLD})\n")
+
+    full_scorer = Scorer(tiered=False, use_cache=False)
+    reference = await score_all(full_scorer, transactions, args.chunk_size)
+    configured = (settings.SCORING_TIER_BAND_LOW, settings.SCORING_TIER_BAND_HIGH)
+    bands = [configured] + [band for band in args.bands if band != configured]
+
+    print(f"{'Band':>12} {'ML share':>9} {'Missed alerts':>14} {'Extra alerts':>13} {'Case changes':>13}")
+    configured_report, reports = None, []
+    for low, high in bands:
+        scorer = Scorer(tiered=True, band_low=low, band_high=high, use_cache=False)
+        tiered = await score_all(scorer, transactions, args.chunk_size)
+        report = compare(reference, tiered)
+        if (low, high) == configured:
+            configured_report = report
+        reports.append({"band": [low, high], "configured": (low, high) == configured,
+                        "ml_share": report["ml_rows"] / len(transactions), **report})
+        label = f"{low:g}:{high:g}" + (" *" if (low, high) == configured else "")
+        print(f"{label:>12} {report['ml_rows'] / len(transactions):>9.1%} {report['missed_alerts']:>14} "
+              f"{report['extra_alerts']:>13} {report['case_changes']:>13}")
+    print("(* = configured band)")
+
+    band = safe_band(full_scorer, transactions, reference)
+    if band:
+        print(f"\nNarrowest band with no decision changes on this traffic: {band[0]:g}:{band[1]:g}")
+    else:
+        print("\nTier 0 alone reproduces every decision on this traffic")
+
+    changed = configured_report["missed_alerts"] + configured_report["extra_alerts"]
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({
+                "replayed_at": datetime.now(timezone.utc).isoformat(),
+                "transactions": len(transactions),
+                "model_bundle": full_scorer.ml_engine.serving_bundle,
+                "alert_threshold": ALERT_THRESHOLD,
+                "case_threshold": CASE_THRESHOLD,
+                "bands": reports,
+                "safe_band": list(band) if band else None,
+                "configured_alert_changes": changed,
+            }, f, indent=4)
+        print(f"Report written to {args.report}")
+    if changed:
+        print(f"✗ Configured band changes {changed} alert decisions")
+        sys.exit(1)
+    print("✓ Configured band leaves every alert decision unchanged")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check tiered scoring against the full rules + ML path")
+    parser.add_argument("--limit", type=int, default=50000, help="Most recent transactions to replay")
+    parser.add_argument("--bands", type=parse_band, nargs="*", default=[(10, 100), (20, 90), (30, 100)],
+                        help="Extra uncertainty bands to try, as LOW:HIGH")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--report", default=None, help="Write the results to this JSON file")
+    asyncio.run(main(parser.parse_args()))